@@ -9,7 +9,7 @@ source "$venv_path/bin/activate"
 # Change to the project directory
 cd /home/raspberrypi/projects/metarmap
 
-# Run the Python module
-/usr/bin/sudo venv/bin/python -m samples.rpi_example
+# Run the Python module, exec so it is the service's main process and keeps NOTIFY_SOCKET (sudo would reset it)
+exec venv/bin/python -m samples.SE_Wisconsin_map
 
 
@@ -9,12 +9,15 @@ from metarmap.METAR_Map_Config import METAR_MAP_Config, METAR_COLOR_CONFIG, Day_
 
 # METAR SOURCE
 from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+from METAR.station_database import Station_Database
 
 # LED Driver
 from LED_Control.RPi_zero_NeoPixel_LED_Driver import RPi_zero_NeoPixel_LED_Driver, RPi_zero_NeoPixel_Config
 import board
 
 from metarmap.Logging import initialize_basic_log_stream, Boot_Cycle_Log_Manager, Bad_Active_Flag_Exception
+from metarmap.Profiler import Profiler_Config
+from metarmap.Watchdog import Watchdog_Config
 
 station_map = {
     'KETB': 27,
@@ -31,49 +34,58 @@ station_map = {
     'KY50': 49
 }
 
-adds_metar_thread = Aviation_Weather_METAR_Thread(
-    stations = station_map,
-    update_interval=timedelta(minutes = 15),
-    stale_data_time=timedelta(minutes = 90)
-)
-
-# Map configuration
-map_config  = METAR_MAP_Config(
-    name = 'SE_Wisconsin_map',
-    logging_level=logging.DEBUG, 
-
-    # stations align with the physical map section and the LEDs in use
-    station_map = station_map,
-
-    metar_source=adds_metar_thread,
-
-    # Default color config
-    metar_colors_config=METAR_COLOR_CONFIG(),
-
-    # RPi Zero with 50 neopixel strip
-    led_driver= RPi_zero_NeoPixel_LED_Driver(
-        config = RPi_zero_NeoPixel_Config(
-            led_count=50,
-            pin = board.D18,
-            brightness=0.4,
-            order = RPi_zero_NeoPixel_Config.supported_orders.GRB
-        )
-    ),
-
-    # Day-Night uses lat/lon of Milwaukee
-    day_night_dimming_config = Day_Night_Dimming_Config(
-        day_night_dimming = True,
-        brightness_dim = 0.1,
-        use_sunrise_sunet = True,
-        day_night_latitude = 43.0389,
-        day_night_longitude = -87.9065
-    ),
-
-    wind_animation_config = Wind_Animation_Config(enabled = True),
-    lightning_animation_config = Lightning_Animation_Config(enabled = True)
-)
-
 def main():
+    # METAR.Aviation_Weather_METAR_Process takes the same arguments, and retrieves and parses in a separate process.
+    # Its worker process re-imports this module, so the fetcher, the LED driver and the map must only be created in
+    # main(), behind the `if __name__ == '__main__':` guard below, or the worker starts another map of its own
+    adds_metar_thread = Aviation_Weather_METAR_Thread(
+        stations = station_map,
+        update_interval=timedelta(minutes = 15),
+        stale_data_time=timedelta(minutes = 90),
+        snapshot_path=Path(__file__).parent.parent / 'metar_snapshot.jsonl'     # Show the last known conditions right after a reboot
+    )
+
+    # Map configuration
+    map_config  = METAR_MAP_Config(
+        name = 'SE_Wisconsin_map',
+        logging_level=logging.DEBUG, 
+
+        # stations align with the physical map section and the LEDs in use
+        station_map = station_map,
+        # Typos in station_map fail here, not as stations that never light up
+        station_database = Station_Database.open(),
+
+        metar_source=adds_metar_thread,
+
+        # Default color config
+        metar_colors_config=METAR_COLOR_CONFIG(),
+
+        # RPi Zero with 50 neopixel strip
+        led_driver= RPi_zero_NeoPixel_LED_Driver(
+            config = RPi_zero_NeoPixel_Config(
+                led_count=50,
+                pin = board.D18,
+                brightness=0.4,
+                order = RPi_zero_NeoPixel_Config.supported_orders.GRB
+            )
+        ),
+
+        # Day-Night uses lat/lon of Milwaukee
+        day_night_dimming_config = Day_Night_Dimming_Config(
+            day_night_dimming = True,
+            brightness_dim = 0.1,
+            use_sunrise_sunet = True,
+            day_night_latitude = 43.0389,
+            day_night_longitude = -87.9065
+        ),
+
+        wind_animation_config = Wind_Animation_Config(enabled = True),
+        lightning_animation_config = Lightning_Animation_Config(enabled = True),
+
+        # Pings the systemd watchdog of data/metarmap.service while frames and retrievals keep coming
+        watchdog_config = Watchdog_Config(enabled = True)
+    )
+
     # Basic stream log for when you want to run this manually
     initialize_basic_log_stream(logging.getLogger(), logging.INFO)
 
@@ -86,6 +98,9 @@ def main():
     )
     log_manager.run()
 
+    # `kill -USR1 <pid>` profiles the running map for 30 s, into this boot cycle's log directory
+    map_config.profiler = Profiler_Config(enabled = True, output_directory = log_manager.active_log_path)
+
     logger = logging.getLogger('main_function')
 
     # Create the MainLoop object to run the map
@@ -0,0 +1,101 @@
+import sys
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from metarmap import MainLoop, METAR_MAP_Config, METAR_COLOR_CONFIG, Wind_Animation_Config, Lightning_Animation_Config
+from metarmap.Multi_Map import Shared_METAR_Source, Frame_Scheduler, station_union
+from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+from METAR.aviation_weather_metar import aviation_weather_dataserver_base_url
+
+# LED Drivers, one strip per physical map
+from LED_Control.RPi_zero_NeoPixel_LED_Driver import RPi_zero_NeoPixel_LED_Driver, RPi_zero_NeoPixel_Config
+import board
+
+from metarmap.Logging import initialize_basic_log_stream, initialize_rotating_file_log
+
+wisconsin_station_map = {
+    'KMKE': 30,
+    'KMWC': 31,
+    'KUES': 32,
+    'KMSN': 36,
+    'KOSH': 47,
+}
+
+illinois_station_map = {
+    'KORD': 0,
+    'KMDW': 1,
+    'KRFD': 2,
+    'KUGN': 3,
+    'KMKE': 4,      # Shared with the Wisconsin map, only fetched once
+}
+
+def main(frames = None, base_url = aviation_weather_dataserver_base_url, log_directory = Path(__file__).parent.parent / 'logs'):
+    """
+    :param frames: Stop after this many frames, None runs until interrupted
+    :param base_url: Dataserver to retrieve from
+    :param log_directory: Where the rotating log file is written
+    """
+    initialize_basic_log_stream(logging.getLogger(), logging.INFO)
+    log_listener = initialize_rotating_file_log(output_directory = log_directory, output_name = 'multi_map', logger = logging.getLogger())
+    logger = logging.getLogger('main_function')
+
+    # One fetcher for the union of every map's stations
+    shared_source = Shared_METAR_Source(Aviation_Weather_METAR_Thread(
+        stations = station_union([wisconsin_station_map, illinois_station_map]),
+        update_interval=timedelta(minutes = 15),
+        stale_data_time=timedelta(minutes = 90),
+        base_url = base_url
+    ))
+
+    wisconsin_config = METAR_MAP_Config(
+        name = 'Wisconsin_map',
+        logging_level=logging.INFO,
+        station_map = wisconsin_station_map,
+        metar_source = shared_source.view(wisconsin_station_map),
+        metar_colors_config=METAR_COLOR_CONFIG(),
+        led_driver= RPi_zero_NeoPixel_LED_Driver(
+            config = RPi_zero_NeoPixel_Config(
+                led_count=50,
+                pin = board.D18,
+                brightness=0.4,
+                order = RPi_zero_NeoPixel_Config.supported_orders.GRB
+            )
+        ),
+        wind_animation_config = Wind_Animation_Config(enabled = True),
+        lightning_animation_config = Lightning_Animation_Config(enabled = True)
+    )
+
+    illinois_config = METAR_MAP_Config(
+        name = 'Illinois_map',
+        logging_level=logging.INFO,
+        station_map = illinois_station_map,
+        metar_source = shared_source.view(illinois_station_map),
+        metar_colors_config=METAR_COLOR_CONFIG(),
+        led_driver= RPi_zero_NeoPixel_LED_Driver(
+            config = RPi_zero_NeoPixel_Config(
+                led_count=10,
+                pin = board.D12,
+                brightness=0.4,
+                order = RPi_zero_NeoPixel_Config.supported_orders.GRB
+            )
+        ),
+        wind_animation_config = Wind_Animation_Config(enabled = True),
+        lightning_animation_config = Lightning_Animation_Config(enabled = True)
+    )
+
+    # Both maps are rendered on one frame clock
+    try:
+        with Frame_Scheduler([MainLoop(config = wisconsin_config), MainLoop(config = illinois_config)], frame_rate = 60) as scheduler:
+            logger.info('Running Maps...')
+            try:
+                scheduler.run(frames = frames)
+            except KeyboardInterrupt:
+                logger.critical('Loop Ended by Keyboard Interrupt')
+    finally:
+        shared_source.source.stop()
+        if log_listener is not None:
+            log_listener.stop()
+
+if __name__ == '__main__':
+    sys.exit(main())
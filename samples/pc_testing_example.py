@@ -1,15 +1,15 @@
 import sys
 import logging
 from datetime import timedelta
-from collections import deque
 from pathlib import Path
 
 from metarmap import MainLoop, METAR_MAP_Config, METAR_COLOR_CONFIG, Day_Night_Dimming_Config, Wind_Animation_Config, Lightning_Animation_Config
-from METAR import Aviation_Weather_METAR_Thread
+from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+from LED_Control.Terminal_LED_Driver import Terminal_LED_Driver, Terminal_LED_Driver_Config
 
 from metarmap.Logging import initialize_basic_log_stream, initialize_rotating_file_log
 
-from metarmap.utils import median_function_timer
+from metarmap.utils import median_function_timer, Streaming_Percentiles
 
 station_map = {
     'KMKE': 30,
@@ -25,59 +25,74 @@ station_map = {
     'KY50': 49
 }
 
+def main(frames = None, log_directory = Path(__file__).parent.parent / 'logs'):
+    """
+    :param frames: Stop after this many frames, None runs until interrupted
+    :param log_directory: Where the rotating log file is written
+    """
+    # Generate the thread object itself
+    adds_metar_thread = Aviation_Weather_METAR_Thread(
+        stations = station_map,
+        update_interval=timedelta(minutes = 15),
+        stale_data_time=timedelta(minutes = 90)
+    )
 
-# Generate the thread object itself
-adds_metar_thread = Aviation_Weather_METAR_Thread(
-    stations = station_map,
-    update_interval=timedelta(minutes = 15),
-    stale_data_time=timedelta(minutes = 90)
-)
+    # Construct a configuration
+    metar_colors_config=METAR_COLOR_CONFIG()
+    # Draw the map in the terminal, with the frame-time overlay underneath
+    led_driver= Terminal_LED_Driver(
+        config = Terminal_LED_Driver_Config(
+            led_count=50,
+            max_refresh_rate=30,
+            show_stats=True
+        )
+    )
+    day_night_dimming_config = Day_Night_Dimming_Config(
+        day_night_dimming = True,
+        brightness_dim = 0.1,
+        use_sunrise_sunet = True,
+        day_night_latitude = 43.0389,
+        day_night_longitude = -87.9065
+    )
 
-# Construct a configuration
+    wind_animation_config = Wind_Animation_Config(enabled = True)
+    lightning_animation_config = Lightning_Animation_Config(enabled = True)
 
-metar_colors_config=METAR_COLOR_CONFIG()
-led_driver= None
-day_night_dimming_config = Day_Night_Dimming_Config(
-    day_night_dimming = True,
-    brightness_dim = 0.1,
-    use_sunrise_sunet = True,
-    day_night_latitude = 43.0389,
-    day_night_longitude = -87.9065
-)
+    map_config  = METAR_MAP_Config(
+        name = 'PC_Test_map',
+        logging_level=logging.DEBUG,
+        metar_source = adds_metar_thread,
+        station_map=station_map,
+        led_driver=led_driver,
+        metar_colors_config=metar_colors_config,
+        day_night_dimming_config=day_night_dimming_config,
+        wind_animation_config=wind_animation_config,
+        lightning_animation_config=lightning_animation_config
+    )
 
-wind_animation_config = Wind_Animation_Config(enabled = True)
-lightning_animation_config = Lightning_Animation_Config(enabled = True)
-
-map_config  = METAR_MAP_Config(
-    name = 'PC_Test_map',
-    logging_level=logging.DEBUG,
-    metar_source = adds_metar_thread,
-    station_map=station_map,
-    led_driver=led_driver,
-    metar_colors_config=metar_colors_config,
-    day_night_dimming_config=day_night_dimming_config,
-    wind_animation_config=wind_animation_config,
-    lightning_animation_config=lightning_animation_config
-)
-
-def main():
     logger = logging.getLogger()
-    initialize_basic_log_stream(logger, logging.DEBUG)
-    initialize_rotating_file_log(logging.getLogger(), output_directory = Path(__file__).parent.parent / 'logs', output_name = f'{map_config.name}', max_bytes= 10*1024*1024, backup_count=25)
+    # Console logging would scroll the terminal preview, only show warnings and above
+    initialize_basic_log_stream(logger, logging.WARNING)
+    log_listener = initialize_rotating_file_log(output_directory = log_directory, output_name = f'{map_config.name}', logger = logging.getLogger(),
+                                                max_bytes= 10*1024*1024, backup_count=25)
 
     # Create the MainLoop object to run the map
     with MainLoop(config = map_config) as metarmap_loop:
 
         # Run the loop as many times as you'd like
-        metarmap_loop_timer_buffer: deque[float] = deque([],maxlen=25)
+        metarmap_loop_timer_buffer = Streaming_Percentiles()
         try:
-            while True:
+            while frames is None or metarmap_loop.frame_count < frames:
                 loop_length = median_function_timer(metarmap_loop_timer_buffer, metarmap_loop.loop)
                 # print(f'METARMAP_loop Run Time: {loop_length}')
                 # if metarmap_loop.metar_source.is_running:
                 #     print(f'METAR AGE: {metarmap_loop.current_metar_state_age}')
         except KeyboardInterrupt:
             logger.critical('Loop Ended by Keyboard Interrupt')
+        finally:
+            adds_metar_thread.stop()
+            if log_listener is not None:
+                log_listener.stop()
 
 if __name__ == '__main__':
     sys.exit(main())
\ No newline at end of file
@@ -1,8 +1,15 @@
+from __future__ import annotations
 import typing
 from metarmap.RGB_color import RGB_color
 
 class LED_DRIVER(typing.Protocol):
-    """Defines a valid LED Driver object for the METARMAP loop to push station data to"""
+    """
+    Defines a valid LED Driver object for the METARMAP loop to push station data to
+
+    Drivers may also define update_frame(framebuffer: bytes | bytearray), taking 3 bytes (R, G, B) per LED index, to be
+    updated once per frame rather than through update_LED for each changed LED. It is left out of the protocol, a
+    driver subclassing it would otherwise inherit an update_frame that does nothing
+    """
 
     @property
     def LED_index_colors(self) -> dict[int, RGB_color]:
@@ -15,5 +22,8 @@ class LED_DRIVER(typing.Protocol):
     def update_LED(self, index: int, color: RGB_color) -> None:
         """Update the LED provided by index to the color provided by the RGB_color object"""
 
+    def show(self) -> None:
+        """Optional, end of frame, push the pending LED updates out to the hardware"""
+
     def close(self) -> None:
         """Shutdown procedure for the driver, turn off the lights and release the hardware"""
\ No newline at end of file
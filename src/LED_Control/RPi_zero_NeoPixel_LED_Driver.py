@@ -39,6 +39,7 @@ class RPi_zero_NeoPixel_LED_Driver(LED_DRIVER):
                                            brightness=self.config.brightness,
                                            pixel_order=self.config.order,
                                            auto_write=False)
+        self._pending_show: bool = False
         
     @property
     def LED_index_colors(self) -> dict[int, RGB_color]:
@@ -52,12 +53,30 @@ class RPi_zero_NeoPixel_LED_Driver(LED_DRIVER):
         return d
 
     def update_LED(self, index: int, color: RGB_color) -> None:
-        """Update the LED at the index to the color provided"""
+        """Update the LED at the index to the color provided, transmitted on the next show()"""
         if self.config.order == neopixel.GRB:
             self._neopixel[index] = [color.g, color.r, color.b]
-            self._neopixel.show()
+            self._pending_show = True
         else:
             raise NotImplementedError(f'Non-GRB color ordering is not implemented')
+
+    def update_frame(self, framebuffer: bytes | bytearray) -> None:
+        """Update the whole strip from an RGB framebuffer in a single slice assignment"""
+        if self.config.order == neopixel.GRB:
+            count = min(self.config.led_count, len(framebuffer)//3)
+            r = framebuffer[0:count*3:3]
+            g = framebuffer[1:count*3:3]
+            b = framebuffer[2:count*3:3]
+            self._neopixel[0:count] = list(zip(g, r, b))
+            self._pending_show = True
+        else:
+            raise NotImplementedError(f'Non-GRB color ordering is not implemented')
+
+    def show(self) -> None:
+        """Transmit the strip once per frame, only if an LED changed since the last transmit"""
+        if self._pending_show:
+            self._neopixel.show()
+            self._pending_show = False
         
     def close(self) -> None:
         """
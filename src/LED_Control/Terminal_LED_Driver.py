@@ -0,0 +1,240 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from time import perf_counter
+import typing
+import sys
+
+# Module imports
+from LED_Control.LED_Driver import LED_DRIVER
+from metarmap.RGB_color import RGB_color
+from metarmap.Framebuffer import frame_delta
+
+if typing.TYPE_CHECKING:
+    from METAR import METAR
+
+# ANSI escape sequences used by the renderer
+_CSI = '\x1b['
+_CLEAR_SCREEN = f'{_CSI}2J'
+_HIDE_CURSOR = f'{_CSI}?25l'
+_SHOW_CURSOR = f'{_CSI}?25h'
+_RESET = f'{_CSI}0m'
+_CLEAR_LINE = f'{_CSI}2K'
+_BLOCK = '██'     # Two full blocks make a roughly square cell in most terminal fonts
+_STATS_INTERVAL = 0.25      # Seconds, the overlay alone is redrawn at most this often
+
+def positions_from_METARs(station_map: dict[str, int], metars: dict[str, METAR | None]) -> dict[int, tuple[float, float]]:
+    """
+    Build the pixel_positions mapping (LED index -> (latitude, longitude)) for a Terminal_LED_Driver
+    from the station_map of a METAR_MAP_Config and a METAR dict that carries station coordinates
+
+    Stations without a METAR or without coordinates are left out, the driver places them by index
+    """
+    positions: dict[int, tuple[float, float]] = {}
+    for station_id, pin_index in station_map.items():
+        metar = metars.get(station_id)
+        if metar is None or metar.latitude is None or metar.longitude is None:
+            continue
+        positions[pin_index] = (metar.latitude, metar.longitude)
+    return positions
+
+@dataclass
+class Terminal_LED_Driver_Config:
+    """Configuration for rendering the LED strip as truecolor blocks in a terminal"""
+    led_count: int                                                      # Number of LED pixels
+    columns: int = 25                                                   # Cells per row when laying pixels out by index
+    pixel_positions: dict[int, tuple[float, float]] | None = None       # LED index -> (latitude, longitude), optional
+    grid_width: int = 40                                                # Cells across when laying pixels out by position
+    grid_height: int = 16                                               # Cells down when laying pixels out by position
+    max_refresh_rate: float = 30.0                                      # Hz, redraws are coalesced above this rate
+    show_stats: bool = False                                            # Draw a frame-time overlay below the map
+    stream: typing.TextIO = field(default_factory=lambda: sys.stdout)   # Output stream, defaults to stdout
+
+class Terminal_LED_Driver(LED_DRIVER):
+    """
+    LED Driver that draws the strip in a terminal using truecolor ANSI escape codes, for developing without hardware
+
+    Only the cells that changed since the last drawn frame are written, and drawing is capped at max_refresh_rate,
+    so it can keep up with the full animation rate over an SSH session without flooding the terminal
+    """
+    def __init__(self, config: Terminal_LED_Driver_Config):
+        self.config = config
+        self._stream = config.stream
+        self._min_refresh_interval = 1.0/config.max_refresh_rate if config.max_refresh_rate > 0 else 0.0
+
+        # Requested state and the state currently on screen, as RGB tuples
+        self._colors: list[tuple[int, int, int]] = [(0, 0, 0)]*config.led_count
+        self._drawn: list[tuple[int, int, int] | None] = [None]*config.led_count
+        self._dirty: set[int] = set()
+        self._last_frame: bytearray = bytearray(config.led_count*3)
+
+        # Screen layout, LED index -> (row, column) in cells
+        self._cells: list[tuple[int, int]] = []
+        self._rows: int = 0
+        self._layout(config.pixel_positions)
+
+        self._started = False
+        self._closed = False
+        self._last_render: float = 0.0
+        self._last_stats_render: float = 0.0
+
+        # Frame-time statistics, frames are the intervals between show() calls
+        self._last_show: float | None = None
+        self._frame_time_avg: float = 0.0
+        self._frame_time_max: float = 0.0
+        self._frame_count: int = 0
+        self._render_count: int = 0
+        self._cells_drawn: int = 0
+
+    @property
+    def LED_index_colors(self) -> dict[int, RGB_color]:
+        """Return a dictionary of the current state of the LEDs under control by the object"""
+        return {i: RGB_color(*rgb) for i, rgb in enumerate(self._colors)}
+
+    @property
+    def is_valid(self) -> bool:
+        """The terminal driver is valid until it is closed"""
+        return not self._closed
+
+    def set_pixel_positions(self, pixel_positions: dict[int, tuple[float, float]] | None) -> None:
+        """Re-layout the pixels (LED index -> (latitude, longitude)), the whole map is redrawn on the next frame"""
+        self.config.pixel_positions = pixel_positions
+        self._layout(pixel_positions)
+        self._drawn = [None]*self.config.led_count
+        self._dirty = set(range(self.config.led_count))
+        self._started = False
+
+    def _layout(self, pixel_positions: dict[int, tuple[float, float]] | None) -> None:
+        """Assign every LED index to a unique cell, by latitude/longitude where known and by index otherwise"""
+        columns = max(1, self.config.columns)
+        self._cells = []
+        if not pixel_positions:
+            for i in range(self.config.led_count):
+                self._cells.append(divmod(i, columns))
+            self._rows = (self.config.led_count + columns - 1)//columns
+            return
+
+        lats = [lat for lat, _ in pixel_positions.values()]
+        lons = [lon for _, lon in pixel_positions.values()]
+        lat_min, lat_max = min(lats), max(lats)
+        lon_min, lon_max = min(lons), max(lons)
+        lat_span = (lat_max - lat_min) or 1.0
+        lon_span = (lon_max - lon_min) or 1.0
+        width = max(1, self.config.grid_width)
+        height = max(1, self.config.grid_height)
+
+        taken: set[tuple[int, int]] = set()
+        placed: dict[int, tuple[int, int]] = {}
+        for index in sorted(pixel_positions):
+            if not 0 <= index < self.config.led_count:
+                continue
+            lat, lon = pixel_positions[index]
+            row = round((lat_max - lat)/lat_span*(height - 1))      # North at the top
+            col = round((lon - lon_min)/lon_span*(width - 1))
+            # Nearby stations can land on the same cell, slide right (wrapping to the next row) until free
+            while (row, col) in taken:
+                col += 1
+                if col >= width:
+                    col = 0
+                    row += 1
+            taken.add((row, col))
+            placed[index] = (row, col)
+
+        # Pixels without a position are lined up by index underneath the map
+        unplaced = [i for i in range(self.config.led_count) if i not in placed]
+        base_row = max((row for row, _ in taken), default=-1) + 2
+        for n, index in enumerate(unplaced):
+            row, col = divmod(n, columns)
+            placed[index] = (base_row + row, col)
+
+        self._cells = [placed[i] for i in range(self.config.led_count)]
+        self._rows = max((row for row, _ in self._cells), default=-1) + 1
+
+    def update_LED(self, index: int, color: RGB_color) -> None:
+        """Update the LED at the index to the color provided, drawn on the next show()"""
+        rgb = (color.r, color.g, color.b)
+        self._colors[index] = rgb
+        self._last_frame[index*3:index*3 + 3] = bytes(rgb)
+        if self._drawn[index] != rgb:
+            self._dirty.add(index)
+        else:
+            self._dirty.discard(index)
+
+    def update_frame(self, framebuffer: bytes | bytearray) -> None:
+        """Update from a whole framebuffer, only the pixels that differ from the previous frame are visited"""
+        frame = bytes(framebuffer[:self.config.led_count*3])
+        for index, rgb in frame_delta(self._last_frame, frame):
+            color = (rgb[0], rgb[1], rgb[2])
+            self._colors[index] = color
+            if self._drawn[index] != color:
+                self._dirty.add(index)
+            else:
+                self._dirty.discard(index)
+        self._last_frame[:len(frame)] = frame
+
+    def show(self) -> None:
+        """End of frame, draw the changed cells if the refresh rate cap allows it"""
+        now = perf_counter()
+        if self._last_show is not None:
+            frame_time = now - self._last_show
+            self._frame_count += 1
+            # Exponential moving average keeps the overlay steady without holding a sample buffer
+            self._frame_time_avg += (frame_time - self._frame_time_avg)*0.05 if self._frame_count > 1 else frame_time
+            if frame_time > self._frame_time_max:
+                self._frame_time_max = frame_time
+        self._last_show = now
+
+        if self._closed or now - self._last_render < self._min_refresh_interval:
+            return
+        stats_due = self.config.show_stats and now - self._last_stats_render >= _STATS_INTERVAL
+        if self._dirty or not self._started or stats_due:
+            self._render(now)
+
+    def _render(self, now: float) -> None:
+        """Write the dirty cells (and the stats overlay) to the stream in a single write"""
+        parts: list[str] = []
+        if not self._started:
+            parts.append(_HIDE_CURSOR)
+            parts.append(_CLEAR_SCREEN)
+            self._dirty.update(range(self.config.led_count))
+            self._started = True
+
+        last_rgb: tuple[int, int, int] | None = None
+        for index in sorted(self._dirty):
+            rgb = self._colors[index]
+            row, col = self._cells[index]
+            parts.append(f'{_CSI}{row + 1};{col*2 + 1}H')
+            # Neighbouring cells often share a color, only emit the SGR sequence when it changes
+            if rgb != last_rgb:
+                parts.append(f'{_CSI}38;2;{rgb[0]};{rgb[1]};{rgb[2]}m')
+                last_rgb = rgb
+            parts.append(_BLOCK)
+            self._drawn[index] = rgb
+        cells = len(self._dirty)
+        self._dirty.clear()
+        parts.append(_RESET)
+
+        self._render_count += 1
+        self._cells_drawn = cells
+        if self.config.show_stats:
+            parts.append(f'{_CSI}{self._rows + 2};1H{_CLEAR_LINE}{self._stats_text()}')
+            self._last_stats_render = now
+
+        self._stream.write(''.join(parts))
+        self._stream.flush()
+        self._last_render = now
+
+    def _stats_text(self) -> str:
+        """Single line frame-time summary for the overlay"""
+        avg = self._frame_time_avg
+        fps = 1.0/avg if avg > 0 else 0.0
+        return (f'frames: {self._frame_count}  fps: {fps:6.1f}  frame: {avg*1000:7.2f} ms  '
+                f'max: {self._frame_time_max*1000:7.2f} ms  redraws: {self._render_count}  cells: {self._cells_drawn}')
+
+    def close(self) -> None:
+        """Restore the terminal state"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._started:
+            self._stream.write(f'{_RESET}{_CSI}{self._rows + 3};1H{_SHOW_CURSOR}\n')
+            self._stream.flush()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+import logging
+import logging.handlers
+import multiprocessing
+import time
+import typing
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Thread, Event
+from multiprocessing.connection import Connection
+
+from METAR.aviation_weather_metar import aviation_weather_dataserver_base_url
+from METAR.binary_snapshot import encode_snapshot, decode_snapshot, Binary_Snapshot, Snapshot_Format_Error
+from METAR.shared_snapshot import Shared_Snapshot_Buffer, Snapshot_Too_Large_Error, STALE, STOP
+
+# Slot bytes reserved per station when sizing the buffer, an encoded station is about 210 bytes plus its raw text
+SLOT_BYTES_PER_STATION = 512
+MIN_SLOT_SIZE = 1 << 20
+
+class _Pipe_Log_Handler(logging.handlers.QueueHandler):
+    """
+    Sends the worker's records through its own pipe
+
+    A pipe per worker has no lock shared between processes, so a killed worker cannot leave the log hand-off blocked
+    """
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.send(record)
+
+def _forward_logs(connection: Connection) -> None:
+    """Hand the records of a worker to the logger of the same name in this process, until the worker exits"""
+    while True:
+        try:
+            record = connection.recv()
+        except Exception:       # EOF once the worker exits, or a record cut short by its death
+            break
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+    connection.close()
+
+def _run_worker(buffer_name: str, log_connection: Connection, log_level: int, thread_kwargs: dict[str, typing.Any]) -> None:
+    """
+    Worker process, runs the loop of an Aviation_Weather_METAR_Thread and publishes each new retrieval into the buffer
+
+    The retrieval, parsing and snapshot file logic are the thread's, only the hand-off differs
+    """
+    root = logging.getLogger()
+    root.handlers = [_Pipe_Log_Handler(log_connection)]
+    root.setLevel(log_level)
+    logger = logging.getLogger('Aviation_Weather_METAR_Process.worker')
+
+    # Imported here, the parent only needs the buffer
+    from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+
+    buffer = Shared_Snapshot_Buffer(buffer_name)
+    try:
+        source = Aviation_Weather_METAR_Thread(wait_to_run=True, **thread_kwargs)
+        poll_interval = thread_kwargs.get('poll_interval', 1.0)
+        while not buffer.control & STOP:
+            source.loop()
+            if source.new_metar_data:
+                live_metar_data = source.live_metar_data
+                if live_metar_data is not None:
+                    try:
+                        buffer.publish(encode_snapshot(live_metar_data, taken=datetime.now(timezone.utc)))
+                    except Snapshot_Too_Large_Error:
+                        logger.exception('METAR snapshot not published')
+                source.new_metar_data = False
+            buffer.set_state(STALE if source.data_is_stale else 0, time.monotonic())
+            time.sleep(poll_interval)
+    except Exception:
+        # The supervisor in the parent restarts the worker
+        logger.exception('Unhandled exception in METAR worker')
+        raise
+    finally:
+        buffer.close()
+
+class Aviation_Weather_METAR_Process:
+    '''
+    METAR_SOURCE running the retrieval and parsing of Aviation_Weather_METAR_Thread in a separate process, so a large
+    parse never holds the GIL of the render loop
+
+    The worker publishes each retrieval as an encoded snapshot (see METAR.binary_snapshot) into a shared memory double
+    buffer (see METAR.shared_snapshot). new_metar_data is a read of the buffer's sequence, live_metar_data copies and
+    decodes the station index of the snapshot once per sequence, each METAR is decoded when first accessed. The worker's logs are forwarded to the loggers of this process, and a
+    supervising thread restarts the worker if it dies. Nothing shared with the worker takes a lock, so even a worker
+    killed mid-write cannot block this process
+    '''
+
+    def __init__(self,
+                 stations: list[str] | None = None,
+                 update_interval: timedelta = timedelta(seconds = 900),        # 15 minute update default
+                 stale_data_time: timedelta = timedelta(seconds = 5220),        # 1 Hour, 45 minutes for stale data defaults
+                 wait_to_run: bool = False,
+                 snapshot_path: Path | str | None = None,
+                 snapshot_interval: timedelta = timedelta(seconds = 600),
+                 base_url: str = aviation_weather_dataserver_base_url,
+                 poll_interval: float = 1.0,
+                 slot_size: int | None = None,
+                 restart_delay: float = 5.0,
+                 start_method: str = 'spawn',
+                 log_level: int = logging.INFO
+                 ):
+        '''
+        :param stations: Station IDs to retrieve
+        :param update_interval: Time between retrievals
+        :param stale_data_time: Age of the last successful retrieval after which the data is stale
+        :param wait_to_run: Do not start the worker on construction
+        :param snapshot_path: Optional file to persist each successful retrieval to, and to warm start from
+        :param snapshot_interval: Minimum time between snapshot writes, to spare SD cards
+        :param base_url: Dataserver URL to retrieve from, defaults to aviationweather.gov
+        :param poll_interval: Seconds the worker sleeps between checks
+        :param slot_size: Bytes per shared memory slot, the largest encoded snapshot, sized from the stations if None
+        :param restart_delay: Seconds between the death of the worker and its restart
+        :param start_method: multiprocessing start method, spawn does not inherit the threads of this process
+        :param log_level: Level of the worker's root logger
+        '''
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self._thread_kwargs: dict[str, typing.Any] = {
+            'stations': list(stations) if stations is not None else None,
+            'update_interval': update_interval,
+            'stale_data_time': stale_data_time,
+            'snapshot_path': snapshot_path,
+            'snapshot_interval': snapshot_interval,
+            'base_url': base_url,
+            'poll_interval': poll_interval,
+        }
+        self.restart_delay = restart_delay
+        self.log_level = log_level
+        self._context = multiprocessing.get_context(start_method)
+
+        if slot_size is None:
+            slot_size = max(MIN_SLOT_SIZE, len(stations or ())*SLOT_BYTES_PER_STATION)
+        self._buffer = Shared_Snapshot_Buffer(slot_size=slot_size, create=True)
+        self._seen_sequence: int = 0
+        self._live_sequence: int = 0
+        self._live_metar_data: Binary_Snapshot | None = None
+
+        self._process: multiprocessing.process.BaseProcess | None = None
+        self._supervisor: Thread | None = None
+        self._stopping = Event()
+        self.restarts: int = 0
+
+        if not wait_to_run:
+            self.start()
+
+    def start(self) -> None:
+        """Start the worker process and its supervisor"""
+        if self._supervisor is not None:
+            return
+        self._start_worker()
+        self._supervisor = Thread(target=self._supervise, name=f'{self.__class__.__name__}.supervisor', daemon=True)
+        self._supervisor.start()
+
+    def _start_worker(self) -> None:
+        log_receiver, log_sender = self._context.Pipe(duplex=False)
+        self._process = self._context.Process(target=_run_worker, name=f'{self.__class__.__name__}.worker', daemon=True,
+                                              args=(self._buffer.name, log_sender, self.log_level, self._thread_kwargs))
+        self._process.start()
+        # Only the worker holds the sending end, its exit ends the forwarding
+        log_sender.close()
+        Thread(target=_forward_logs, args=(log_receiver,), name=f'{self.__class__.__name__}.logs', daemon=True).start()
+        self._logger.info(f'Started METAR worker process {self._process.pid}')
+
+    def _supervise(self) -> None:
+        """Restart the worker whenever it exits without a stop request"""
+        while not self._stopping.is_set():
+            self._process.join()
+            if self._stopping.is_set():
+                break
+            self._logger.error(f'METAR worker process {self._process.pid} exited with {self._process.exitcode}, '
+                               f'restarting in {self.restart_delay} s')
+            if self._stopping.wait(self.restart_delay):
+                break
+            self.restarts += 1
+            self._start_worker()
+
+    @property
+    def pid(self) -> int | None:
+        """Process ID of the current worker"""
+        return self._process.pid if self._process is not None else None
+
+    @property
+    def new_metar_data(self) -> bool:
+        return self._buffer.sequence != self._seen_sequence
+
+    @new_metar_data.setter
+    def new_metar_data(self, new_state: bool) -> None:
+        # Clearing acknowledges every snapshot published so far
+        if not new_state:
+            self._seen_sequence = self._buffer.sequence
+
+    @property
+    def live_metar_data(self) -> Binary_Snapshot | None:
+        """
+        The published snapshot as a read-only mapping, None before the first and while stale
+
+        Only the station IDs are decoded here, the render loop decodes each METAR as it reads the station
+        """
+        if self.data_is_stale:
+            return None
+        if self._buffer.sequence != self._live_sequence:
+            published = self._buffer.read()
+            if published is not None:
+                sequence, data = published
+                try:
+                    self._live_metar_data = decode_snapshot(data)
+                    self._live_sequence = sequence
+                except Snapshot_Format_Error:
+                    self._logger.exception(f'Undecodable METAR snapshot {sequence} in shared memory')
+        return self._live_metar_data
+
+    @property
+    def data_is_stale(self) -> bool:
+        return bool(self._buffer.flags & STALE)
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def last_loop_time(self) -> float | None:
+        """time.monotonic() of the worker's last loop, for watchdogs"""
+        return self._buffer.last_loop_time
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the worker and its supervisor, then release the shared memory"""
+        self._stopping.set()
+        self._buffer.control = STOP
+        if self._process is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._logger.warning(f'METAR worker process {self._process.pid} did not stop, terminating it')
+                self._process.terminate()
+                self._process.join(timeout)
+        if self._supervisor is not None:
+            self._supervisor.join(timeout)
+        self._buffer.close()
+
+    def close(self) -> None:
+        self.stop()
@@ -1,12 +1,19 @@
 from __future__ import annotations
 import logging
+import typing
 from datetime import datetime, timedelta
+from pathlib import Path
 
 # Python Threading
 from threading import Thread, Lock, get_ident
 
 # Module Imports
-from METAR.aviation_weather_metar import Aviation_Weather_METAR, METAR
+from METAR.aviation_weather_metar import Aviation_Weather_METAR, METAR, aviation_weather_dataserver_base_url
+from METAR.snapshot import write_snapshot, read_snapshot
+from METAR.clock import Clock, system_clock
+
+if typing.TYPE_CHECKING:
+    from METAR.history import METAR_History_Store
 
 def get_time_delta_to_event(event_time: datetime) -> timedelta:
     '''
@@ -25,10 +32,28 @@ class Aviation_Weather_METAR_Thread(Aviation_Weather_METAR, Thread):
                 stations: list[str] | None = None,
                 update_interval: timedelta = timedelta(seconds = 900),        # 15 minute update default
                 stale_data_time: timedelta = timedelta(seconds = 5220),        # 1 Hour, 45 minutes for stale data defaults
-                wait_to_run: bool = False
+                wait_to_run: bool = False,
+                snapshot_path: Path | str | None = None,
+                snapshot_interval: timedelta = timedelta(seconds = 600),       # At most one snapshot write per 10 minutes
+                history: METAR_History_Store | None = None,
+                base_url: str = aviation_weather_dataserver_base_url,
+                clock: Clock = system_clock,
+                poll_interval: float = 1.0
                 ):
+        '''
+        :param stations: Station IDs to retrieve
+        :param update_interval: Time between retrievals
+        :param stale_data_time: Age of the last successful retrieval after which the data is stale
+        :param wait_to_run: Do not start the thread on construction
+        :param snapshot_path: Optional file to persist each successful retrieval to, and to warm start from
+        :param snapshot_interval: Minimum time between snapshot writes, to spare SD cards
+        :param history: Optional store that receives the new observations of every successful retrieval
+        :param base_url: Dataserver URL to retrieve from, defaults to aviationweather.gov
+        :param clock: Time source for the update interval, stale data and snapshot ages
+        :param poll_interval: Seconds of clock time the thread sleeps between checks
+        '''
         self._logger = logging.getLogger(f'{self.__class__.__name__}')
-        self._stop = False      # Internal stop, used to stop loop from within thread
+        self._stop_requested = False      # Internal stop, used to stop loop from within thread
     
         # Set up thread-safe metar data dict and new data flag
         self._live_metar_data_lock = Lock()
@@ -41,15 +66,26 @@ class Aviation_Weather_METAR_Thread(Aviation_Weather_METAR, Thread):
         self._is_running: bool = False
 
         # Initialize parent classes in order
-        Aviation_Weather_METAR.__init__(self, stations = stations)
+        Aviation_Weather_METAR.__init__(self, stations = stations, history = history, base_url = base_url, clock = clock)
         Thread.__init__(self)
 
         # Set up configurable times
         self._update_interval: timedelta = update_interval        # Setup interval time for updates
         self._stale_data_time: timedelta = stale_data_time          # Setup interval time for stale data timeout
 
-        self._last_attempt_time = datetime.now()        # Time object to synchronize updates
-        self._last_success_time = None
+        # Times are clock.monotonic() seconds, immune to wall clock adjustments
+        self._poll_interval: float = poll_interval
+        self._last_attempt_time: float = self._clock.monotonic()       # Time to synchronize updates
+        self._last_success_time: float | None = None
+        self.last_loop_time: float | None = None        # Heartbeat for watchdogs, a fetch hung on the network stops it
+
+        # Persisted snapshot of the last successful retrieval, shown until the first retrieval of this run succeeds
+        self._snapshot_path: Path | None = Path(snapshot_path) if snapshot_path is not None else None
+        self._snapshot_interval: timedelta = snapshot_interval
+        self._last_snapshot_time: float | None = None
+        self._warm_started: bool = False
+        if self._snapshot_path is not None:
+            self._warm_started = self._load_snapshot()
 
         if not wait_to_run:
             self.daemon = True
@@ -92,12 +128,52 @@ class Aviation_Weather_METAR_Thread(Aviation_Weather_METAR, Thread):
         with self._is_running_lock:
             return self._is_running
 
+    def _load_snapshot(self) -> bool:
+        '''
+        Publish the persisted snapshot if it is younger than the stale data time, return success as bool
+        '''
+        snapshot = read_snapshot(self._snapshot_path, logger = self._logger)
+        if snapshot is None:
+            return False
+        taken, snapshot_metar_data = snapshot
+
+        # A snapshot from the future means the clock cannot be trusted to judge its age
+        age = self._clock.now() - taken
+        if age < timedelta(0) or age > self._stale_data_time:
+            self._logger.info(f'Ignoring METAR snapshot taken {taken.isoformat()}, age {age}')
+            return False
+
+        for station in self.station_id_list:
+            self._metar_data[station] = snapshot_metar_data.get(station)
+        # Staleness is judged from when the snapshot was retrieved, not from now
+        self._last_success_time = self._clock.monotonic() - age.total_seconds()
+        self._update_live_METAR()
+        self._logger.info(f'Warm started from METAR snapshot {self._snapshot_path}, age {age}')
+        return True
+
+    def _persist_snapshot(self) -> bool:
+        '''
+        Write the current METAR data to the snapshot file, at most once per snapshot interval, return whether it was written
+        '''
+        if self._snapshot_path is None:
+            return False
+        now = self._clock.monotonic()
+        if self._last_snapshot_time is not None and now - self._last_snapshot_time < self._snapshot_interval.total_seconds():
+            return False
+        try:
+            write_snapshot(self._snapshot_path, self._metar_data, taken = self._clock.now())
+        except OSError:
+            self._logger.exception(f'Failed to write METAR snapshot to {self._snapshot_path}')
+            return False
+        self._last_snapshot_time = now
+        return True
+
     def _check_update_METAR_data(self) -> bool:
         """Attempt to update the metar data in the object, return success as bool"""
-        self._last_attempt_time = datetime.now()
+        self._last_attempt_time = self._clock.monotonic()
         self._logger.debug(f'Update Attempt time: {self._last_attempt_time}')
         if self.update_METAR_data():
-            self._last_success_time = datetime.now()
+            self._last_success_time = self._clock.monotonic()
             self._logger.debug(f'Update Success time: {self._last_success_time}')
             return True
         else:
@@ -113,8 +189,8 @@ class Aviation_Weather_METAR_Thread(Aviation_Weather_METAR, Thread):
             return False
         
         # Otherwise, check if the last success was longer than the stale data time in the past
-        time_delta = get_time_delta_to_event(self._last_success_time)
-        if time_delta > self._stale_data_time:
+        time_delta = self._clock.monotonic() - self._last_success_time
+        if time_delta > self._stale_data_time.total_seconds():
             return True
         return False
     
@@ -122,8 +198,8 @@ class Aviation_Weather_METAR_Thread(Aviation_Weather_METAR, Thread):
         '''
         Compares timedelta to last attempt against the update interval parameter
         '''
-        time_delta = get_time_delta_to_event(self._last_attempt_time)
-        if time_delta > self._update_interval:
+        time_delta = self._clock.monotonic() - self._last_attempt_time
+        if time_delta > self._update_interval.total_seconds():
             return True
         return False
 
@@ -151,38 +227,46 @@ class Aviation_Weather_METAR_Thread(Aviation_Weather_METAR, Thread):
         
         # If enough time has elapsed and the METAR data can be successfully updated, push data onto the queue
         # and update the success_time to the curren time
-        if self._check_time_delta_against_interval() or self._live_metar_data is None:
+        # A warm start only bridges until the first retrieval of this run, which is attempted right away
+        if self._check_time_delta_against_interval() or self._live_metar_data is None or self._warm_started:
             if self._check_update_METAR_data():
+                # Persisted before publishing, once published the dict is shared with the readers
+                self._persist_snapshot()
                 self._update_live_METAR()
-                self._last_success_time = datetime.now()
+                self._last_success_time = self._clock.monotonic()
+                self._warm_started = False
             
         # Check if the current data in the queue is stale
         if self._check_for_stale_data():
             self._logger.debug('Setting data_is_stale')
             self.live_metar_data = None
             self.data_is_stale = True
+        self.last_loop_time = self._clock.monotonic()
 
     def stop(self) -> None:
         """Internal stop, log action"""
         self._logger.info(f'Internally driven stop for {self}, ident: {get_ident()}')
-        self._stop = True
+        self._stop_requested = True
         return
 
     def run(self):
         """Run loop for thread"""
         
         # Clear stop flags
-        self._stop = False
+        self._stop_requested = False
         self._is_running = True
+        self.last_loop_time = self._clock.monotonic()
         
         # Run loop until stop flag
-        while not self._stop:
+        while not self._stop_requested:
             try:
                 self.loop()
             except:
                 self._logger.exception(f'Unhandled exception in {self.__class__.__name__}')
                 self._is_running = False
-                self._stop = True
+                self._stop_requested = True
+                break
+            self._clock.sleep(self._poll_interval)
         self._is_running = False
             
         self._logger.warning('ADDSMETARThread has exited the loop')
@@ -1,6 +1,6 @@
 from __future__ import annotations
 import logging
-from typing import TypeVar, Literal
+from typing import TypeVar, Literal, Any
 T = TypeVar("T")
 
 from datetime import datetime, timezone
@@ -23,6 +23,15 @@ def try_cast(cast_str: str | T, cast_type: T, exception_logger: logging.Logger |
 
 class METAR:
     """Object to represent an FAA METAR"""
+
+    # Constructor arguments that make up the serialized form of a METAR (see to_dict)
+    FIELDS: tuple[str, ...] = (
+        'station', 'raw_text', 'observation_time', 'latitude', 'longitude', 'temp_c', 'dewpoint_c',
+        'wind_dir_degrees', 'wind_speed_kt', 'wind_gust_kt', 'visibility_statute_mi', 'altim_in_hg',
+        'sea_level_pressure_mb', 'wx_string', 'flight_category', 'precip_in', 'metar_type', 'elevation_m',
+        'quality_control_flag', 'sky_condition',
+    )
+
     def __init__(self, station: str | None = None, raw_text: str | None = None, observation_time: datetime | None = None,
                  latitude: float | None = None, longitude: float | None = None,
                  temp_c: float | None = None, dewpoint_c: float | None = None,
@@ -74,6 +83,24 @@ class METAR:
     def __repr__(self):
         return f'METAR: {self.raw_text}'
 
+    def to_dict(self) -> dict[str, Any]:
+        """JSON compatible dict of the METAR fields, observation_time as an ISO 8601 string"""
+        result = {field: getattr(self, field) for field in self.FIELDS}
+        if self._observation_time is not None:
+            result['observation_time'] = self._observation_time.isoformat()
+        result['sky_condition'] = [dict(sky_condition) for sky_condition in self._sky_condition]
+        return result
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], logger: logging.Logger | None = None) -> METAR:
+        """Alternate constructor, the inverse of to_dict, missing fields are None"""
+        kwargs = {field: data.get(field) for field in cls.FIELDS}
+        if isinstance(kwargs['observation_time'], str):
+            kwargs['observation_time'] = datetime.fromisoformat(kwargs['observation_time'])
+        if kwargs['sky_condition'] is not None:
+            kwargs['sky_condition'] = [dict(sky_condition) for sky_condition in kwargs['sky_condition']]
+        return cls(**kwargs, logger=logger)
+
     @property
     def observation_time(self) -> datetime:
         return self._observation_time
@@ -136,7 +163,7 @@ class METAR:
 
     @property
     def dewpoint_c(self) -> float | None:
-        return self._temp_c
+        return self._dewpoint_c
     
     @dewpoint_c.setter
     def dewpoint_c(self,val: str | float) -> None:
@@ -1,3 +1,19 @@
 from METAR.METAR import METAR
-from METAR.aviation_weather_metar import Aviation_Weather_METAR
-from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
\ No newline at end of file
+
+# The retrieval modules pull in urllib, ElementTree and threading, they are imported on first access
+_LAZY_IMPORTS = {
+    'Aviation_Weather_METAR': 'METAR.aviation_weather_metar',
+    'Aviation_Weather_METAR_Thread': 'METAR.Aviation_Weather_METAR_Thread',
+    'Aviation_Weather_METAR_Process': 'METAR.Aviation_Weather_METAR_Process',
+}
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_IMPORTS])
@@ -1,11 +1,17 @@
 from __future__ import annotations
-import urllib.request
-from urllib.error import URLError, HTTPError, ContentTooShortError
 import logging
-import xml.etree.ElementTree as ET
+import typing
 from datetime import datetime
+from time import perf_counter
 
 from METAR.METAR import METAR
+from METAR.clock import Clock, system_clock
+
+if typing.TYPE_CHECKING:
+	from METAR.history import METAR_History_Store
+
+# urllib.request (http.client, email, ssl) and ElementTree are imported where they are used, they are slow to import
+# on a Pi Zero and not needed until the first retrieval
 
 # As of October 16, 2023 the ADDS has been retired in favor of the new aviationweather.gov
 # adds_metar_data_server_base_url = ''.join((
@@ -28,15 +34,52 @@ aviation_weather_dataserver_base_url = ''.join((
 class METAR_Retrieve_Failure(Exception):
 	"""Exception for failure to retrieve METAR for various reasons"""
 
+class METAR_Fetch_Stats:
+	"""
+	Running statistics of METAR retrievals
+
+	Updated by the retrieving thread with plain attribute writes, so any thread can read them without locking
+	"""
+	def __init__(self, clock: Clock = system_clock):
+		'''
+		:param clock: Time source of the last success and its age
+		'''
+		self.clock = clock
+		self.attempts: int = 0						# Retrievals attempted
+		self.successes: int = 0						# Retrievals that returned parsed data
+		self.bytes_downloaded: int = 0				# Total bytes of XML received
+		self.parse_duration_s: float = 0.0			# Duration of the last XML parse
+		self.parse_duration_total_s: float = 0.0	# Total time spent parsing XML
+		self.stations_missing: int = 0				# Requested stations absent from the last successful retrieval
+		self.last_success_monotonic: float | None = None	# clock.monotonic() of the last success
+
+	@property
+	def last_success_age(self) -> float | None:
+		"""Seconds since the last successful retrieval, None if there has not been one"""
+		if self.last_success_monotonic is None:
+			return None
+		return self.clock.monotonic() - self.last_success_monotonic
+
 def retrieve_METAR_of_stations(station_id_list: list[str],
-							   logger: logging.Logger = logging.getLogger('retrieve_METAR_of_stations')
+							   logger: logging.Logger = logging.getLogger('retrieve_METAR_of_stations'),
+							   fetch_stats: METAR_Fetch_Stats | None = None,
+							   base_url: str = aviation_weather_dataserver_base_url,
+							   timeout: float | None = 30.0
 							   ) -> list[METAR | None]:
 	'''
 	Retrieves and parses METAR data for a list of stations provided by their station IDs
 
 	:param station_id_list: list of station ID strings to generate METARs from
+	:param fetch_stats: Optional, statistics object to record bytes downloaded, parse duration and missing stations into
+	:param base_url: Dataserver URL the stationString parameter is appended to, e.g. a METAR_Fixture_Server for benchmarks
+	:param timeout: Seconds to wait on the server before failing, None waits forever
 	:return: list of METAR objects (or None if failure) corresponding to station IDs in argument list
 	'''
+	import urllib.request
+	from urllib.error import URLError, HTTPError, ContentTooShortError
+	from http.client import HTTPException
+	import xml.etree.ElementTree as ET
+
 	# Initialize the return list
 	metar_data_list: list[METAR | None] = [None]*len(station_id_list)
 
@@ -45,39 +88,50 @@ def retrieve_METAR_of_stations(station_id_list: list[str],
 	logger.debug(f'Station String: {station_id_str}')
 
 	# Get the request URL to the aviationweather.gov server
-	url = ''.join((aviation_weather_dataserver_base_url,
+	url = ''.join((base_url,
 		f'stationString={station_id_str}'
 	))
 	logger.debug(f'URL: {url}')
 
 	# Retrieve the server result the METAR data
 	try:
-		with urllib.request.urlopen(url) as metarURL:
+		with urllib.request.urlopen(url, timeout = timeout) as metarURL:
 			result_xml = metarURL.read()
-	except (HTTPError, URLError, ContentTooShortError):
+	except (HTTPError, URLError, ContentTooShortError, HTTPException, TimeoutError):
 		logger.exception(f'Error retreiving data from {url}')
 		raise METAR_Retrieve_Failure(f'Error retreiving data from {url}')
 	
 	if result_xml == None:
 		logger.debug(f'No XML from url: {url}')
 		raise METAR_Retrieve_Failure(f'No xml received from URL requests: {url}')
+	if fetch_stats is not None:
+		fetch_stats.bytes_downloaded += len(result_xml)
 
 	# Parse the retrieved data
+	parse_start = perf_counter()
 	try:
 		result_dict = parse_METAR_xml(result_xml)
-	except ValueError:
+	except (ValueError, ET.ParseError):
 		logger.debug(f'parsing failure')
 		raise METAR_Retrieve_Failure(f'Failure to parse retrieved METAR xml from url: {url}')
+	finally:
+		if fetch_stats is not None:
+			fetch_stats.parse_duration_s = perf_counter() - parse_start
+			fetch_stats.parse_duration_total_s += fetch_stats.parse_duration_s
 
 	# Populate the output list with the retrieved data
+	stations_missing = 0
 	for station_id in station_id_list:
 		try:
 			station_metar = result_dict[station_id]
 		except KeyError:
 			logger.error(f'No METAR data retrieved for: {station_id}')
+			stations_missing += 1
 			continue
 		else:
 			metar_data_list[station_id_list.index(station_id)] = station_metar
+	if fetch_stats is not None:
+		fetch_stats.stations_missing = stations_missing
 
 	return metar_data_list
 
@@ -107,6 +161,8 @@ def parse_METAR_xml(metarXML: str, logger: logging.Logger | None = None) -> dict
 	if logger is None:
 		logger = logging.getLogger(f'parse_METAR_XML')
 
+	import xml.etree.ElementTree as ET
+
 	# Create an element tree from the text retrieved from dataserver
 	tree = ET.ElementTree(ET.fromstring(metarXML))
 	root = tree.getroot()
@@ -174,6 +230,9 @@ def parse_METAR_xml(metarXML: str, logger: logging.Logger | None = None) -> dict
 
 def check_Server_Connection(logger: logging.Logger = logging.getLogger('check_Server_Connection')) -> bool:
 	"""Attempts to reach the aviationweather.gov/cgi-bin/data/dataserver, returns success as bool"""
+	import urllib.request
+	from urllib.error import URLError, HTTPError, ContentTooShortError
+
 	success = False
 	try:
 		urllib.request.urlopen(r'https://aviationweather.gov/cgi-bin/data/dataserver.php?')
@@ -197,10 +256,21 @@ def get_station_list_string(station_id_list: list[str]) -> str:
 
 class Aviation_Weather_METAR:
 	"""Object to manage a pre-determined set of stations and retrieve updated METAR data"""
-	def __init__(self, stations: list[str] | None = None):
+	def __init__(self, stations: list[str] | None = None, history: METAR_History_Store | None = None,
+				 base_url: str = aviation_weather_dataserver_base_url, clock: Clock = system_clock):
+		'''
+		:param stations: Station IDs to retrieve
+		:param history: Optional store that receives the new observations of every successful retrieval
+		:param base_url: Dataserver URL to retrieve from, defaults to aviationweather.gov
+		:param clock: Time source of the retrieval statistics
+		'''
 		self._logger = logging.getLogger(f'{self.__class__.__name__}')
+		self.history = history
+		self.base_url = base_url
+		self._clock = clock
 
 		self._metar_data: dict[str, METAR | None] = {}	# Data dictionary, holds the current data for the stations that this object manages
+		self.fetch_stats = METAR_Fetch_Stats(clock)		# Retrieval statistics, for monitoring
 
 		#  initialize the metar_data dictionary with the set of input stations (if present)
 		if stations is not None:
@@ -222,14 +292,20 @@ class Aviation_Weather_METAR:
 		Source is aviationweather.gov dataserver
 		'''
 
+		self.fetch_stats.attempts += 1
 		try:
-			metar_list = retrieve_METAR_of_stations(self.station_id_list)
+			metar_list = retrieve_METAR_of_stations(self.station_id_list, fetch_stats = self.fetch_stats,
+														base_url = self.base_url)
 		except METAR_Retrieve_Failure:
 			self._logger.error(f'Failure to retrieve METAR data')
 			pass
 		else:
 			for station in self.station_id_list:
 				self._metar_data[station] = metar_list[self.station_id_list.index(station)]
+			self.fetch_stats.successes += 1
+			self.fetch_stats.last_success_monotonic = self._clock.monotonic()
+			if self.history is not None:
+				self.history.record(self._metar_data)
 			return True
 		return False
 	
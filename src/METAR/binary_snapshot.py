@@ -0,0 +1,233 @@
+from __future__ import annotations
+import math
+import struct
+import typing
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+from METAR.METAR import METAR
+
+# Layout, all little endian:
+#   header          magic, version, taken (UTC epoch seconds, NaN if unknown), station count, string count
+#   string offsets  string count + 1 offsets into the string blob
+#   string blob     UTF-8, every distinct string once (station IDs, raw text, flight categories, ...)
+#   station records fixed width, one per station in dict order
+#   sky records     fixed width, referenced by (first, count) from the station records
+# Missing values are NaN for floats, NONE_INDEX for strings and NONE_INT for integers
+MAGIC = b'MTRS'
+VERSION = 1
+HEADER = struct.Struct('<4sHdII')
+STATION_RECORD = struct.Struct('<IBII' + 'd'*11 + 'ii' + 'I'*4 + 'IH')
+SKY_RECORD = struct.Struct('<Ii')
+NONE_INDEX = 0xFFFFFFFF
+NONE_INT = -2**31
+
+# Station record flags
+_PRESENT = 0x01                 # A METAR, rather than None
+_NAIVE_TIME = 0x02              # observation_time had no timezone
+_VARIABLE_WIND = 0x04           # wind_dir_degrees is 'VRB'
+
+_FLOAT_FIELDS = ('latitude', 'longitude', 'temp_c', 'dewpoint_c', 'visibility_statute_mi', 'altim_in_hg',
+                 'sea_level_pressure_mb', 'precip_in', 'elevation_m')
+_INT_FIELDS = ('wind_speed_kt', 'wind_gust_kt')
+_STRING_FIELDS = ('wx_string', 'flight_category', 'metar_type', 'quality_control_flag')
+
+class Snapshot_Format_Error(ValueError):
+    """The data is not a binary METAR snapshot this version can decode"""
+
+def _float_or_nan(value: float | None) -> float:
+    return math.nan if value is None else float(value)
+
+def _int_or_none(value: int | None) -> int:
+    return NONE_INT if value is None else int(value)
+
+def encode_snapshot(metar_data: typing.Mapping[str, METAR | None], taken: datetime | None = None) -> bytes:
+    """
+    Encode station ID to METAR (or None) into the binary snapshot format
+
+    :param metar_data: The METAR data to encode
+    :param taken: When the data was retrieved, optional
+    :return: The encoded snapshot
+    """
+    strings: dict[str, int] = {}
+    def intern(value: str | None) -> int:
+        if value is None:
+            return NONE_INDEX
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    records = bytearray(STATION_RECORD.size*len(metar_data))
+    sky_records = bytearray()
+    sky_count_total = 0         # Sky records so far, also the first sky record of the next station
+    offset = 0
+    for station_id, metar in metar_data.items():
+        if metar is None:
+            STATION_RECORD.pack_into(records, offset, intern(station_id), 0, NONE_INDEX, NONE_INDEX,
+                                     *[math.nan]*11, NONE_INT, NONE_INT, *[NONE_INDEX]*4, sky_count_total, 0)
+            offset += STATION_RECORD.size
+            continue
+
+        flags = _PRESENT
+        observation_time = metar._observation_time
+        if observation_time is None:
+            observation_timestamp = math.nan
+        elif observation_time.tzinfo is None:
+            flags |= _NAIVE_TIME
+            observation_timestamp = observation_time.replace(tzinfo=timezone.utc).timestamp()
+        else:
+            observation_timestamp = observation_time.timestamp()
+
+        wind_dir_degrees = metar._wind_dir_degrees
+        if wind_dir_degrees == 'VRB':
+            flags |= _VARIABLE_WIND
+            wind_dir_degrees = None
+
+        sky_condition = metar._sky_condition
+        for sky in sky_condition:
+            sky_records += SKY_RECORD.pack(intern(sky.get('sky_cover')), _int_or_none(sky.get('cloud_base_ft_agl')))
+
+        STATION_RECORD.pack_into(records, offset,
+            intern(station_id), flags, intern(metar.station), intern(metar.raw_text),
+            observation_timestamp, _float_or_nan(wind_dir_degrees),
+            _float_or_nan(metar._latitude), _float_or_nan(metar._longitude),
+            _float_or_nan(metar._temp_c), _float_or_nan(metar._dewpoint_c),
+            _float_or_nan(metar._visibility_statute_mi), _float_or_nan(metar._altim_in_hg),
+            _float_or_nan(metar._sea_level_pressure_mb), _float_or_nan(metar._precip_in),
+            _float_or_nan(metar._elevation_m),
+            _int_or_none(metar._wind_speed_kt), _int_or_none(metar._wind_gust_kt),
+            intern(metar._wx_string), intern(metar.flight_category), intern(metar.metar_type), intern(metar.quality_control_flag),
+            sky_count_total, len(sky_condition))
+        sky_count_total += len(sky_condition)
+        offset += STATION_RECORD.size
+
+    encoded_strings = [value.encode('utf-8') for value in strings]
+    string_offsets = [0]*(len(encoded_strings) + 1)
+    position = 0
+    for index, encoded in enumerate(encoded_strings):
+        position += len(encoded)
+        string_offsets[index + 1] = position
+
+    return b''.join((
+        HEADER.pack(MAGIC, VERSION, math.nan if taken is None else taken.timestamp(), len(metar_data), len(encoded_strings)),
+        struct.pack(f'<{len(string_offsets)}I', *string_offsets),
+        *encoded_strings,
+        records,
+        sky_records,
+    ))
+
+class Binary_Snapshot(Mapping):
+    """
+    Read-only station ID to METAR (or None) mapping over an encoded snapshot
+
+    Only the station IDs are decoded up front, a METAR is materialized (and cached) the first time its station
+    is accessed. Use to_dict() for a plain, mutable dict of every station
+    """
+
+    def __init__(self, data: bytes | bytearray | memoryview):
+        """
+        :param data: An encoded snapshot, kept by reference
+        :raises Snapshot_Format_Error: The data is not a snapshot of this version, or is truncated
+        """
+        self._data = memoryview(data).cast('B') if not isinstance(data, bytes) else data
+        if len(self._data) < HEADER.size:
+            raise Snapshot_Format_Error(f'Snapshot shorter than its header: {len(self._data)} bytes')
+        magic, version, taken, station_count, string_count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise Snapshot_Format_Error(f'Not a binary METAR snapshot, magic: {bytes(magic)!r}')
+        if version != VERSION:
+            raise Snapshot_Format_Error(f'Unsupported binary METAR snapshot version: {version}')
+        self.taken: datetime | None = None if math.isnan(taken) else datetime.fromtimestamp(taken, timezone.utc)
+
+        offsets_start = HEADER.size
+        try:
+            self._string_offsets = struct.unpack_from(f'<{string_count + 1}I', self._data, offsets_start)
+        except struct.error:
+            raise Snapshot_Format_Error(f'Truncated binary METAR snapshot: {len(self._data)} bytes')
+        self._strings_start = offsets_start + 4*(string_count + 1)
+        self._records_start = self._strings_start + self._string_offsets[-1]
+        self._sky_start = self._records_start + STATION_RECORD.size*station_count
+        self._sky_count = 0
+        if len(self._data) < self._sky_start:
+            raise Snapshot_Format_Error(f'Truncated binary METAR snapshot: {len(self._data)} bytes')
+        if station_count:
+            last = STATION_RECORD.unpack_from(self._data, self._sky_start - STATION_RECORD.size)
+            self._sky_count = last[-2] + last[-1]
+        if len(self._data) < self._sky_start + SKY_RECORD.size*self._sky_count:
+            raise Snapshot_Format_Error(f'Truncated binary METAR snapshot: {len(self._data)} bytes')
+
+        # Station ID -> record index, the one part decoded eagerly
+        self._index: dict[str, int] = {}
+        for record in range(station_count):
+            station_index, = struct.unpack_from('<I', self._data, self._records_start + STATION_RECORD.size*record)
+            self._index[self._string(station_index)] = record
+        self._cache: dict[str, METAR | None] = {}
+
+    def _string(self, index: int) -> str | None:
+        if index == NONE_INDEX:
+            return None
+        start = self._strings_start + self._string_offsets[index]
+        return str(self._data[start:self._strings_start + self._string_offsets[index + 1]], 'utf-8')
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._index)
+
+    def __contains__(self, station_id: object) -> bool:
+        return station_id in self._index
+
+    def __getitem__(self, station_id: str) -> METAR | None:
+        try:
+            return self._cache[station_id]
+        except KeyError:
+            pass
+        metar = self._decode(self._index[station_id])
+        self._cache[station_id] = metar
+        return metar
+
+    def _decode(self, record: int) -> METAR | None:
+        """Materialize the METAR of a station record"""
+        values = STATION_RECORD.unpack_from(self._data, self._records_start + STATION_RECORD.size*record)
+        flags = values[1]
+        if not flags & _PRESENT:
+            return None
+        string = self._string
+        observation_timestamp, wind_dir_degrees = values[4], values[5]
+        floats = values[6:15]
+        wind_speed_kt, wind_gust_kt = values[15:17]
+        wx_string, flight_category, metar_type, quality_control_flag = values[17:21]
+        sky_first, sky_count = values[21:23]
+
+        observation_time = None
+        if not math.isnan(observation_timestamp):
+            observation_time = datetime.fromtimestamp(observation_timestamp, timezone.utc)
+            if flags & _NAIVE_TIME:
+                observation_time = observation_time.replace(tzinfo=None)
+        if flags & _VARIABLE_WIND:
+            wind_dir_degrees = 'VRB'
+        elif math.isnan(wind_dir_degrees):
+            wind_dir_degrees = None
+
+        sky_condition = []
+        for sky in range(sky_first, sky_first + sky_count):
+            sky_cover, cloud_base_ft_agl = SKY_RECORD.unpack_from(self._data, self._sky_start + SKY_RECORD.size*sky)
+            sky_condition.append({'sky_cover': string(sky_cover),
+                                  'cloud_base_ft_agl': None if cloud_base_ft_agl == NONE_INT else cloud_base_ft_agl})
+
+        return METAR(station=string(values[2]), raw_text=string(values[3]), observation_time=observation_time,
+                     wind_dir_degrees=wind_dir_degrees,
+                     **{field: None if math.isnan(value) else value for field, value in zip(_FLOAT_FIELDS, floats)},
+                     **{field: None if value == NONE_INT else value for field, value in zip(_INT_FIELDS, (wind_speed_kt, wind_gust_kt))},
+                     **{field: string(value) for field, value in zip(_STRING_FIELDS, (wx_string, flight_category, metar_type, quality_control_flag))},
+                     sky_condition=sky_condition)
+
+    def to_dict(self) -> dict[str, METAR | None]:
+        """Plain dict of every station, materializing any METAR not accessed yet"""
+        return {station_id: self[station_id] for station_id in self._index}
+
+def decode_snapshot(data: bytes | bytearray | memoryview) -> Binary_Snapshot:
+    """Lazily decode an encoded snapshot, see Binary_Snapshot"""
+    return Binary_Snapshot(data)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import time
+import typing
+from threading import Condition
+from datetime import datetime, timedelta, timezone
+
+class Clock(typing.Protocol):
+    """
+    Time source of the map and the METAR thread
+
+    Intervals (blinks, update intervals, stale data) are measured on the monotonic time, which never jumps with NTP
+    or DST. Wall time is only for what depends on the time of day, like sunrise and sunset
+    """
+
+    def monotonic(self) -> float:
+        """Seconds on a monotonic timeline, only differences are meaningful"""
+
+    def monotonic_ns(self) -> int:
+        """monotonic() in integer nanoseconds, the cheapest read, for per-frame use"""
+
+    def now(self) -> datetime:
+        """Current wall time, timezone aware in UTC"""
+
+    def sleep(self, seconds: float) -> None:
+        """Block for seconds of this clock's time"""
+
+class System_Clock(Clock):
+    """The real time of the system"""
+
+    monotonic = staticmethod(time.monotonic)
+    monotonic_ns = staticmethod(time.monotonic_ns)
+    sleep = staticmethod(time.sleep)
+
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+class Virtual_Clock(Clock):
+    """
+    Clock that only moves when advanced, for running days of map time in a test in moments
+
+    sleep() blocks until another thread advances the clock past the sleeper's deadline, so a thread running on the
+    virtual clock follows it exactly. wait_for_sleepers() lets the advancing thread step in lockstep with it
+    """
+
+    def __init__(self, start: datetime = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)):
+        """
+        :param start: Wall time at creation, naive times are taken as UTC
+        """
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        self._start = start.astimezone(timezone.utc)
+        self._elapsed_ns: int = 0
+        self._condition = Condition()
+        self._deadlines: list[int] = []     # Of the threads sleeping on the clock
+
+    def monotonic(self) -> float:
+        return self._elapsed_ns/1e9
+
+    def monotonic_ns(self) -> int:
+        return self._elapsed_ns
+
+    def now(self) -> datetime:
+        return self._start + timedelta(microseconds = self._elapsed_ns//1000)
+
+    def advance(self, duration: timedelta | float) -> None:
+        """Move time forward by a timedelta or seconds, waking the sleepers whose deadline passed"""
+        seconds = duration.total_seconds() if isinstance(duration, timedelta) else duration
+        if seconds < 0:
+            raise ValueError(f'A clock cannot go backwards: {duration}')
+        with self._condition:
+            self._elapsed_ns += round(seconds*1e9)
+            self._condition.notify_all()
+
+    def advance_to(self, time: datetime) -> None:
+        """Move time forward to a wall time"""
+        if time.tzinfo is None:
+            time = time.replace(tzinfo=timezone.utc)
+        self.advance(time - self.now())
+
+    def sleep(self, seconds: float) -> None:
+        with self._condition:
+            deadline = self._elapsed_ns + round(seconds*1e9)
+            self._deadlines.append(deadline)
+            self._condition.notify_all()
+            try:
+                self._condition.wait_for(lambda: self._elapsed_ns >= deadline)
+            finally:
+                self._deadlines.remove(deadline)
+
+    def wait_for_sleepers(self, count: int = 1, timeout: float | None = None) -> bool:
+        """
+        Block (in real time) until at least count threads are sleeping on this clock with their deadline still ahead
+
+        :return: False if the timeout passed first
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: sum(deadline > self._elapsed_ns for deadline in self._deadlines) >= count, timeout)
+
+system_clock = System_Clock()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import logging
+import random
+import typing
+from types import TracebackType
+from threading import Thread, Lock
+from time import sleep
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from METAR.synthetic import Synthetic_METAR_Population, to_dataserver_xml
+
+class METAR_Fixture_Server:
+    """
+    Local stand-in for the aviationweather.gov dataserver, serving a Synthetic_METAR_Population
+
+    Point retrieve_METAR_of_stations (or an Aviation_Weather_METAR) at base_url. Latency, server errors and
+    truncated responses can be injected to exercise the retrieval paths. Advancing the population between
+    requests serves the new reports
+    """
+
+    def __init__(self, population: Synthetic_METAR_Population,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 truncate_rate: float = 0.0,
+                 seed: int = 0):
+        """
+        :param population: The METARs to serve
+        :param host: Interface to listen on, defaults to localhost only
+        :param port: TCP port, defaults to a free port (see base_url)
+        :param latency: Seconds to wait before answering each request
+        :param error_rate: Fraction of requests answered with a 503
+        :param truncate_rate: Fraction of requests answered with XML cut off halfway
+        :param seed: Seed for the choice of failed requests
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.population = population
+        self.population_lock = Lock()       # Hold while advancing the population from another thread
+        self.latency = latency
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self._rng = random.Random(seed)
+        self.requests: int = 0
+        self.errors_served: int = 0
+        self.truncations_served: int = 0
+        # The last response body, reused while the population has not advanced, so benchmarks time the client
+        self._cached: tuple[tuple[datetime, tuple[str, ...]], bytes] | None = None
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Thread | None = None
+
+    def __enter__(self) -> METAR_Fixture_Server:
+        self.start()
+        return self
+
+    def __exit__(self, exception_type: typing.Optional[typing.Type[BaseException]],
+                 exception_value: typing.Optional[BaseException],
+                 traceback: typing.Optional[TracebackType],
+    ) -> None:
+        self.close()
+        return
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """The (host, port) the server is bound to"""
+        return self._server.server_address[:2]
+
+    @property
+    def base_url(self) -> str:
+        """Dataserver URL to which stationString=... is appended, like aviation_weather_dataserver_base_url"""
+        host, port = self.address
+        return f'http://{host}:{port}/cgi-bin/data/dataserver.php?datasource=metars&requestType=retrieve&format=xml&'
+
+    def start(self) -> None:
+        """Serve in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = Thread(target=self._server.serve_forever, name=f'{self.__class__.__name__}', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop serving"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def respond(self, query: str) -> tuple[int, bytes]:
+        """The (status, body) for a dataserver query string, with failures injected"""
+        self.requests += 1
+        if self.latency:
+            sleep(self.latency)
+        roll = self._rng.random()
+        if roll < self.error_rate:
+            self.errors_served += 1
+            return 503, b'Service Unavailable'
+
+        station_string = parse_qs(query).get('stationString', [''])[0]
+        stations = [station_id for station_id in station_string.replace(' ', ',').split(',') if station_id]
+        with self.population_lock:
+            key = (self.population.time, tuple(stations))
+            if self._cached is not None and self._cached[0] == key:
+                body = self._cached[1]
+            else:
+                body = to_dataserver_xml(self.population.snapshot(stations).values())
+                self._cached = (key, body)
+        if roll < self.error_rate + self.truncate_rate:
+            self.truncations_served += 1
+            body = body[:len(body)//2]
+        return 200, body
+
+    def _make_handler(self) -> typing.Type[BaseHTTPRequestHandler]:
+        """Build the request handler class bound to this server"""
+        fixture_server = self
+
+        class Fixture_Request_Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                if url.path != '/cgi-bin/data/dataserver.php':
+                    self.send_error(404)
+                    return
+                status, body = fixture_server.respond(url.query)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/xml' if status == 200 else 'text/plain')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: typing.Any) -> None:
+                fixture_server._logger.debug(f'{self.address_string()} {format % args}')
+
+        return Fixture_Request_Handler
@@ -0,0 +1,245 @@
+from __future__ import annotations
+import logging
+import queue
+import sqlite3
+import typing
+from types import TracebackType
+from pathlib import Path
+from threading import Thread, Lock
+from datetime import datetime, timedelta, timezone
+
+from METAR.METAR import METAR
+from METAR.clock import Clock, system_clock
+
+# One row per observation, the primary key deduplicates repeated retrievals of the same METAR and doubles as the
+# (station, time) index. Only the fields the map uses are columns, the rest can be recovered from raw_text
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS observations (
+    station TEXT NOT NULL,
+    observation_time INTEGER NOT NULL,
+    flight_category TEXT,
+    wind_dir_degrees,
+    wind_speed_kt INTEGER,
+    wind_gust_kt INTEGER,
+    visibility_statute_mi REAL,
+    temp_c REAL,
+    dewpoint_c REAL,
+    altim_in_hg REAL,
+    wx_string TEXT,
+    raw_text TEXT,
+    PRIMARY KEY (station, observation_time)
+) WITHOUT ROWID;
+-- Covers the window scans of category_transitions and the retention deletes
+CREATE INDEX IF NOT EXISTS observations_time ON observations (observation_time, flight_category);
+'''
+
+COLUMNS = ('station', 'observation_time', 'flight_category', 'wind_dir_degrees', 'wind_speed_kt', 'wind_gust_kt',
+           'visibility_statute_mi', 'temp_c', 'dewpoint_c', 'altim_in_hg', 'wx_string', 'raw_text')
+INSERT = f'INSERT OR IGNORE INTO observations ({", ".join(COLUMNS)}) VALUES ({", ".join("?"*len(COLUMNS))})'
+SELECT = f'SELECT {", ".join(COLUMNS)} FROM observations'
+
+_STOP = object()        # Queue sentinel, stops the writer once everything before it is written
+
+def _timestamp(time: datetime) -> int:
+    """UTC epoch seconds, naive datetimes are taken as UTC like METAR observation times"""
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return int(time.timestamp())
+
+def _row_to_METAR(row: tuple) -> METAR:
+    values = dict(zip(COLUMNS, row))
+    values['observation_time'] = datetime.fromtimestamp(values['observation_time'], timezone.utc)
+    return METAR(**values)
+
+class METAR_History_Store:
+    """
+    SQLite history of METAR observations
+
+    record() only queues the observations, a background writer inserts them in batched transactions, so the
+    retrieving thread never waits on the SD card. The database is in WAL mode, queries run on their own
+    connection alongside the writer. Observations older than the retention are deleted by the writer
+    """
+
+    def __init__(self, path: Path | str,
+                 retention: timedelta | None = timedelta(days = 400),
+                 batch_size: int = 1000,
+                 queue_size: int = 100000,
+                 retention_check_interval: float = 3600.0,
+                 clock: Clock = system_clock):
+        """
+        :param path: SQLite database file, created if it does not exist
+        :param retention: Observations older than this are deleted, None keeps everything
+        :param batch_size: Maximum observations per write transaction
+        :param queue_size: Maximum observations waiting for the writer, further observations are dropped and counted
+        :param retention_check_interval: Seconds between deletions of expired observations
+        :param clock: Time source of the retention, the age of an observation is taken against its now()
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.path = Path(path)
+        self.retention = retention
+        self.batch_size = batch_size
+        self.retention_check_interval = retention_check_interval
+        self.clock = clock
+        self.dropped: int = 0               # Observations dropped because the writer fell behind
+        self.written: int = 0               # Observations handed to SQLite, including duplicates it ignored
+
+        # Observation time last queued per station, most retrievals repeat the previous observation
+        self._last_queued: dict[str, int] = {}
+        self._queue: queue.Queue = queue.Queue(maxsize = queue_size)
+
+        # The schema is created up front so queries work before the writer's first batch
+        with sqlite3.connect(self.path) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+        connection.close()
+        self._read_connection = sqlite3.connect(self.path, check_same_thread = False)
+        self._read_lock = Lock()
+
+        self._writer = Thread(target = self._write_loop, name = f'{self.__class__.__name__}_writer', daemon = True)
+        self._writer.start()
+
+    def __enter__(self) -> METAR_History_Store:
+        return self
+
+    def __exit__(self, exception_type: typing.Optional[typing.Type[BaseException]],
+                 exception_value: typing.Optional[BaseException],
+                 traceback: typing.Optional[TracebackType],
+    ) -> None:
+        self.close()
+        return
+
+    def record(self, metar_data: typing.Mapping[str, METAR | None]) -> int:
+        """
+        Queue the new observations of a retrieval for writing, never blocks
+
+        :param metar_data: Station ID to METAR, as held by Aviation_Weather_METAR
+        :return: Number of observations queued
+        """
+        queued = 0
+        for station_id, metar in metar_data.items():
+            if metar is None or metar.observation_time is None:
+                continue
+            observation_time = _timestamp(metar.observation_time)
+            if self._last_queued.get(station_id) == observation_time:
+                continue
+            row = (station_id, observation_time, metar.flight_category, metar.wind_dir_degrees, metar.wind_speed_kt,
+                   metar.wind_gust_kt, metar.visibility_statute_mi, metar.temp_c, metar.dewpoint_c, metar.altim_in_hg,
+                   metar.wx_string, metar.raw_text)
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+                continue
+            self._last_queued[station_id] = observation_time
+            queued += 1
+        return queued
+
+    def flush(self) -> None:
+        """Wait until every observation queued so far is written"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write what is queued, stop the writer and close the database"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        with self._read_lock:
+            self._read_connection.close()
+
+    def _write_loop(self) -> None:
+        """Writer thread, inserts queued observations in batches of up to batch_size per transaction"""
+        connection = sqlite3.connect(self.path)
+        # Safe in WAL mode, a power loss can only lose the last transactions, never corrupt the database
+        connection.execute('PRAGMA synchronous=NORMAL')
+        next_retention_check = self.clock.monotonic()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not _STOP]
+            running = len(rows) == len(batch)
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany(INSERT, rows)
+                    self.written += len(rows)
+                if self.retention is not None and self.clock.monotonic() >= next_retention_check:
+                    next_retention_check = self.clock.monotonic() + self.retention_check_interval
+                    self._delete_expired(connection)
+            except sqlite3.Error:
+                self._logger.exception(f'Failed to write {len(rows)} observations to {self.path}')
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        connection.close()
+
+    def _delete_expired(self, connection: sqlite3.Connection) -> None:
+        cutoff = _timestamp(self.clock.now() - self.retention)
+        with connection:
+            deleted = connection.execute('DELETE FROM observations WHERE observation_time < ?', (cutoff,)).rowcount
+        if deleted:
+            self._logger.info(f'Deleted {deleted} observations older than {self.retention}')
+
+    def _query(self, sql: str, parameters: typing.Sequence = ()) -> list[tuple]:
+        with self._read_lock:
+            return self._read_connection.execute(sql, parameters).fetchall()
+
+    def count(self) -> int:
+        """Number of stored observations"""
+        return self._query('SELECT COUNT(*) FROM observations')[0][0]
+
+    def latest(self, station_id: str, count: int = 1) -> list[METAR]:
+        """The latest count observations of a station, newest first"""
+        rows = self._query(f'{SELECT} WHERE station = ? ORDER BY observation_time DESC LIMIT ?', (station_id, count))
+        return [_row_to_METAR(row) for row in rows]
+
+    def latest_per_station(self, count: int = 1, stations: typing.Iterable[str] | None = None) -> dict[str, list[METAR]]:
+        """
+        The latest count observations of each station, newest first
+
+        One primary key range lookup per station, which stays fast however much history is stored
+
+        :param count: Observations per station
+        :param stations: Stations to include, defaults to every station in the store
+        """
+        if stations is None:
+            stations = [row[0] for row in self._query('SELECT DISTINCT station FROM observations')]
+        sql = f'{SELECT} WHERE station = ? ORDER BY observation_time DESC LIMIT ?'
+        result: dict[str, list[METAR]] = {}
+        with self._read_lock:
+            for station_id in stations:
+                rows = self._read_connection.execute(sql, (station_id, count)).fetchall()
+                result[station_id] = [_row_to_METAR(row) for row in rows]
+        return result
+
+    def category_transitions(self, start: datetime, end: datetime,
+                             station_id: str | None = None) -> list[tuple[str, datetime, str | None, str | None]]:
+        """
+        Flight category changes between consecutive observations within a time window
+
+        :param start: Start of the window, inclusive
+        :param end: End of the window, inclusive
+        :param station_id: Only this station, defaults to every station
+        :return: (station, observation time, previous category, new category), ordered by station then time
+        """
+        parameters: list = [_timestamp(start), _timestamp(end)]
+        station_filter = ''
+        if station_id is not None:
+            station_filter = 'AND station = ?'
+            parameters.append(station_id)
+        rows = self._query(f'''
+            SELECT station, observation_time, previous_category, flight_category FROM (
+                SELECT station, observation_time, flight_category,
+                       LAG(flight_category) OVER (PARTITION BY station ORDER BY observation_time) AS previous_category
+                FROM observations
+                WHERE observation_time BETWEEN ? AND ? {station_filter}
+            )
+            WHERE previous_category IS NOT flight_category AND previous_category IS NOT NULL
+            ORDER BY station, observation_time
+        ''', parameters)
+        return [(station, datetime.fromtimestamp(observation_time, timezone.utc), previous_category, flight_category)
+                for station, observation_time, previous_category, flight_category in rows]
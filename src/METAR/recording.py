@@ -0,0 +1,116 @@
+from __future__ import annotations
+import logging
+import math
+import struct
+import typing
+from types import TracebackType
+from pathlib import Path
+from datetime import datetime, timezone
+
+from METAR.METAR import METAR
+from METAR.binary_snapshot import HEADER, encode_snapshot, decode_snapshot, Binary_Snapshot
+
+# A recording is a file header followed by length prefixed binary snapshots (see METAR.binary_snapshot),
+# appended in the order they were retrieved:
+#   file header     magic, version
+#   record          snapshot length, then the encoded snapshot, its header holds the retrieval time
+RECORDING_MAGIC = b'MTRR'
+RECORDING_VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+RECORD_HEADER = struct.Struct('<I')
+
+class Recording_Format_Error(ValueError):
+    """The file is not a METAR recording this version can read"""
+
+class METAR_Recorder:
+    """
+    Appends retrieved METAR snapshots to a recording, for later replay
+
+    Has the same record() method as METAR_History_Store, so it can stand in as the history of an Aviation_Weather_METAR
+    """
+
+    def __init__(self, path: Path | str):
+        """
+        :param path: Recording to create or append to
+        :raises Recording_Format_Error: path exists and is not a recording
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.path = Path(path)
+        self._file = open(self.path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION))
+            self._file.flush()
+        else:
+            with open(self.path, 'rb') as f:
+                _check_file_header(f.read(FILE_HEADER.size), self.path)
+        self.snapshot_count: int = 0        # Snapshots recorded by this recorder
+
+    def __enter__(self) -> METAR_Recorder:
+        return self
+
+    def __exit__(self, exception_type: typing.Optional[typing.Type[BaseException]],
+                 exception_value: typing.Optional[BaseException],
+                 traceback: typing.Optional[TracebackType],
+    ) -> None:
+        self.close()
+        return
+
+    def record(self, metar_data: typing.Mapping[str, METAR | None], taken: datetime | None = None) -> None:
+        """
+        Append a snapshot
+
+        :param metar_data: Station ID to METAR (or None)
+        :param taken: When the data was retrieved, defaults to now (UTC). Snapshots must be recorded in time order
+        """
+        if taken is None:
+            taken = datetime.now(timezone.utc)
+        encoded = encode_snapshot(metar_data, taken)
+        self._file.write(RECORD_HEADER.pack(len(encoded)) + encoded)
+        self._file.flush()
+        self.snapshot_count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+def _check_file_header(header: bytes, path: Path | str) -> None:
+    if len(header) < FILE_HEADER.size:
+        raise Recording_Format_Error(f'Not a METAR recording, too short: {path}')
+    magic, version = FILE_HEADER.unpack(header)
+    if magic != RECORDING_MAGIC:
+        raise Recording_Format_Error(f'Not a METAR recording, magic {magic!r}: {path}')
+    if version != RECORDING_VERSION:
+        raise Recording_Format_Error(f'Unsupported METAR recording version {version}: {path}')
+
+def iter_recording(path: Path | str, logger: logging.Logger = logging.getLogger('iter_recording')) -> typing.Iterator[tuple[datetime, bytes]]:
+    """
+    Stream the snapshots of a recording without decoding them, one record in memory at a time
+
+    A truncated final record (e.g. the recorder lost power while appending) ends the recording
+
+    :param path: Recording to read
+    :return: Iterator of (retrieval time in UTC, encoded snapshot), decode with METAR.binary_snapshot.decode_snapshot
+    :raises Recording_Format_Error: The file is not a recording, or a snapshot has no retrieval time
+    """
+    with open(path, 'rb') as f:
+        _check_file_header(f.read(FILE_HEADER.size), path)
+        while True:
+            length_bytes = f.read(RECORD_HEADER.size)
+            if not length_bytes:
+                return
+            if len(length_bytes) < RECORD_HEADER.size:
+                logger.warning(f'Truncated record at the end of {path}')
+                return
+            length, = RECORD_HEADER.unpack(length_bytes)
+            encoded = f.read(length)
+            if len(encoded) < length or length < HEADER.size:
+                logger.warning(f'Truncated record at the end of {path}')
+                return
+            taken = HEADER.unpack_from(encoded, 0)[2]
+            if math.isnan(taken):
+                raise Recording_Format_Error(f'Snapshot without a retrieval time in {path}')
+            yield datetime.fromtimestamp(taken, timezone.utc), encoded
+
+def read_recording(path: Path | str) -> typing.Iterator[Binary_Snapshot]:
+    """Stream the snapshots of a recording, each lazily decoded (see Binary_Snapshot)"""
+    for _, encoded in iter_recording(path):
+        yield decode_snapshot(encoded)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import struct
+from multiprocessing import shared_memory
+
+# Layout, all little endian:
+#   header  magic, version, flags (set by the writer), control (set by readers), published sequence,
+#           last loop time of the writer, slot size
+#   2 slots slot sequence (odd while being written), length, then slot size bytes of encoded snapshot
+# Snapshot n is written to slot n % 2, so the slot of the published snapshot is never being written
+MAGIC = b'MTSB'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBQdQ')
+SLOT_HEADER = struct.Struct('<QQ')
+SEQUENCE = struct.Struct('<Q')
+_FLAGS_OFFSET = 6
+_CONTROL_OFFSET = 7
+_SEQUENCE_OFFSET = 8
+_LAST_LOOP_TIME_OFFSET = 16
+
+# Flags
+STALE = 0x01                    # The writer's data is stale, readers should show none
+# Control
+STOP = 0x01                     # The writer should exit
+
+class Snapshot_Too_Large_Error(ValueError):
+    """An encoded snapshot does not fit in a slot of the buffer"""
+
+class Shared_Snapshot_Buffer:
+    """
+    Double buffer of encoded snapshots (see METAR.binary_snapshot) in shared memory, one writer process and any
+    number of reader processes
+
+    The writer fills the slot not holding the published snapshot, then publishes it by incrementing the sequence.
+    Each slot has its own sequence, odd while the slot is written, a reader copying a slot checks it is even and
+    unchanged across the copy, and retries otherwise (a seqlock). Nothing is pickled, a read is one copy of the bytes
+    """
+
+    def __init__(self, name: str | None = None, slot_size: int = 1 << 20, create: bool = False):
+        """
+        :param name: Shared memory block to attach to, or to create (a unique name is generated if None)
+        :param slot_size: Bytes per slot when creating, the largest encoded snapshot that can be published
+        :param create: Create the block rather than attach to an existing one
+        """
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + 2*(SLOT_HEADER.size + slot_size))
+            HEADER.pack_into(self._shm.buf, 0, MAGIC, VERSION, 0, 0, 0, 0.0, slot_size)
+            for slot in range(2):
+                SLOT_HEADER.pack_into(self._shm.buf, self._slot_offset(slot, slot_size), 0, 0)
+        else:
+            # Attached blocks stay registered with the resource tracker shared with the creator, which unlinks them
+            self._shm = shared_memory.SharedMemory(name=name)
+            magic, version, _, _, _, _, slot_size = HEADER.unpack_from(self._shm.buf, 0)
+            if magic != MAGIC or version != VERSION:
+                self._shm.close()
+                raise ValueError(f'Not a shared snapshot buffer of version {VERSION}: {name}')
+        self.slot_size: int = slot_size
+        self._owner: bool = create
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @staticmethod
+    def _slot_offset(slot: int, slot_size: int) -> int:
+        return HEADER.size + slot*(SLOT_HEADER.size + slot_size)
+
+    @property
+    def sequence(self) -> int:
+        """Snapshots published so far, the cheapest check for a new one"""
+        return SEQUENCE.unpack_from(self._shm.buf, _SEQUENCE_OFFSET)[0]
+
+    @property
+    def flags(self) -> int:
+        return self._shm.buf[_FLAGS_OFFSET]
+
+    @property
+    def control(self) -> int:
+        return self._shm.buf[_CONTROL_OFFSET]
+
+    @control.setter
+    def control(self, control: int) -> None:
+        """Reader side, single byte writes, unlike a multiprocessing lock they cannot be left held by a killed process"""
+        self._shm.buf[_CONTROL_OFFSET] = control
+
+    @property
+    def last_loop_time(self) -> float | None:
+        """time.monotonic() of the writer's last loop, comparable across processes, None before the first"""
+        last_loop_time = struct.unpack_from('<d', self._shm.buf, _LAST_LOOP_TIME_OFFSET)[0]
+        return last_loop_time or None
+
+    def set_state(self, flags: int, last_loop_time: float) -> None:
+        """Writer side, publish the state flags and the writer's heartbeat"""
+        self._shm.buf[_FLAGS_OFFSET] = flags
+        struct.pack_into('<d', self._shm.buf, _LAST_LOOP_TIME_OFFSET, last_loop_time)
+
+    def publish(self, data: bytes) -> int:
+        """
+        Writer side, publish an encoded snapshot
+
+        :return: The sequence of the published snapshot
+        :raises Snapshot_Too_Large_Error: The snapshot does not fit in a slot
+        """
+        if len(data) > self.slot_size:
+            raise Snapshot_Too_Large_Error(f'Snapshot of {len(data)} bytes does not fit in slots of {self.slot_size} bytes')
+        buf = self._shm.buf
+        sequence = self.sequence + 1
+        offset = self._slot_offset(sequence % 2, self.slot_size)
+        # A writer killed mid-write leaves the slot sequence odd, so it is forced odd rather than incremented
+        writing = SEQUENCE.unpack_from(buf, offset)[0] | 1
+        SEQUENCE.pack_into(buf, offset, writing)                            # Odd, being written
+        data_offset = offset + SLOT_HEADER.size
+        buf[data_offset:data_offset + len(data)] = data
+        SLOT_HEADER.pack_into(buf, offset, writing + 1, len(data))          # Even, complete
+        SEQUENCE.pack_into(buf, _SEQUENCE_OFFSET, sequence)
+        return sequence
+
+    def read(self, retries: int = 100) -> tuple[int, bytes] | None:
+        """
+        Reader side, copy the published snapshot
+
+        :param retries: Attempts at a consistent copy while the writer keeps overwriting the slot
+        :return: (sequence, encoded snapshot), None if nothing was published yet or no copy was consistent
+        """
+        buf = self._shm.buf
+        for _ in range(retries):
+            sequence = self.sequence
+            if sequence == 0:
+                return None
+            offset = self._slot_offset(sequence % 2, self.slot_size)
+            slot_sequence, length = SLOT_HEADER.unpack_from(buf, offset)
+            if slot_sequence & 1 or length > self.slot_size:
+                continue
+            data_offset = offset + SLOT_HEADER.size
+            data = bytes(buf[data_offset:data_offset + length])
+            if SEQUENCE.unpack_from(buf, offset)[0] == slot_sequence:
+                return sequence, data
+        return None
+
+    def close(self) -> None:
+        """Detach, the creator also removes the block"""
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._owner = False
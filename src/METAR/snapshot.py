@@ -0,0 +1,88 @@
+from __future__ import annotations
+import logging
+import json
+import os
+from pathlib import Path
+from datetime import datetime, timezone
+
+from METAR.METAR import METAR
+from METAR.binary_snapshot import MAGIC, encode_snapshot, decode_snapshot
+
+# JSON lines, a header line then one line per station:
+#   {"version": 1, "taken": "<ISO 8601 UTC>"}
+#   {"station": "KOSH", "metar": {...METAR.to_dict()...} | null}
+# or the binary format of METAR.binary_snapshot, told apart by its magic bytes
+SNAPSHOT_VERSION = 1
+
+def write_snapshot(path: Path | str, metar_data: dict[str, METAR | None], taken: datetime | None = None, binary: bool | None = None) -> None:
+    """
+    Atomically write the METAR data to path
+
+    The snapshot is written to a temporary file next to path, synced and renamed over path, so a power loss
+    leaves either the previous snapshot or the new one, never a partial file
+
+    :param path: Snapshot file to write
+    :param metar_data: Station ID to METAR (or None) to persist
+    :param taken: When the data was retrieved, defaults to now (UTC)
+    :param binary: Write the binary format instead of JSON lines, defaults to binary for a .bin suffix
+    """
+    path = Path(path)
+    if taken is None:
+        taken = datetime.now(timezone.utc)
+    if binary is None:
+        binary = path.suffix == '.bin'
+    if binary:
+        _write_atomic(path, encode_snapshot(metar_data, taken))
+        return
+
+    lines = [json.dumps({'version': SNAPSHOT_VERSION, 'taken': taken.isoformat()}, separators=(',', ':'))]
+    for station_id, metar in metar_data.items():
+        lines.append(json.dumps({'station': station_id, 'metar': metar.to_dict() if metar is not None else None}, separators=(',', ':')))
+
+    lines.append('')
+    _write_atomic(path, '\n'.join(lines).encode('utf-8'))
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write to a temporary file next to path, sync it and rename it over path"""
+    temporary_path = path.with_name(f'{path.name}.tmp')
+    with open(temporary_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+def read_snapshot(path: Path | str, logger: logging.Logger = logging.getLogger('read_snapshot')) -> tuple[datetime, dict[str, METAR | None]] | None:
+    """
+    Read a snapshot written by write_snapshot, in either format
+
+    :param path: Snapshot file to read
+    :return: (time the data was retrieved in UTC, station ID to METAR), None if there is no usable snapshot
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) == MAGIC:
+                f.seek(0)
+                snapshot = decode_snapshot(f.read())
+                if snapshot.taken is None:
+                    logger.warning(f'METAR snapshot without a retrieval time in {path}')
+                    return None
+                return snapshot.taken, snapshot.to_dict()
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != SNAPSHOT_VERSION:
+                logger.warning(f'Unsupported METAR snapshot version {header.get("version")} in {path}')
+                return None
+            taken = datetime.fromisoformat(header['taken'])
+            metar_data: dict[str, METAR | None] = {}
+            for line in f:
+                entry = json.loads(line)
+                metar = entry['metar']
+                metar_data[entry['station']] = METAR.from_dict(metar) if metar is not None else None
+    except FileNotFoundError:
+        logger.debug(f'No METAR snapshot at {path}')
+        return None
+    # Snapshot_Format_Error is a ValueError
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        logger.exception(f'Unreadable METAR snapshot at {path}')
+        return None
+    return taken, metar_data
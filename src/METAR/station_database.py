@@ -0,0 +1,316 @@
+from __future__ import annotations
+import logging
+import mmap
+import os
+import struct
+import typing
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+
+# The station list of aviationweather.gov, shipped in the data directory of the repository
+DEFAULT_STATIONS_PATH = Path(__file__).resolve().parents[2] / 'data' / 'aviationweather_stations_compiled_2023_03_02.txt'
+
+# Index layout, all little endian:
+#   header  magic, version, station count, size and mtime (ns) of the stations.txt it was compiled from
+#   keys    station count ICAO IDs, 4 ASCII bytes each, sorted
+#   records fixed width, one per key in the same order
+MAGIC = b'MTSI'
+VERSION = 1
+HEADER = struct.Struct('<4sHIQq')
+KEY_SIZE = 4
+RECORD = struct.Struct('<ffhHB2s2s16s')
+
+# Station flags
+METAR_STATION = 0x01            # Reports METARs
+NEXRAD = 0x02                   # WSR-88D radar site
+TAF = 0x04                      # Issues TAFs
+AIRMET_SIGMET = 0x08            # AIRMET/SIGMET end point
+ARTCC = 0x10                    # Air Route Traffic Control Center
+UPPER_AIR = 0x20                # Rawinsonde site
+WIND_PROFILER = 0x40            # Wind profiler site
+AUTOMATED = 0x80                # ASOS, AWOS or mesonet observations
+
+# Fixed width columns of stations.txt
+_STATE = slice(0, 2)
+_NAME = slice(3, 19)
+_ICAO = slice(20, 24)
+_LATITUDE = slice(39, 45)
+_LONGITUDE = slice(47, 54)
+_ELEVATION = slice(55, 59)
+_METAR_COLUMN = 62
+_NEXRAD_COLUMN = 65
+_AVIATION_COLUMN = 68
+_UPPER_AIR_COLUMN = 71
+_AUTO_COLUMN = 74
+_PRIORITY_COLUMN = 79
+_COUNTRY = slice(81, 83)
+
+class Station_Index_Error(ValueError):
+    """The data is not a station index this version can read"""
+
+class Unknown_Station_Error(ValueError):
+    """Station IDs that are not in the station database"""
+    def __init__(self, station_ids: typing.Sequence[str]):
+        self.station_ids = list(station_ids)
+        super().__init__(f'Unknown station IDs: {", ".join(self.station_ids)}')
+
+@dataclass(frozen=True)
+class Station_Info:
+    """One station of the station database"""
+    icao: str
+    name: str
+    state: str                  # State or province, blank outside the US and Canada
+    country: str                # ISO 3166 country code
+    latitude: float
+    longitude: float
+    elevation_m: int
+    flags: int
+    priority: int               # Plotting priority, 0 is the highest
+
+    @property
+    def reports_metar(self) -> bool:
+        return bool(self.flags & METAR_STATION)
+
+def _degrees(text: str) -> float:
+    """'51 53N' or '176 39W' to signed decimal degrees"""
+    degrees, minutes = text[:-1].split()
+    value = int(degrees) + int(minutes)/60
+    return -value if text[-1] in 'SW' else value
+
+def _parse_line(line: str) -> Station_Info | None:
+    """A station of stations.txt, None for comments, headers and stations without an ICAO ID"""
+    if len(line) < _COUNTRY.stop or line.startswith('!'):
+        return None
+    icao = line[_ICAO].strip()
+    if len(icao) != KEY_SIZE:
+        return None
+    try:
+        latitude = _degrees(line[_LATITUDE])
+        longitude = _degrees(line[_LONGITUDE])
+        elevation_m = int(line[_ELEVATION])
+    except ValueError:
+        return None
+
+    flags = 0
+    if line[_METAR_COLUMN] == 'X':
+        flags |= METAR_STATION
+    if line[_NEXRAD_COLUMN] == 'X':
+        flags |= NEXRAD
+    aviation = line[_AVIATION_COLUMN]
+    if aviation in ('T', 'U'):
+        flags |= TAF
+    if aviation in ('V', 'U'):
+        flags |= AIRMET_SIGMET
+    if aviation == 'A':
+        flags |= ARTCC
+    if line[_UPPER_AIR_COLUMN] == 'X':
+        flags |= UPPER_AIR
+    if line[_UPPER_AIR_COLUMN] == 'W':
+        flags |= WIND_PROFILER
+    if line[_AUTO_COLUMN] in ('A', 'W', 'M'):
+        flags |= AUTOMATED
+    priority = line[_PRIORITY_COLUMN]
+
+    return Station_Info(icao=icao, name=line[_NAME].strip(), state=line[_STATE].strip(), country=line[_COUNTRY].strip(),
+                        latitude=latitude, longitude=longitude, elevation_m=elevation_m, flags=flags,
+                        priority=int(priority) if priority.isdigit() else 9)
+
+def parse_stations_txt(path: Path | str = DEFAULT_STATIONS_PATH) -> dict[str, Station_Info]:
+    """
+    Parse the fixed width stations.txt of aviationweather.gov
+
+    A few ICAO IDs are listed twice, the METAR reporting entry wins, otherwise the first
+
+    :return: Station ID to Station_Info, in file order
+    """
+    stations: dict[str, Station_Info] = {}
+    with open(path, encoding='ascii', errors='replace') as f:
+        for line in f:
+            station = _parse_line(line.rstrip('\n'))
+            if station is None:
+                continue
+            previous = stations.get(station.icao)
+            if previous is None or (station.reports_metar and not previous.reports_metar):
+                stations[station.icao] = station
+    return stations
+
+def encode_station_index(stations: typing.Iterable[Station_Info], source_size: int = 0, source_mtime_ns: int = 0) -> bytes:
+    """Encode stations into the index format, sorted by ICAO ID"""
+    ordered = sorted(stations, key=lambda station: station.icao)
+    keys = b''.join(station.icao.encode('ascii') for station in ordered)
+    records = b''.join(RECORD.pack(station.latitude, station.longitude, station.elevation_m, station.flags,
+                                   station.priority, station.state.encode('ascii'), station.country.encode('ascii'),
+                                   station.name.encode('ascii', errors='replace'))
+                       for station in ordered)
+    return HEADER.pack(MAGIC, VERSION, len(ordered), source_size, source_mtime_ns) + keys + records
+
+def compile_station_index(stations_path: Path | str = DEFAULT_STATIONS_PATH, index_path: Path | str | None = None) -> bytes:
+    """
+    Compile stations.txt into the index format
+
+    :param index_path: Also write the index here, atomically
+    :return: The index
+    """
+    stations_path = Path(stations_path)
+    stat = stations_path.stat()
+    index = encode_station_index(parse_stations_txt(stations_path).values(), stat.st_size, stat.st_mtime_ns)
+    if index_path is not None:
+        index_path = Path(index_path)
+        temporary_path = index_path.with_name(f'{index_path.name}.tmp')
+        temporary_path.write_bytes(index)
+        os.replace(temporary_path, index_path)
+    return index
+
+class _Keys(typing.Sequence[bytes]):
+    """The sorted keys of an index as a sequence, for bisect"""
+    def __init__(self, buffer: typing.Any, count: int):
+        self._buffer = buffer
+        self._count = count
+    def __len__(self) -> int:
+        return self._count
+    def __getitem__(self, index: int) -> bytes:
+        offset = HEADER.size + index*KEY_SIZE
+        return self._buffer[offset:offset + KEY_SIZE]
+
+class Station_Database:
+    """
+    Station lookups by ICAO ID over a compiled station index
+
+    The index is memory mapped, opening it reads the header only and a lookup is a binary search over the mapped keys,
+    O(log n) and only touching the pages it needs. open() compiles the bundled stations.txt into the index the first
+    time, and again whenever the text file changes
+    """
+
+    @classmethod
+    def open(cls, stations_path: Path | str = DEFAULT_STATIONS_PATH, index_path: Path | str | None = None) -> Station_Database:
+        """
+        Open the index of a stations.txt, compiling it if missing or out of date
+
+        :param stations_path: The stations.txt to index
+        :param index_path: Where the index is kept, defaults to the stations.txt path with an .idx suffix. If it cannot
+            be written the index is compiled into memory for this process only
+        """
+        logger = logging.getLogger(cls.__name__)
+        stations_path = Path(stations_path)
+        index_path = Path(index_path) if index_path is not None else stations_path.with_suffix('.idx')
+        stat = stations_path.stat()
+        try:
+            with open(index_path, 'rb') as f:
+                header = f.read(HEADER.size)
+            if len(header) == HEADER.size:
+                magic, version, _, source_size, source_mtime_ns = HEADER.unpack(header)
+                if (magic, version, source_size, source_mtime_ns) == (MAGIC, VERSION, stat.st_size, stat.st_mtime_ns):
+                    return cls(index_path)
+        except FileNotFoundError:
+            pass
+
+        logger.info(f'Compiling station index {index_path} from {stations_path}')
+        try:
+            compile_station_index(stations_path, index_path)
+        except OSError as e:
+            logger.warning(f'Station index not written, compiling it into memory: {e}')
+            return cls(data=compile_station_index(stations_path))
+        return cls(index_path)
+
+    def __init__(self, index_path: Path | str | None = None, data: bytes | None = None):
+        """
+        :param index_path: Compiled index to map
+        :param data: Or the index itself
+        :raises Station_Index_Error: Not an index of this version
+        """
+        self._mmap: mmap.mmap | None = None
+        if index_path is not None:
+            with open(index_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer: typing.Any = self._mmap
+        elif data is not None:
+            buffer = data
+        else:
+            raise ValueError('Either an index_path or the index data is required')
+
+        if len(buffer) < HEADER.size:
+            self.close()
+            raise Station_Index_Error(f'Station index too short: {len(buffer)} bytes')
+        magic, version, count, _, _ = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION or len(buffer) != HEADER.size + count*(KEY_SIZE + RECORD.size):
+            self.close()
+            raise Station_Index_Error(f'Not a station index of version {VERSION}')
+        self._buffer = buffer
+        self._count: int = count
+        self._keys = _Keys(buffer, count)
+        self._records_offset: int = HEADER.size + count*KEY_SIZE
+
+    def _find(self, station_id: str) -> int | None:
+        """Position of a station ID in the index, None if absent"""
+        try:
+            key = station_id.upper().encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        if len(key) != KEY_SIZE:
+            return None
+        index = bisect_left(self._keys, key)
+        if index < self._count and self._keys[index] == key:
+            return index
+        return None
+
+    def _station(self, index: int) -> Station_Info:
+        latitude, longitude, elevation_m, flags, priority, state, country, name = \
+            RECORD.unpack_from(self._buffer, self._records_offset + index*RECORD.size)
+        return Station_Info(icao=self._keys[index].decode('ascii'), name=name.rstrip(b'\0').decode('ascii'),
+                            state=state.rstrip(b'\0').decode('ascii'), country=country.rstrip(b'\0').decode('ascii'),
+                            latitude=latitude, longitude=longitude, elevation_m=elevation_m, flags=flags,
+                            priority=priority)
+
+    def get(self, station_id: str) -> Station_Info | None:
+        index = self._find(station_id)
+        return self._station(index) if index is not None else None
+
+    def __getitem__(self, station_id: str) -> Station_Info:
+        index = self._find(station_id)
+        if index is None:
+            raise KeyError(station_id)
+        return self._station(index)
+
+    def __contains__(self, station_id: object) -> bool:
+        return isinstance(station_id, str) and self._find(station_id) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> typing.Iterator[str]:
+        """Station IDs, sorted"""
+        for index in range(self._count):
+            yield self._keys[index].decode('ascii')
+
+    def stations(self, flags: int = 0) -> typing.Iterator[Station_Info]:
+        """Every station having all of the flags, sorted by ID"""
+        for index in range(self._count):
+            station = self._station(index)
+            if station.flags & flags == flags:
+                yield station
+
+    def unknown(self, station_ids: typing.Iterable[str]) -> list[str]:
+        """The station IDs not in the database, in the order given"""
+        return [station_id for station_id in station_ids if station_id not in self]
+
+    def validate(self, station_ids: typing.Iterable[str]) -> None:
+        """
+        Check every station ID is in the database
+
+        :raises Unknown_Station_Error: Listing the IDs that are not
+        """
+        unknown = self.unknown(station_ids)
+        if unknown:
+            raise Unknown_Station_Error(unknown)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> Station_Database:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,295 @@
+from __future__ import annotations
+import math
+import random
+import typing
+from statistics import NormalDist
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from METAR.METAR import METAR
+
+FLIGHT_CATEGORIES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+
+# Roughly the contiguous US, stations are scattered uniformly within it
+LATITUDE_RANGE = (25.0, 49.0)
+LONGITUDE_RANGE = (-124.0, -67.0)
+
+# Visibility (statute miles) and ceiling (ft AGL, None for no ceiling) ranges that produce each flight category
+_CATEGORY_CONDITIONS: dict[str, tuple[tuple[float, float], tuple[int, int] | None]] = {
+    'VFR': ((6.0, 10.0), None),
+    'MVFR': ((3.0, 5.0), (1000, 3000)),
+    'IFR': ((1.0, 2.75), (500, 900)),
+    'LIFR': ((0.25, 0.75), (100, 400)),
+}
+
+def _visibility_group(visibility: float) -> str:
+    """Visibility as reported in a METAR, in whole and quarter statute miles (e.g. 2 3/4SM, 1/2SM)"""
+    whole, quarters = divmod(round(visibility*4), 4)
+    fraction = ('', '1/4', '1/2', '3/4')[quarters]
+    if whole and fraction:
+        return f'{whole} {fraction}SM'
+    return f'{whole or fraction}SM'
+
+def synthetic_station_ids(count: int) -> list[str]:
+    """count distinct ICAO-like station IDs, K??? first then other prefixes once those run out"""
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    station_ids: list[str] = []
+    for prefix in 'KPCT':
+        for a in letters:
+            for b in letters:
+                for c in letters:
+                    if len(station_ids) == count:
+                        return station_ids
+                    station_ids.append(f'{prefix}{a}{b}{c}')
+    if len(station_ids) < count:
+        raise ValueError(f'At most {len(station_ids)} synthetic stations are supported: {count}')
+    return station_ids
+
+class Weather_System:
+    """A moving region of worse conditions, stronger winds and thunderstorms near its core"""
+    __slots__ = ('latitude', 'longitude', 'velocity', 'radius', 'intensity', 'convective')
+
+    def __init__(self, rng: random.Random):
+        self.latitude = rng.uniform(*LATITUDE_RANGE)
+        self.longitude = rng.uniform(*LONGITUDE_RANGE)
+        # Degrees per hour, mostly west to east
+        self.velocity = (rng.uniform(-0.2, 0.2), rng.uniform(0.1, 0.6))
+        self.radius = rng.uniform(2.0, 6.0)
+        self.intensity = rng.uniform(1.0, 2.5)
+        self.convective = rng.random() < 0.4
+
+    def influence(self, latitude: float, longitude: float) -> float:
+        """0 outside the system, rising to 1 at its core"""
+        distance_squared = (latitude - self.latitude)**2 + (longitude - self.longitude)**2
+        if distance_squared >= self.radius**2:
+            return 0.0
+        return 1.0 - math.sqrt(distance_squared)/self.radius
+
+class Synthetic_METAR_Population:
+    """
+    Deterministic, evolving METARs for a configurable number of stations (10 to 20,000)
+
+    Each station has a slowly varying condition (an AR(1) process) mapped onto flight categories so that,
+    without weather systems, the categories follow category_mix. Weather systems drift across the map,
+    worsening conditions and strengthening winds near them, with thunderstorms in convective cores.
+    Stations report hourly at their own minute, snapshot() holds the latest report of every station
+    """
+
+    def __init__(self, station_count: int,
+                 seed: int = 0,
+                 start: datetime = datetime(2024, 6, 1, tzinfo=timezone.utc),
+                 category_mix: tuple[float, float, float, float] = (0.65, 0.18, 0.12, 0.05),
+                 weather_system_count: int = 4,
+                 thunderstorm_probability: float = 0.3,
+                 persistence: float = 0.9):
+        """
+        :param station_count: Number of stations
+        :param seed: Seed, the same seed and parameters always produce the same weather
+        :param start: Simulated time of the first reports
+        :param category_mix: Fraction of VFR, MVFR, IFR and LIFR reports away from weather systems
+        :param weather_system_count: Number of moving weather systems
+        :param thunderstorm_probability: Chance of a thunderstorm report near the core of a convective system
+        :param persistence: Hour to hour correlation of each station's conditions, 0 to 1
+        """
+        if station_count < 1:
+            raise ValueError(f'station_count must be at least 1: {station_count}')
+        if abs(sum(category_mix) - 1.0) > 1e-6:
+            raise ValueError(f'category_mix must sum to 1: {category_mix}')
+        self._rng = random.Random(seed)
+        self.time = start
+        self.thunderstorm_probability = thunderstorm_probability
+        self.persistence = persistence
+
+        # Thresholds on the standard normal station condition between the categories
+        cumulative = 0.0
+        self._thresholds: list[float] = []
+        for fraction in category_mix[:-1]:
+            cumulative += fraction
+            self._thresholds.append(NormalDist().inv_cdf(min(max(cumulative, 1e-9), 1 - 1e-9)))
+
+        rng = self._rng
+        self.station_ids = synthetic_station_ids(station_count)
+        self._positions = [(rng.uniform(*LATITUDE_RANGE), rng.uniform(*LONGITUDE_RANGE)) for _ in self.station_ids]
+        self._elevations = [rng.uniform(0.0, 1800.0) for _ in self.station_ids]
+        self._report_minute = [rng.randint(50, 59) for _ in self.station_ids]
+        self._condition = [rng.gauss(0.0, 1.0) for _ in self.station_ids]
+        self._base_wind = [(rng.randint(0, 35)*10, rng.randint(0, 12)) for _ in self.station_ids]
+        self.weather_systems = [Weather_System(rng) for _ in range(weather_system_count)]
+
+        self._metars: dict[str, METAR] = {}
+        self._last_report: list[datetime | None] = [None]*station_count
+        self._report_all(start)
+
+    def _report_time(self, station: int, time: datetime) -> datetime:
+        """The station's latest scheduled report at or before time"""
+        report = time.replace(minute=self._report_minute[station], second=0, microsecond=0)
+        if report > time:
+            report -= timedelta(hours=1)
+        return report
+
+    def _report_all(self, time: datetime) -> None:
+        for station in range(len(self.station_ids)):
+            report_time = self._report_time(station, time)
+            self._last_report[station] = report_time
+            self._metars[self.station_ids[station]] = self._report(station, report_time)
+
+    def advance(self, duration: timedelta) -> int:
+        """
+        Move the simulation forward, issuing new reports for the stations whose report time passed
+
+        :return: Number of new reports
+        """
+        rng = self._rng
+        hours = duration.total_seconds()/3600
+        self.time += duration
+        for index, system in enumerate(self.weather_systems):
+            system.latitude += system.velocity[0]*hours
+            system.longitude += system.velocity[1]*hours
+            # Systems leaving the map are replaced by a new one
+            if not LONGITUDE_RANGE[0] - system.radius <= system.longitude <= LONGITUDE_RANGE[1] + system.radius:
+                self.weather_systems[index] = Weather_System(rng)
+
+        reports = 0
+        innovation = math.sqrt(1 - self.persistence**2)
+        for station in range(len(self.station_ids)):
+            report_time = self._report_time(station, self.time)
+            if report_time == self._last_report[station]:
+                continue
+            # One AR(1) step per hour elapsed since the last report
+            steps = max(1, round((report_time - self._last_report[station]).total_seconds()/3600))
+            for _ in range(min(steps, 24)):
+                self._condition[station] = self.persistence*self._condition[station] + innovation*rng.gauss(0.0, 1.0)
+            self._last_report[station] = report_time
+            self._metars[self.station_ids[station]] = self._report(station, report_time)
+            reports += 1
+        return reports
+
+    def _report(self, station: int, report_time: datetime) -> METAR:
+        """Build the METAR of a station from its condition and the weather systems around it"""
+        rng = self._rng
+        station_id = self.station_ids[station]
+        latitude, longitude = self._positions[station]
+
+        influence, convective = 0.0, False
+        for system in self.weather_systems:
+            system_influence = system.influence(latitude, longitude)*system.intensity
+            if system_influence > influence:
+                influence, convective = system_influence, system.convective
+
+        condition = self._condition[station] + influence
+        category_index = sum(condition > threshold for threshold in self._thresholds)
+        flight_category = FLIGHT_CATEGORIES[category_index]
+        (visibility_min, visibility_max), ceiling_range = _CATEGORY_CONDITIONS[flight_category]
+        visibility = round(rng.uniform(visibility_min, visibility_max)*4)/4
+
+        sky_condition: list[tuple[str, int]] = []
+        if ceiling_range is None:
+            if rng.random() < 0.6:
+                sky_condition.append((rng.choice(('FEW', 'SCT')), rng.randint(30, 120)*100))
+        else:
+            if rng.random() < 0.5:
+                sky_condition.append(('FEW', rng.randint(1, ceiling_range[0]//100)*100))
+            sky_condition.append((rng.choice(('BKN', 'OVC')), rng.randint(ceiling_range[0]//100, ceiling_range[1]//100)*100))
+
+        wind_direction, wind_speed = self._base_wind[station]
+        wind_speed = max(0, wind_speed + round(influence*rng.uniform(5, 15)) + rng.randint(-3, 3))
+        wind_gust = None
+        if wind_speed >= 12 and rng.random() < 0.5:
+            wind_gust = wind_speed + rng.randint(6, 15)
+
+        wx_string = None
+        if convective and influence > 0.8 and rng.random() < self.thunderstorm_probability:
+            wx_string = rng.choice(('TS', 'TSRA', '+TSRA', 'VCTS'))
+        elif flight_category in ('IFR', 'LIFR'):
+            wx_string = rng.choice(('BR', '-RA', 'FG', '-SN')) if visibility < 1 or rng.random() < 0.7 else None
+        elif flight_category == 'MVFR' and rng.random() < 0.4:
+            wx_string = rng.choice(('-RA', 'HZ', 'BR'))
+
+        temperature = round(25 - (latitude - 25)*0.6 + rng.uniform(-4, 4), 1)
+        dewpoint = round(temperature - rng.uniform(0.5, 12) + (3 if wx_string else 0), 1)
+        altimeter = round(29.92 + rng.uniform(-0.3, 0.3) - 0.2*influence, 2)
+
+        # Variable winds are reported for light winds
+        wind_dir_degrees: float | str = float(wind_direction)
+        wind_group = f'{wind_direction:03d}{wind_speed:02d}'
+        if wind_speed < 4 and rng.random() < 0.3:
+            wind_dir_degrees = 'VRB'
+            wind_group = f'VRB{wind_speed:02d}'
+        if wind_gust is not None:
+            wind_group += f'G{wind_gust:02d}'
+        visibility_group = _visibility_group(visibility)
+        sky_group = ' '.join(f'{cover}{base//100:03d}' for cover, base in sky_condition) or 'CLR'
+
+        def temperature_group(value: float) -> str:
+            return f'M{round(-value):02d}' if value < 0 else f'{round(value):02d}'
+
+        raw_text = ' '.join(filter(None, (
+            station_id, report_time.strftime('%d%H%MZ'), 'AUTO', f'{wind_group}KT', visibility_group, wx_string, sky_group,
+            f'{temperature_group(temperature)}/{temperature_group(dewpoint)}', f'A{round(altimeter*100):04d}', 'RMK AO2',
+        )))
+
+        metar = METAR(station=station_id, raw_text=raw_text, observation_time=report_time,
+                      latitude=round(latitude, 3), longitude=round(longitude, 3), temp_c=temperature, dewpoint_c=dewpoint,
+                      wind_dir_degrees=wind_dir_degrees, wind_speed_kt=wind_speed, wind_gust_kt=wind_gust,
+                      visibility_statute_mi=visibility, altim_in_hg=altimeter, wx_string=wx_string,
+                      flight_category=flight_category, metar_type='METAR', elevation_m=round(self._elevations[station], 1))
+        for cover, base in sky_condition:
+            metar.add_sky_condition(cover, base)
+        return metar
+
+    def snapshot(self, stations: typing.Iterable[str] | None = None) -> dict[str, METAR]:
+        """The latest report of each station, of every station by default. The METARs are shared, do not modify them"""
+        if stations is None:
+            return dict(self._metars)
+        return {station_id: self._metars[station_id] for station_id in stations if station_id in self._metars}
+
+def _xml_element(tag: str, value: typing.Any) -> str:
+    if value is None:
+        return ''
+    return f'<{tag}>{escape(str(value))}</{tag}>'
+
+def to_dataserver_xml(metars: typing.Iterable[METAR], time_taken_ms: int = 5) -> bytes:
+    """
+    Render METARs as the XML of the aviationweather.gov dataserver, as parsed by parse_METAR_xml
+
+    :param metars: The METARs to include
+    :param time_taken_ms: Value of the time_taken_ms element
+    """
+    elements = []
+    for metar in metars:
+        observation_time = metar.observation_time
+        parts = [
+            '<METAR>',
+            _xml_element('raw_text', metar.raw_text),
+            _xml_element('station_id', metar.station),
+            _xml_element('observation_time', observation_time.strftime('%Y-%m-%dT%H:%M:%SZ') if observation_time is not None else None),
+            _xml_element('latitude', metar.latitude),
+            _xml_element('longitude', metar.longitude),
+            _xml_element('temp_c', metar.temp_c),
+            _xml_element('dewpoint_c', metar.dewpoint_c),
+            _xml_element('wind_dir_degrees', metar.wind_dir_degrees if not isinstance(metar.wind_dir_degrees, float) else round(metar.wind_dir_degrees)),
+            _xml_element('wind_speed_kt', metar.wind_speed_kt),
+            _xml_element('wind_gust_kt', metar.wind_gust_kt),
+            _xml_element('visibility_statute_mi', metar.visibility_statute_mi),
+            _xml_element('altim_in_hg', metar.altim_in_hg),
+            _xml_element('wx_string', metar.wx_string),
+        ]
+        for sky in metar.sky_condition:
+            base = sky.get('cloud_base_ft_agl')
+            base_attribute = f' cloud_base_ft_agl="{base}"' if base is not None else ''
+            parts.append(f'<sky_condition sky_cover="{escape(str(sky.get("sky_cover")))}"{base_attribute}/>')
+        parts.extend((
+            _xml_element('flight_category', metar.flight_category),
+            _xml_element('metar_type', metar.metar_type),
+            _xml_element('elevation_m', metar.elevation_m),
+            '</METAR>',
+        ))
+        elements.append(''.join(parts))
+
+    return ''.join((
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<response xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" version="1.2">',
+        '<request_index>0</request_index><data_source name="metars"/><request type="retrieve"/><errors/><warnings/>',
+        f'<time_taken_ms>{time_taken_ms}</time_taken_ms>',
+        f'<data num_results="{len(elements)}">', *elements, '</data></response>',
+    )).encode('utf-8')
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import typing
+from math import cos, pi
+
+# Frames are compared in blocks of this many bytes before looking at individual pixels,
+# unchanged regions of a large strip are skipped in a single comparison
+_DELTA_BLOCK_BYTES = 48
+
+# Brightness is quantized to this many levels so the scaled patterns can be cached
+_BRIGHTNESS_LEVELS = 32
+
+def frame_delta(previous: bytes | bytearray, current: bytes | bytearray) -> list[tuple[int, bytes]]:
+    """Return (pixel index, rgb bytes) for every pixel that differs between two frames of equal length"""
+    changes: list[tuple[int, bytes]] = []
+    length = len(current)
+    for block_start in range(0, length, _DELTA_BLOCK_BYTES):
+        block_end = block_start + _DELTA_BLOCK_BYTES
+        if previous[block_start:block_end] == current[block_start:block_end]:
+            continue
+        for offset in range(block_start, min(block_end, length), 3):
+            rgb = bytes(current[offset:offset + 3])
+            if previous[offset:offset + 3] != rgb:
+                changes.append((offset//3, rgb))
+    return changes
+
+_brightness_tables: dict[int, bytes] = {}
+
+def brightness_table(level: int) -> bytes:
+    """Translation table scaling every byte value by level/_BRIGHTNESS_LEVELS, for bytes.translate"""
+    table = _brightness_tables.get(level)
+    if table is None:
+        table = bytes(v*level//_BRIGHTNESS_LEVELS for v in range(256))
+        _brightness_tables[level] = table
+    return table
+
+def scale_pixels(pixels: bytes, brightness: float) -> bytes:
+    """Scale a whole run of pixels in one C-level pass, brightness between 0 and 1.0"""
+    level = round(max(0.0, min(1.0, brightness))*_BRIGHTNESS_LEVELS)
+    return pixels.translate(brightness_table(level))
+
+class Segment:
+    """
+    The set of LEDs driven by one station, a single index, a range, or any sequence of indices
+
+    Indices are stored as contiguous (start, stop) runs so a segment is written into the framebuffer with one
+    slice assignment per run rather than one call per LED
+    """
+
+    def __init__(self, indices: int | range | typing.Iterable[int]):
+        if isinstance(indices, int):
+            indices = (indices,)
+        self.indices: tuple[int, ...] = tuple(indices)
+        if not self.indices:
+            raise ValueError(f'A Segment needs at least one LED index')
+        if min(self.indices) < 0:
+            raise ValueError(f'LED indices must be positive: {self.indices}')
+
+        # Group the indices into runs of consecutive ascending LEDs
+        self.runs: list[tuple[int, int, int]] = []      # (first LED, stop LED, offset into the segment)
+        run_start = self.indices[0]
+        run_offset = 0
+        for position in range(1, len(self.indices) + 1):
+            if position == len(self.indices) or self.indices[position] != self.indices[position - 1] + 1:
+                self.runs.append((run_start, self.indices[position - 1] + 1, run_offset))
+                if position < len(self.indices):
+                    run_start = self.indices[position]
+                    run_offset = position
+        return
+
+    def __repr__(self):
+        runs = ', '.join(f'{start}' if stop - start == 1 else f'{start}-{stop - 1}' for start, stop, _ in self.runs)
+        return f'{self.__class__.__name__}: [{runs}]'
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def first(self) -> int:
+        """First LED index of the segment"""
+        return self.indices[0]
+
+    @property
+    def stop(self) -> int:
+        """One past the highest LED index of the segment"""
+        return max(stop for _, stop, _ in self.runs)
+
+    def fill(self, framebuffer: bytearray, rgb: bytes) -> None:
+        """Set every LED of the segment to a single color (3 bytes)"""
+        for start, stop, _ in self.runs:
+            framebuffer[start*3:stop*3] = rgb*(stop - start)
+
+    def write(self, framebuffer: bytearray, pixels: bytes) -> None:
+        """Write len(self) pixels (3 bytes each, in segment order) into the framebuffer"""
+        for start, stop, offset in self.runs:
+            framebuffer[start*3:stop*3] = pixels[offset*3:(offset + stop - start)*3]
+
+class Chase_Animation:
+    """A bright head with a fading tail travelling along a segment over a background color"""
+
+    def __init__(self, period: float = 1.5, tail: int = 3):
+        """
+        :param period: Seconds for the head to travel the whole segment
+        :param tail: Number of LEDs fading out behind the head
+        """
+        self.period = period
+        self.tail = tail
+        self._patterns: dict[tuple[int, bytes, bytes], bytes] = {}
+
+    def _pattern(self, length: int, rgb: bytes, background: bytes) -> bytes:
+        """The segment with the head at LED 0, cached per length and colors"""
+        key = (length, rgb, background)
+        pattern = self._patterns.get(key)
+        if pattern is None:
+            pixels = [background]*length
+            for n in range(min(self.tail + 1, length)):
+                weight = 1.0 - n/(self.tail + 1)
+                pixels[-n % length] = bytes(int(c*weight + b*(1.0 - weight)) for c, b in zip(rgb, background))
+            pattern = b''.join(pixels)
+            self._patterns[key] = pattern
+        return pattern
+
+    def render(self, length: int, rgb: bytes, background: bytes, t: float) -> bytes:
+        """Pixels for the whole segment at time t (seconds), rotating the cached pattern in one slice"""
+        pattern = self._pattern(length, rgb, background)
+        head = int((t % self.period)/self.period*length)
+        split = (length - head)*3
+        return pattern[split:] + pattern[:split]
+
+class Pulse_Animation:
+    """The whole segment breathing between min_brightness and full brightness"""
+
+    def __init__(self, period: float = 1.0, min_brightness: float = 0.2):
+        """
+        :param period: Seconds for one full pulse
+        :param min_brightness: Brightness at the bottom of the pulse, between 0 and 1.0
+        """
+        self.period = period
+        self.min_brightness = min_brightness
+
+    def render(self, length: int, rgb: bytes, background: bytes, t: float) -> bytes:
+        """Pixels for the whole segment at time t (seconds), the background is unused"""
+        brightness = self.min_brightness + (1.0 - self.min_brightness)*(0.5 - 0.5*cos(2*pi*(t % self.period)/self.period))
+        return scale_pixels(rgb, brightness)*length
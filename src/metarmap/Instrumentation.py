@@ -0,0 +1,187 @@
+from __future__ import annotations
+import logging
+from dataclasses import dataclass
+from time import perf_counter, perf_counter_ns
+
+# Histogram buckets are powers of two of microseconds, bucket n holds durations below 2**n us
+# 22 buckets cover 1 us to ~2 s, anything slower lands in the final (overflow) bucket
+BUCKET_COUNT = 23
+BUCKET_UPPER_BOUNDS_NS: tuple[int, ...] = tuple(1000*2**n for n in range(BUCKET_COUNT - 1))
+
+@dataclass
+class Instrumentation_Config:
+    """Configure the per-stage timing of MainLoop.loop"""
+    enabled: bool = False
+    log_interval: float | None = 60.0     # Seconds between summary logs, None to never log
+
+class Stage_Histogram:
+    """
+    Fixed-bucket histogram of durations in nanoseconds
+
+    record() is O(1) and allocation free, the bucket is found from the bit length of the duration
+    """
+    __slots__ = ('counts', 'count', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.counts: list[int] = [0]*BUCKET_COUNT
+        self.count: int = 0
+        self.total_ns: int = 0
+        self.max_ns: int = 0
+
+    def record(self, duration_ns: int) -> None:
+        """Add one duration"""
+        bucket = (duration_ns//1000).bit_length()
+        if bucket >= BUCKET_COUNT:
+            bucket = BUCKET_COUNT - 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def reset(self) -> None:
+        """Clear all recorded durations"""
+        for bucket in range(BUCKET_COUNT):
+            self.counts[bucket] = 0
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def quantile(self, q: float) -> int:
+        """Upper bound (ns) of the bucket holding quantile q, the max for the overflow bucket, 0 if empty"""
+        if self.count == 0:
+            return 0
+        target = q*self.count
+        running = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target and bucket_count:
+                if bucket < BUCKET_COUNT - 1:
+                    return min(BUCKET_UPPER_BOUNDS_NS[bucket], self.max_ns)
+                return self.max_ns
+        return self.max_ns
+
+    def snapshot(self) -> dict[str, int | float | list[tuple[int | None, int]]]:
+        """Copy of the histogram state, buckets are (upper bound ns or None for overflow, count)"""
+        bounds: list[int | None] = [*BUCKET_UPPER_BOUNDS_NS, None]
+        return {
+            'count': self.count,
+            'total_ns': self.total_ns,
+            'mean_ns': self.total_ns/self.count if self.count else 0.0,
+            'max_ns': self.max_ns,
+            'p50_ns': self.quantile(0.5),
+            'p90_ns': self.quantile(0.9),
+            'p99_ns': self.quantile(0.99),
+            'buckets': list(zip(bounds, self.counts)),
+        }
+
+class Loop_Instrumentation:
+    """
+    Per-stage timing of the MainLoop hot path into fixed-bucket histograms
+
+    Switch on and off at runtime through the enabled attribute, MainLoop checks it once per frame
+    and runs the untimed path when disabled
+    """
+
+    # Stages, the color_map.* stages are the per-frame totals of each feature over all stations
+    STAGES: tuple[str, ...] = (
+        'loop',
+        'check_for_new_METAR_data',
+        'update_color_map',
+        'color_map.category',
+        'color_map.lightning',
+        'color_map.wind',
+        'color_map.brightness',
+        'update_LEDs',
+        'driver_transmit',
+    )
+
+    def __init__(self, enabled: bool = False, log_interval: float | None = 60.0):
+        """
+        :param enabled: Start with timing enabled
+        :param log_interval: Seconds between summary logs while enabled, None to never log
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self.histograms: dict[str, Stage_Histogram] = {stage: Stage_Histogram() for stage in self.STAGES}
+        self._last_log_ns: int = perf_counter_ns()
+
+    @classmethod
+    def from_config(cls, config: Instrumentation_Config | None) -> Loop_Instrumentation:
+        """Alternate constructor, disabled if no configuration is provided"""
+        if config is None:
+            return cls()
+        return cls(enabled=config.enabled, log_interval=config.log_interval)
+
+    def record(self, stage: str, duration_ns: int) -> None:
+        """Record a duration for a stage"""
+        self.histograms[stage].record(duration_ns)
+
+    def reset(self) -> None:
+        """Clear every histogram"""
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Copy of every stage histogram, keyed by stage"""
+        return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+    def maybe_log_summary(self, now_ns: int) -> None:
+        """Log the summary if log_interval has elapsed since the last one"""
+        if self.log_interval is None:
+            return
+        if now_ns - self._last_log_ns >= self.log_interval*1e9:
+            self._last_log_ns = now_ns
+            self.log_summary()
+
+    def log_summary(self) -> None:
+        """Log one line per stage with the count, mean, p50, p99 and max in milliseconds"""
+        lines = []
+        for stage, histogram in self.histograms.items():
+            if histogram.count == 0:
+                continue
+            lines.append(f'{stage:<28} n={histogram.count:<8} mean={histogram.total_ns/histogram.count/1e6:8.3f} ms  '
+                         f'p50<={histogram.quantile(0.5)/1e6:8.3f} ms  p99<={histogram.quantile(0.99)/1e6:8.3f} ms  '
+                         f'max={histogram.max_ns/1e6:8.3f} ms')
+        if lines:
+            self._logger.info('Loop stage timing summary:\n' + '\n'.join(lines))
+
+class Startup_Timer:
+    """
+    Time to each startup phase (import, config build, first fetch, first frame), every phase is recorded once
+
+    Times are measured from the creation of the timer, the module level startup_timer is created while metarmap is
+    imported. The summary is logged when the first frame is marked
+    """
+
+    PHASES: tuple[str, ...] = ('import', 'config_build', 'first_fetch', 'first_frame')
+
+    def __init__(self, start: float | None = None):
+        """
+        :param start: perf_counter time to measure from, defaults to now
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.start = perf_counter() if start is None else start
+        self.marks: dict[str, float] = {}       # Phase -> seconds since start, in the order reached
+
+    def mark(self, phase: str) -> None:
+        """Record that a phase completed, only the first mark of each phase counts"""
+        if phase in self.marks:
+            return
+        self.marks[phase] = perf_counter() - self.start
+        if phase == 'first_frame':
+            self.log_summary()
+
+    def log_summary(self) -> None:
+        """Log the time to, and the duration of, every phase reached so far"""
+        previous = 0.0
+        parts = []
+        for phase, elapsed in self.marks.items():
+            parts.append(f'{phase} at {elapsed*1e3:.0f} ms (+{(elapsed - previous)*1e3:.0f} ms)')
+            previous = elapsed
+        if parts:
+            self._logger.info('Startup: ' + ', '.join(parts))
+
+# Shared by the import of metarmap, METAR_MAP_Config and every MainLoop of the process
+startup_timer = Startup_Timer()
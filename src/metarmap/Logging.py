@@ -1,6 +1,12 @@
 from __future__ import annotations
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler
+import queue
+import atexit
+import typing
+import gzip
+from threading import Thread
+from time import time_ns
 
 from pathlib import Path
 import shutil
@@ -8,6 +14,8 @@ import os
 
 from datetime import datetime
 
+from METAR.clock import Clock, system_clock
+
 def initialize_basic_log_stream(logger: logging.Logger, level: int) -> None:
     """Setup a basic streamhandler for the provided logger"""
     # Send INFO messages to the console
@@ -18,13 +26,150 @@ def initialize_basic_log_stream(logger: logging.Logger, level: int) -> None:
     logger.addHandler(ch)
     return
 
+class Bounded_Queue_Handler(QueueHandler):
+    """
+    QueueHandler for a bounded queue that never blocks the logging thread
+
+    When the queue is full the record is dropped and counted, and a warning with the number of dropped
+    records is queued once there is room again
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped: int = 0               # Total records dropped since creation
+        self._unreported_drops: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Report earlier drops ahead of this record, so the log reads in order
+        if self._unreported_drops:
+            summary = logging.LogRecord(self.__class__.__name__, logging.WARNING, __file__, 0,
+                                        f'{self._unreported_drops} log records dropped, log queue full', None, None)
+            try:
+                self.queue.put_nowait(summary)
+            except queue.Full:
+                self._drop()
+                return
+            self._unreported_drops = 0
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._drop()
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        self._unreported_drops += 1
+
+class Batching_Queue_Listener:
+    """
+    Services a log queue from a background thread, writing records in batches and flushing the handlers once per
+    batch instead of once per record
+
+    Handlers that implement defer_flush (see Deferred_Flush_Rotating_File_Handler) skip their per-record flush
+    """
+    _STOP = object()        # Queued by stop(), ends the thread once everything queued before it is written
+
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler, respect_handler_level: bool = True, batch_size: int = 256):
+        self.queue = log_queue
+        self.handlers: tuple[logging.Handler, ...] = handlers
+        self.respect_handler_level = respect_handler_level
+        self.batch_size = batch_size
+        self._thread: Thread | None = None
+        for handler in handlers:
+            if hasattr(handler, 'defer_flush'):
+                handler.defer_flush = True
+
+    def start(self) -> None:
+        """Start the listener thread"""
+        if self._thread is not None:
+            return
+        self._thread = Thread(target=self._run, name=f'{self.__class__.__name__}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Drain the queue and stop the listener thread, safe to call more than once"""
+        if self._thread is None:
+            return
+        # Blocks while the queue is full, the thread is draining it
+        self.queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+
+    def handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if not self.respect_handler_level or record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _flush_handlers(self) -> None:
+        for handler in self.handlers:
+            if hasattr(handler, 'flush_now'):
+                handler.flush_now()
+            else:
+                handler.flush()
+
+    def _run(self) -> None:
+        """Block for a record, then drain up to batch_size more without blocking before flushing"""
+        log_queue = self.queue
+        while True:
+            record = log_queue.get()
+            handled = 0
+            while True:
+                if record is self._STOP:
+                    self._flush_handlers()
+                    return
+                self.handle(record)
+                handled += 1
+                if handled >= self.batch_size:
+                    break
+                try:
+                    record = log_queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._flush_handlers()
+
+class Deferred_Flush_Rotating_File_Handler(RotatingFileHandler):
+    """RotatingFileHandler whose per-record flush can be deferred to a batch flush (flush_now)"""
+    defer_flush: bool = False
+
+    def flush(self) -> None:
+        if not self.defer_flush:
+            super().flush()
+
+    def flush_now(self) -> None:
+        super().flush()
+
+    def close(self) -> None:
+        self.flush_now()
+        super().close()
+
+def attach_queued_handler(logger: logging.Logger, handler: logging.Handler,
+                          queue_size: int = 10000, batch_size: int = 256) -> Batching_Queue_Listener:
+    """
+    Route the logger to the handler through a bounded queue serviced by a background listener thread,
+    so logging calls never wait on the handler's I/O
+
+    :param logger: Logger to attach to
+    :param handler: Handler doing the actual (slow) output
+    :param queue_size: Maximum number of queued records, records beyond this are dropped and counted
+    :param batch_size: Maximum number of records written between handler flushes
+    :return: The started listener, it is stopped (and the queue drained) at interpreter exit
+    """
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    logger.addHandler(Bounded_Queue_Handler(log_queue))
+    listener = Batching_Queue_Listener(log_queue, handler, batch_size=batch_size)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 def initialize_rotating_file_log(output_directory: Path | str, output_name: str, 
                                  logger: logging.Logger = logging.getLogger(''), 
                                  log_level: int | None = None,
                                  log_formatter: logging.Formatter = logging.Formatter('[%(asctime)s] %(name)-16s :: %(levelname)-8s :: %(message)s'),
                                  max_bytes: int = 10485760,      # Default 10 mb
                                  backup_count: int = 25,          # Default 250mb log
-                                ) -> None:
+                                 queued: bool = True,
+                                 queue_size: int = 10000,
+                                 batch_size: int = 256
+                                ) -> Batching_Queue_Listener | None:
     """
     Set up a rotating log file for the logger provided using the input parameters
     
@@ -36,7 +181,10 @@ def initialize_rotating_file_log(output_directory: Path | str, output_name: str,
     :param log_formatter: Optional, formatter to apply to these log files. Default includes asctime, name, levelname, and message
     :param max_bytes: Maximum number of bytes for each individual file, default 10mb
     :param backup_count: Number of files to rotate through, default 25 for 250mb of logs maintained
-    :return: None
+    :param queued: Optional, write the file from a background thread through a bounded queue, default True
+    :param queue_size: Maximum number of queued records when queued, further records are dropped and counted
+    :param batch_size: Maximum number of records written between flushes when queued
+    :return: The queue listener when queued, otherwise None
     """
 
     # Setup logger with a level if provided, otherwise assume this is set elsewhere
@@ -55,12 +203,80 @@ def initialize_rotating_file_log(output_directory: Path | str, output_name: str,
 
     # Setup a Rotating Log File with fixed size for continuous logging
     # Allocate 250mb to this task, keeps file 10mb each
-    rotHandler = RotatingFileHandler(LOG_FILEPATH, maxBytes = max_bytes, backupCount = backup_count)
+    rotHandler = Deferred_Flush_Rotating_File_Handler(LOG_FILEPATH, maxBytes = max_bytes, backupCount = backup_count)
     formatter = log_formatter
     rotHandler.setFormatter(formatter)
-    logger.addHandler(rotHandler)
+
+    # Queued, the file I/O and rotation happen on the listener thread rather than the logging thread
+    listener = None
+    if queued:
+        listener = attach_queued_handler(logger, rotHandler, queue_size=queue_size, batch_size=batch_size)
+    else:
+        logger.addHandler(rotHandler)
     logger.info(f'ROTATING LOG REINITIALIZED')
-    return
+    return listener
+
+class Rate_Limited_Error_Reporter:
+    """
+    Deduplicates errors that repeat every frame (e.g. a station without data)
+
+    The first occurrence of an error for a (key, kind) pair is logged in full. Repeats are only counted,
+    and summarized once per summary_interval. Clearing the pair, once the condition goes away, logs a final
+    summary if anything was suppressed and lets the next occurrence be logged in full again.
+    Messages use logging's lazy %-style arguments, so suppressed repeats are never formatted
+    """
+    def __init__(self, logger: logging.Logger, summary_interval: float = 300.0, clock: Clock = system_clock):
+        """
+        :param logger: Logger to report through
+        :param summary_interval: Seconds between summaries of a repeating error
+        :param clock: Time source, repeats are summarized on its monotonic time
+        """
+        self.logger = logger
+        self.summary_interval = summary_interval
+        self._clock = clock
+        # (key, kind) -> [repeats since the last log line, time of the last log line, total repeats]
+        self._active: dict[tuple[str, str], list] = {}
+        self._active_keys: dict[str, int] = {}          # key -> number of active kinds, for a cheap clear()
+        self.suppressed_total: int = 0
+
+    @property
+    def suppressed_counts(self) -> dict[tuple[str, str], int]:
+        """Repeats suppressed so far for each active (key, kind) pair"""
+        return {pair: state[2] for pair, state in self._active.items()}
+
+    def report(self, key: str, kind: str, message: str, *args: typing.Any, exc_info: bool = False, level: int = logging.ERROR) -> None:
+        """Report an occurrence of an error, logged in full only the first time while it stays active"""
+        pair = (key, kind)
+        state = self._active.get(pair)
+        if state is None:
+            self._active[pair] = [0, self._clock.monotonic(), 0]
+            self._active_keys[key] = self._active_keys.get(key, 0) + 1
+            self.logger.log(level, message, *args, exc_info=exc_info)
+            return
+
+        state[0] += 1
+        state[2] += 1
+        self.suppressed_total += 1
+        now = self._clock.monotonic()
+        if now - state[1] >= self.summary_interval:
+            self.logger.log(level, f'%s repeated %d times in the last %.0f s: {message}', key, state[0], now - state[1], *args)
+            state[0] = 0
+            state[1] = now
+
+    def clear(self, key: str, kind: str | None = None) -> None:
+        """The condition cleared for the key (all kinds if kind is None), the next occurrence is logged in full"""
+        if key not in self._active_keys:
+            return
+        pairs = [(key, kind)] if kind is not None else [pair for pair in self._active if pair[0] == key]
+        for pair in pairs:
+            state = self._active.pop(pair, None)
+            if state is None:
+                continue
+            self._active_keys[key] -= 1
+            if state[2]:
+                self.logger.info('%s %s cleared after %d suppressed repeats', pair[0], pair[1], state[2])
+        if self._active_keys[key] <= 0:
+            del self._active_keys[key]
 
 class Bad_Active_Flag_Exception(Exception):
     pass
@@ -70,16 +286,23 @@ class Boot_Cycle_Log_Manager:
     A class designed for maintaining a separate log for each boot cycle of the system, retaining a history of logs
     separated by each reinitialization of the system. It has no dependence on available date-time
     
-    The active log is designated by a specific file flag in the directory. 
-    At each reinitialization of the program, the system will remove the old flag and place a new one for the new active directory
+    The active cycle is recorded in a small index file at the log_root, written atomically, so finding the next cycle
+    at boot does not scan the cycle directories. The active directory is also designated by a specific file flag, which is
+    only searched for when the index is missing or unreadable (e.g. a log_root written before the index existed)
 
     The active directory uses a rotating log system to maintain a certain number of log files for a given cycle
 
+    Boot only renames the directory being reused out of the way. Deleting it, compressing the logs of retired cycles
+    and enforcing the optional storage budget happen in a background maintenance thread started by run()
+
     Defaults initialize a 1GB maximum log directory with 10 cycles, each capable of holding 100mb of log data
 
     Note that the Manager will try to delete contents found in sub-directories of the root, it is not recommended to store any
     data that is not managed by this Manager in that directory
     """
+    # Directories renamed out of the way at boot, deleted by the maintenance thread
+    DISCARD_PREFIX = '.discard_'
+
     def __init__(self, log_root: Path | str,
                  log_file_name: str,
                  logger: logging.Logger = logging.getLogger(''),
@@ -88,7 +311,12 @@ class Boot_Cycle_Log_Manager:
                  max_bytes: int = 10485760,      # Default 10 mb
                  backup_count: int = 10,          # Default 100mb log
                  active_log_flag: str = '.active_log_flag',
-                 cycle_path_prefix: str = 'cycle_log'):
+                 cycle_path_prefix: str = 'cycle_log',
+                 queued: bool = True,
+                 queue_size: int = 10000,
+                 index_file_name: str = '.cycle_index',
+                 compress_retired: bool = True,
+                 storage_budget: int | None = None):
         """
         :param log_root: The root path to the logs for this system
         :param log_file_name: Name to give each log file
@@ -99,10 +327,17 @@ class Boot_Cycle_Log_Manager:
         :param backup_count: Number of backup to maintain for a given boot cycle
         :param active_log_flag: string designating what to label the active log, defaults to '.active_log_flag'
         :param cycle_path_prefix: string designating the prefix to give each cycle directory, defaults 'cycle_log'
+        :param queued: write the log from a background thread through a bounded queue, default True
+        :param queue_size: maximum number of queued records when queued, further records are dropped and counted
+        :param index_file_name: name of the file at the log_root recording the active cycle, defaults '.cycle_index'
+        :param compress_retired: gzip the logs of retired cycles in the background, default True
+        :param storage_budget: optional maximum bytes kept in retired cycles, the oldest are deleted in the background to fit
         
         :return: None
         :raises ValueError: Input parameter does not pass sanitization
         """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+
         # Retrieve and santitize inputs
         self.log_root = Path(log_root)
         if self.log_root.exists():
@@ -125,13 +360,71 @@ class Boot_Cycle_Log_Manager:
         
         self.active_log_flag = active_log_flag
         self.cycle_path_prefix = cycle_path_prefix
+        self.queued = queued
+        self.queue_size = queue_size
+        self.listener: Batching_Queue_Listener | None = None
+
+        self.index_file_name = index_file_name
+        self.compress_retired = compress_retired
+        self.storage_budget = storage_budget
+        if self.storage_budget is not None and self.storage_budget < 0:
+            raise ValueError(f'storage_budget must be greater than or equal to 0: {self.storage_budget}')
+        self.active_cycle: int | None = None
+        self.maintenance_thread: Thread | None = None
 
         return
     
+    @property
+    def index_path(self) -> Path:
+        """Path to the index file recording the active cycle"""
+        return self.log_root / self.index_file_name
+
+    @property
+    def active_log_path(self) -> Path | None:
+        """Directory of the active cycle, None before manage_log_root()"""
+        if self.active_cycle is None:
+            return None
+        return self._cycle_path(self.active_cycle)
+
+    def _cycle_path(self, cycle_value: int) -> Path:
+        return self.log_root / f'{self.cycle_path_prefix}{cycle_value}'
+
+    def _read_index(self) -> int | None:
+        """The cycle recorded in the index file, None if it is missing or unreadable"""
+        try:
+            with open(self.index_path, 'r') as f:
+                cycle_value = int(f.readline())
+        except (OSError, ValueError):
+            return None
+        if cycle_value < 0:
+            return None
+        return cycle_value
+
+    def _write_index(self, cycle_value: int) -> None:
+        """Atomically record the active cycle, an interrupted write leaves the previous index in place"""
+        temporary_path = self.log_root / f'{self.index_file_name}.tmp'
+        with open(temporary_path, 'w') as f:
+            f.write(f'{cycle_value}\n{datetime.now().isoformat()}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.index_path)
+
+        # Persist the rename itself, not supported on every platform
+        try:
+            directory_fd = os.open(self.log_root, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(directory_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(directory_fd)
+
     def _initialize_logging_root(self) -> Path:
         """
-        Called when the log_root does not the active_log_flag in any sub-directories
-        Initializes the system to {cycle_path_prefix}0, deleting any contents it has if it already exists
+        Called when the log_root has no index and no active_log_flag in any sub-directories
+        Initializes the system to {cycle_path_prefix}0, discarding any contents it has if it already exists
 
         :returns: Path to the active log
         """
@@ -144,18 +437,22 @@ class Boot_Cycle_Log_Manager:
         """
         Initialize the log cycle provided by integer value
 
-        Determines the directory name for this cycle, cleans it up, and adds the flag
+        Determines the directory name for this cycle, moves any old contents out of the way, adds the flag and
+        records the cycle in the index
 
         :param cycle_value: integer, cycle count to setup
         :return: Path to active_log_directory
         """
         # Create the active_log_path at root
-        active_path_name = self.log_root  / f'{self.cycle_path_prefix}{cycle_value}'
+        active_path_name = self._cycle_path(cycle_value)
 
-        # If this path already exists, then we'll need to remove contents as we'll be overwriting them
-        # Recurively try to delete all items in this directory
+        # If this path already exists, its contents are from an old cycle
+        # Renaming is quick, the maintenance thread deletes the renamed directory later
         if active_path_name.exists():
-            shutil.rmtree(active_path_name, ignore_errors = True)
+            try:
+                active_path_name.rename(self.log_root / f'{self.DISCARD_PREFIX}{active_path_name.name}_{time_ns()}')
+            except OSError:
+                shutil.rmtree(active_path_name, ignore_errors = True)
 
         # Create the directory fresh, new starting point
         active_path_name.mkdir()
@@ -170,11 +467,14 @@ class Boot_Cycle_Log_Manager:
             except:
                 pass
 
+        self._write_index(cycle_value)
+        self.active_cycle = cycle_value
+
         return active_path_name
     
     def _search_for_active_log_flag(self) -> Path | None:
         """
-        Searches the log_root for the active flag
+        Searches the log_root for the active flag, only needed when there is no usable index
 
         :return: Path to the active_flag file, or None if not found
         """
@@ -188,65 +488,138 @@ class Boot_Cycle_Log_Manager:
                         located_flag = sub_item
         return located_flag
 
-    def manage_log_root(self) -> Path:
+    def _remove_flag(self, located_flag: Path) -> None:
         """
-        Manage the log root, called once per cycle
+        Remove the flag of the previous cycle
 
-        1. Determines what the active log for this cycle is, removes old flag, places new one
-        2. Removes all data from active log (if any present)
+        :raises Bad_Active_Flag_Exception: The flag exists but could not be removed
+        """
+        try:
+            os.remove(located_flag)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # If we can't remove this file, that's going to be a long term problem with this manager
+            # A bad flag in the system will continue to ruin our log data
+            raise Bad_Active_Flag_Exception(f'Bad flag in system that could not be removed: flag = {located_flag}, dir = {located_flag.parent}')
+
+    def _previous_cycle_from_flag(self) -> int | None:
+        """
+        Determine the previous cycle by searching for the active flag, removing it
 
-        :param cycle_path_root: The prefix for each cycle log, will be appended with the active count value
-        :return: Path to the active_log directory
-        :raises Bad_Active_Flag_Exception: Signals that there is a bad flag in the system that cannot be managed. The Manager cannot function in this state
+        :return: The previous cycle, or None if there is no flag or its directory is not a valid cycle
         """
-        active_log_path = None
-        
-        # Get the active_flag and it's parent
         located_flag = self._search_for_active_log_flag()
-
-        # First, we want to remove the flag that was found in order to prepare to create the new flag
-        if located_flag is not None:
-            try:
-                os.remove(located_flag)
-            except OSError:
-                # If we can't remove this file, that's going to be a long term problem with this manager
-                # A bad flag in the system will continue to ruin our log data
-                raise Bad_Active_Flag_Exception(f'Bad flag in system that could not be removed: flag = {located_flag}, dir = {previous_active_log}')
-
-        # If the active log file was not found at all, that means we need to initialize the system
         if located_flag is None:
-            active_log_path = self._initialize_logging_root()
-        # Otherwise, we need to:
-        #   - Determine the directory for this cycle, as the old one + 1
-        #   - Delete the old active log file
-        #   - Create the new active log file
-        else:
-            previous_active_log = located_flag.parent
-
-            # If the prefix isn't in the previous_active_log, then we have a problem, reinitialize
-            if self.cycle_path_prefix not in previous_active_log.name:
-                active_log_path = self._initialize_logging_root()
-            else:
-                # Get the value appended to the prefix, should be an int
-                previous_cycle = previous_active_log.name.split(f'{self.cycle_path_prefix}')[1]
-                try:
-                    previous_cycle = int(previous_cycle)
-                # If it's not an int, then we have a problem. Reinitialize the root
-                except ValueError:
-                    active_log_path = self._initialize_logging_root()
-                # Otherwise, we need to determine the current active_cycle count
-                # Try adding one to the previous cycle count. If that value is greater than the number of cycles
-                # configuration, then we'll need to cycle back to the beginning
-                else:
-                    active_cycle = previous_cycle + 1
-                    if active_cycle >= self.cycle_count:    # >= check because we're using 0 indexing
-                        active_log_path = self._initialize_log_cycle(0)
-                    else:
-                        active_log_path = self._initialize_log_cycle(active_cycle)
+            return None
+        self._remove_flag(located_flag)
+
+        # If the prefix isn't in the previous_active_log, then we have a problem
+        previous_active_log = located_flag.parent
+        if not previous_active_log.name.startswith(self.cycle_path_prefix):
+            return None
+        # Get the value appended to the prefix, should be an int
+        try:
+            return int(previous_active_log.name[len(self.cycle_path_prefix):])
+        except ValueError:
+            return None
 
+    def manage_log_root(self) -> Path:
+        """
+        Manage the log root, called once per cycle
 
-        return active_log_path
+        1. Determines what the active log for this cycle is from the index, removes old flag, places new one
+        2. Moves any data from a previous use of the active log out of the way
 
+        :return: Path to the active_log directory
+        :raises Bad_Active_Flag_Exception: Signals that there is a bad flag in the system that cannot be managed. The Manager cannot function in this state
+        """
+        # The index says where the previous flag is, only search for it without one
+        previous_cycle = self._read_index()
+        if previous_cycle is not None:
+            self._remove_flag(self._cycle_path(previous_cycle) / self.active_log_flag)
+        else:
+            previous_cycle = self._previous_cycle_from_flag()
+
+        # Without a valid previous cycle, initialize the system
+        if previous_cycle is None:
+            return self._initialize_logging_root()
+
+        # Try adding one to the previous cycle count. If that value is greater than the number of cycles
+        # configuration, then we'll need to cycle back to the beginning
+        active_cycle = previous_cycle + 1
+        if active_cycle >= self.cycle_count:    # >= check because we're using 0 indexing
+            active_cycle = 0
+        return self._initialize_log_cycle(active_cycle)
+
+    def retired_cycles(self) -> list[int]:
+        """Existing cycles other than the active one, newest first"""
+        if self.active_cycle is None:
+            return []
+        cycles = [(self.active_cycle - age) % self.cycle_count for age in range(1, self.cycle_count)]
+        return [cycle_value for cycle_value in cycles if self._cycle_path(cycle_value).is_dir()]
+
+    def start_maintenance(self) -> None:
+        """Start the background maintenance of the log_root, run() calls this once logging is set up"""
+        if self.maintenance_thread is not None and self.maintenance_thread.is_alive():
+            return
+        self.maintenance_thread = Thread(target=self._maintain, name=f'{self.__class__.__name__}_maintenance', daemon=True)
+        self.maintenance_thread.start()
+
+    def wait_for_maintenance(self, timeout: float | None = None) -> bool:
+        """Wait for the maintenance thread, returns True if it has finished"""
+        if self.maintenance_thread is None:
+            return True
+        self.maintenance_thread.join(timeout)
+        return not self.maintenance_thread.is_alive()
+
+    def _maintain(self) -> None:
+        """Delete discarded directories, compress retired cycles and enforce the storage budget"""
+        try:
+            for root_item in self.log_root.iterdir():
+                if root_item.name.startswith(self.DISCARD_PREFIX):
+                    shutil.rmtree(root_item, ignore_errors = True)
+
+            if self.compress_retired:
+                for cycle_value in self.retired_cycles():
+                    self._compress_cycle(self._cycle_path(cycle_value))
+
+            if self.storage_budget is not None:
+                self._enforce_storage_budget(self.storage_budget)
+        except Exception:
+            self._logger.exception(f'Log root maintenance failed: {self.log_root}')
+
+    def _compress_cycle(self, cycle_path: Path) -> None:
+        """gzip every log in a retired cycle directory, the originals are removed once their archive is complete"""
+        for log_file in cycle_path.iterdir():
+            if not log_file.is_file() or log_file.name == self.active_log_flag or log_file.suffix == '.gz':
+                continue
+            # Left over by an interrupted compression, the original is still there
+            if log_file.suffix == '.tmp':
+                os.remove(log_file)
+                continue
+            compressed_file = log_file.with_name(f'{log_file.name}.gz')
+            partial_file = log_file.with_name(f'{log_file.name}.gz.tmp')
+            # A moderate level, the best ratios cost far more CPU than they save space on a Pi Zero
+            with open(log_file, 'rb') as source, gzip.open(partial_file, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target)
+            os.replace(partial_file, compressed_file)
+            os.remove(log_file)
+
+    def _enforce_storage_budget(self, storage_budget: int) -> None:
+        """Delete the oldest retired cycles until the retired cycles fit within the storage budget"""
+        cycle_sizes: list[tuple[int, int]] = []
+        for cycle_value in self.retired_cycles():
+            size = sum(entry.stat().st_size for entry in os.scandir(self._cycle_path(cycle_value)) if entry.is_file())
+            cycle_sizes.append((cycle_value, size))
+
+        total = sum(size for _, size in cycle_sizes)
+        for cycle_value, size in reversed(cycle_sizes):
+            if total <= storage_budget:
+                break
+            shutil.rmtree(self._cycle_path(cycle_value), ignore_errors = True)
+            total -= size
+            self._logger.info(f'Removed {self._cycle_path(cycle_value)} ({size} bytes) to fit the storage budget of {storage_budget} bytes')
 
     def run(self) -> None:
         """Run the Manager"""
@@ -254,11 +627,16 @@ class Boot_Cycle_Log_Manager:
         active_log_path = self.manage_log_root()
 
         # Initialize the rotating logger in the target directory
-        initialize_rotating_file_log(logger = self.logger, 
-                                     output_directory=active_log_path, 
-                                     output_name=self.log_file_name,
-                                     log_level=self.log_level,
-                                     max_bytes=self.max_bytes,
-                                     backup_count=self.backup_count
+        self.listener = initialize_rotating_file_log(logger = self.logger, 
+                                                     output_directory=active_log_path, 
+                                                     output_name=self.log_file_name,
+                                                     log_level=self.log_level,
+                                                     max_bytes=self.max_bytes,
+                                                     backup_count=self.backup_count,
+                                                     queued=self.queued,
+                                                     queue_size=self.queue_size
         )
-        return
\ No newline at end of file
+
+        # Cleanup of the previous cycles does not hold up startup
+        self.start_maintenance()
+        return
@@ -11,7 +11,13 @@ T = typing.TypeVar('T')
 from metarmap.METAR_SOURCE import METAR_SOURCE
 from metarmap.utils import is_between_sunrise_sunset
 from metarmap.RGB_color import RGB_color
+from metarmap.Instrumentation import Instrumentation_Config, startup_timer
+from metarmap.Profiler import Profiler_Config
+from metarmap.Watchdog import Watchdog_Config
+from metarmap.Quality import Quality_Config
 from LED_Control.LED_Driver import LED_DRIVER
+if typing.TYPE_CHECKING:
+    from METAR.station_database import Station_Database
 
 def none_check_dict_path(dict: dict[T, typing.Any], key_path: typing.Iterable[T] | T) -> typing.Any | None:
     """
@@ -55,6 +61,34 @@ class Wind_Animation_Config:
     gust_duration_max: float = 8
     gust_duty_cycle: float = 0.2
 
+@dataclass
+class Segment_Animation_Config:
+    """
+    Configure animations for stations that drive a segment of several LEDs (rings or strips)
+
+    Requires the wind animation feature, windy stations chase the fade color around their segment
+    and high wind stations pulse the high winds color, instead of blinking the whole segment
+    """
+    enabled: bool = False
+    chase_period: float = 1.5
+    chase_tail: int = 3
+    pulse_period: float = 1.0
+    pulse_min_brightness: float = 0.2
+
+@dataclass
+class Incremental_Update_Config:
+    """
+    Apply new METAR states, and the clearing of stale ones, a slice of stations per frame rather than all in the
+    frame they arrive, and recolor only the stations a slice changed, so a refresh of thousands of stations does not
+    hitch the animations
+
+    A slice ends at stations_per_frame or once budget seconds of work are spent, whichever comes first, applying and
+    recoloring share both. Until a station's turn it keeps showing its previous METAR. The first state is taken
+    whole, the map has nothing to show, and swept onto the map in slices like a change of dimming
+    """
+    enabled: bool = False
+    stations_per_frame: int | None = 64
+    budget: float | None = 0.002
 
 class Day_Night_Dimming_Config:
     """Configuraiton for day-night dimming feature"""
@@ -88,7 +122,11 @@ class Day_Night_Dimming_Config:
                     return True
     
     def use_dim(self, time: datetime) -> bool:
-        """Resolve the state of the configuration at the provided time"""
+        """
+        Resolve the state of the configuration at the provided time
+
+        :param time: Timezone aware time (a Clock's now()), naive times are taken as local time
+        """
 
         # Ignore feature if not valid
         if not self.valid:
@@ -99,10 +137,11 @@ class Day_Night_Dimming_Config:
         else:
             # Check sunrise sunset
             if self.use_sunrise_sunet:
-                is_after_sunset = not is_between_sunrise_sunset(self.day_night_latitude, self.day_night_longitude, time.now(timezone.utc))
+                is_after_sunset = not is_between_sunrise_sunset(self.day_night_latitude, self.day_night_longitude, time.astimezone(timezone.utc))
                 return is_after_sunset
             else:
-                return not (self.bright_time_start < time.now().time() < self.dim_time_start)
+                # The bright and dim times are times of day on the local clock
+                return not (self.bright_time_start < time.astimezone().time() < self.dim_time_start)
 
 class METAR_COLOR_CONFIG:
     """Configuration of colors for METAR conditions"""
@@ -168,13 +207,24 @@ class METAR_MAP_Config:
     def __init__(self, name: str, 
                  metar_source: METAR_SOURCE,
                  logging_level: int = logging.INFO, 
-                 station_map: dict[str, int] = {}, 
+                 station_map: dict[str, int | range | typing.Sequence[int]] = {}, 
                  led_driver: LED_DRIVER | None = None, 
                  metar_colors_config: METAR_COLOR_CONFIG = METAR_COLOR_CONFIG(),     # Apply default color config if not provided
                  day_night_dimming_config: Day_Night_Dimming_Config | None = None,
                  wind_animation_config: Wind_Animation_Config | None = None,
-                 lightning_animation_config: Lightning_Animation_Config | None = None
+                 lightning_animation_config: Lightning_Animation_Config | None = None,
+                 segment_animation_config: Segment_Animation_Config | None = None,
+                 incremental_update_config: Incremental_Update_Config | None = None,
+                 instrumentation_config: Instrumentation_Config | None = None,
+                 profiler_config: Profiler_Config | None = None,
+                 watchdog_config: Watchdog_Config | None = None,
+                 quality_config: Quality_Config | None = None,
+                 station_database: Station_Database | None = None
                  ):
+        """
+        :param station_database: Check every station_map ID against it, raising METAR.station_database.Unknown_Station_Error
+            for the unknown ones rather than discovering them through retrievals that never return them
+        """
         
         # Book-keeping items
         self.name = name
@@ -185,6 +235,8 @@ class METAR_MAP_Config:
         self.station_map = station_map
         self.led_driver = led_driver
         self.metar_colors = metar_colors_config
+        if station_database is not None:
+            self._validate_station_map(station_database)
 
         #Features
         # Day-Night Dimming
@@ -196,6 +248,27 @@ class METAR_MAP_Config:
         # Lightning Animation
         self.lightning_animation = lightning_animation_config
 
+        # Multi-LED Segment Animation
+        self.segment_animation = segment_animation_config
+
+        # Time-sliced application of new METAR states
+        self.incremental_update = incremental_update_config
+
+        # Diagnostics
+        self.instrumentation = instrumentation_config
+        self.profiler = profiler_config
+        self.watchdog = watchdog_config
+        self.quality = quality_config
+        startup_timer.mark('config_build')
+
+    def _validate_station_map(self, station_database: Station_Database) -> None:
+        """Raise for station_map IDs the database does not know, warn for those that do not report METARs"""
+        station_database.validate(self.station_map)
+        not_reporting = [station_id for station_id in self.station_map if not station_database[station_id].reports_metar]
+        if not_reporting:
+            logging.getLogger(f'{self.__class__.__name__}').warning(
+                f'{self.name} station_map IDs that do not report METARs: {", ".join(not_reporting)}')
+
     @property
     def led_enabled(self) -> bool:
         """led_enabled property, True if there is a valid LED_driver"""
@@ -222,4 +295,18 @@ class METAR_MAP_Config:
         """wind_animation feature property, True if the configuration is present and valid"""
         if self.lightning_animation is not None:
             return self.lightning_animation.enabled
-        return False
\ No newline at end of file
+        return False
+
+    @property
+    def segment_animation_enabled(self) -> bool:
+        """segment_animation feature property, True if the configuration is present and enabled"""
+        if self.segment_animation is not None:
+            return self.segment_animation.enabled
+        return False
+
+    @property
+    def incremental_update_enabled(self) -> bool:
+        """incremental_update feature property, True if the configuration is present and enabled"""
+        if self.incremental_update is not None:
+            return self.incremental_update.enabled
+        return False
@@ -1,8 +1,16 @@
 from __future__ import annotations
+import logging
 import typing
+from pathlib import Path
 from datetime import timedelta, datetime
 
 from METAR import METAR
+from METAR.binary_snapshot import decode_snapshot, Binary_Snapshot
+from METAR.clock import Clock, system_clock
+from METAR.recording import iter_recording
+
+if typing.TYPE_CHECKING:
+    from METAR.synthetic import Synthetic_METAR_Population
 
 class METAR_SOURCE(typing.Protocol):
     """Defines a valid METAR data source for the METARMAP loop to pull data from"""
@@ -19,10 +27,10 @@ class METAR_SOURCE(typing.Protocol):
         """new_metar_data property must be settable by the retrieving object"""
 
     @property
-    def live_metar_data(self) -> dict[str, METAR]:
+    def live_metar_data(self) -> typing.Mapping[str, METAR]:
         """
         The live_metar_data property should return a dictionary with key as station ID and value as
-        METAR objects
+        METAR objects, or a read-only mapping of the same, which the map never modifies
         """
 
     @property
@@ -70,4 +78,167 @@ class Demo_METAR_Source(METAR_SOURCE):
     
     @property
     def is_running(self) -> bool:
-        return True
\ No newline at end of file
+        return True
+
+class Replay_METAR_Source(METAR_SOURCE):
+    """
+    Plays a recording (see METAR.recording) back as a METAR_SOURCE, at a configurable speed up
+
+    Snapshots are streamed from the file as replay time reaches their retrieval time, only the next one is held in
+    memory. Each snapshot presented raises new_metar_data, snapshots passed within one poll are skipped to the newest.
+    The data goes stale, and live_metar_data becomes None, once the replay time is stale_data_time past the
+    retrieval of the snapshot presented, as with Aviation_Weather_METAR_Thread
+
+    The first snapshot is presented immediately, replay time starts at its retrieval time
+    """
+
+    def __init__(self, recording_path: Path | str,
+                 speedup: float = 1.0,
+                 stale_data_time: timedelta = timedelta(seconds = 5220),
+                 clock: Clock = system_clock):
+        """
+        :param recording_path: Recording to replay
+        :param speedup: Recording seconds replayed per second, 1440 plays a day in a minute
+        :param stale_data_time: Replay time after a snapshot's retrieval when its data becomes stale
+        :param clock: Time source, a Virtual_Clock makes replays deterministic
+        :raises Recording_Format_Error: The file is not a recording
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.recording_path = Path(recording_path)
+        self.speedup = speedup
+        self.stale_data_time = stale_data_time
+        self._clock = clock
+
+        self._records = iter_recording(self.recording_path)
+        self._next: tuple[datetime, bytes] | None = next(self._records, None)
+        self._current: tuple[datetime, bytes] | None = None
+        self._live: Binary_Snapshot | None = None       # Decoded on first access of each snapshot
+        self._new_metar_data: bool = False
+        self.snapshots_presented: int = 0
+        self.snapshots_skipped: int = 0
+
+        self._recording_start: datetime | None = self._next[0] if self._next is not None else None
+        self._replay_start: float = self._clock.monotonic()
+
+    @property
+    def replay_time(self) -> datetime | None:
+        """The point of the recording being replayed, None for an empty recording"""
+        if self._recording_start is None:
+            return None
+        return self._recording_start + timedelta(seconds = (self._clock.monotonic() - self._replay_start)*self.speedup)
+
+    @property
+    def finished(self) -> bool:
+        """Every snapshot of the recording has been presented"""
+        return self._next is None
+
+    def _advance(self) -> None:
+        """Move to the newest snapshot the replay time has reached"""
+        if self._next is None:
+            return
+        replay_time = self.replay_time
+        reached = None
+        while self._next is not None and self._next[0] <= replay_time:
+            if reached is not None:
+                self.snapshots_skipped += 1
+            reached = self._next
+            self._next = next(self._records, None)
+        if reached is not None:
+            self._current = reached
+            self._live = None
+            self._new_metar_data = True
+            self.snapshots_presented += 1
+
+    @property
+    def new_metar_data(self) -> bool:
+        self._advance()
+        return self._new_metar_data
+
+    @new_metar_data.setter
+    def new_metar_data(self, new_state: bool) -> None:
+        self._new_metar_data = new_state
+
+    @property
+    def live_metar_data(self) -> Binary_Snapshot | None:
+        """
+        The snapshot presented as a read-only mapping, None before the first snapshot and while stale
+
+        Each METAR is decoded when its station is first read
+        """
+        self._advance()
+        if self._current is None or self.data_is_stale:
+            return None
+        if self._live is None:
+            self._live = decode_snapshot(self._current[1])
+        return self._live
+
+    @property
+    def data_is_stale(self) -> bool:
+        if self._current is None:
+            return False
+        return self.replay_time - self._current[0] > self.stale_data_time
+
+    @property
+    def is_running(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        """Close the recording"""
+        self._records.close()
+
+class Synthetic_METAR_Source(METAR_SOURCE):
+    """
+    Serves a Synthetic_METAR_Population in process as a METAR_SOURCE, for benchmarking the map loop at scale
+    without a network
+
+    Every update_interval of clock time the population advances by the same simulated time and new_metar_data is
+    raised. The data never goes stale
+    """
+
+    def __init__(self, population: Synthetic_METAR_Population,
+                 update_interval: timedelta = timedelta(seconds = 900),
+                 clock: Clock = system_clock):
+        """
+        :param population: Weather to serve, advanced by this source
+        :param update_interval: Clock time between updates, and simulated time advanced per update
+        :param clock: Time source, a Virtual_Clock makes benchmarks deterministic
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.population = population
+        self.update_interval = update_interval
+        self._clock = clock
+        self._last_update: float = self._clock.monotonic()
+        self._new_metar_data: bool = True
+        self.updates: int = 0
+
+    def _advance(self) -> None:
+        """Advance the population once per update_interval elapsed"""
+        interval = self.update_interval.total_seconds()
+        while self._clock.monotonic() - self._last_update >= interval:
+            self._last_update += interval
+            self.population.advance(self.update_interval)
+            self._new_metar_data = True
+            self.updates += 1
+
+    @property
+    def new_metar_data(self) -> bool:
+        self._advance()
+        return self._new_metar_data
+
+    @new_metar_data.setter
+    def new_metar_data(self, new_state: bool) -> None:
+        self._new_metar_data = new_state
+
+    @property
+    def live_metar_data(self) -> dict[str, METAR]:
+        """The latest report of every station, as a dict of its own"""
+        self._advance()
+        return self.population.snapshot()
+
+    @property
+    def data_is_stale(self) -> bool:
+        return False
+
+    @property
+    def is_running(self) -> bool:
+        return True
@@ -3,22 +3,23 @@ from threading import Event
 import typing
 from types import TracebackType
 import logging
+from collections import ChainMap, deque
 from datetime import datetime, timedelta
 from random import random
+from time import perf_counter_ns
 
 # Core Module Imports
 from METAR import METAR
 from metarmap.METAR_Map_Config import METAR_MAP_Config
 from metarmap.Station import Station, Random_Blink_Manager, Burst_Blink_Manager
 from metarmap.RGB_color import RGB_color, apply_brightness
-
-# LED Driver
-try:
-    from LED_Control.RPi_zero_NeoPixel_LED_Driver import RPi_zero_NeoPixel_LED_Driver, RPi_zero_NeoPixel_Config
-# A NotImplementedError will be raised if the platform has not implemented these things (such as your computer)
-# Just pass along, for testing on machines that hit this error you should not try to use them anyways
-except NotImplementedError:
-    pass
+from metarmap.Framebuffer import Chase_Animation, Pulse_Animation
+from metarmap.Instrumentation import Loop_Instrumentation, Stage_Histogram, startup_timer
+from metarmap.Logging import Rate_Limited_Error_Reporter
+from metarmap.Profiler import Sampling_Profiler
+from metarmap.Watchdog import Watchdog
+from metarmap.Quality import Quality_Controller
+from METAR.clock import Clock, system_clock
 
 def get_time_delta_to_event(event_time: datetime) -> timedelta:
     '''
@@ -28,39 +29,87 @@ def get_time_delta_to_event(event_time: datetime) -> timedelta:
     time_delta = currentTime - event_time
     return time_delta
 
+class _Layered_METAR_State(ChainMap):
+    '''
+    The map's own dict layered over the source's METAR state while a new state is applied in slices, stations
+    removed from it are hidden from the source's state beneath
+    '''
+
+    def __init__(self, source_state: typing.Mapping[str, METAR | None]):
+        super().__init__({}, source_state)
+        self.removed: set[str] = set()
+
+    def __getitem__(self, station_id: str) -> METAR | None:
+        if station_id in self.removed:
+            raise KeyError(station_id)
+        return super().__getitem__(station_id)
+
+    def __contains__(self, station_id: object) -> bool:
+        return station_id not in self.removed and super().__contains__(station_id)
+
+    def __setitem__(self, station_id: str, metar: METAR | None) -> None:
+        self.removed.discard(station_id)
+        self.maps[0][station_id] = metar
+
+    def pop(self, station_id: str, default: typing.Any = None) -> typing.Any:
+        self.removed.add(station_id)
+        return self.maps[0].pop(station_id, default)
+
 class MainLoop:
     '''
     Main program loop, handles the side threads and takes the configuration
     '''
 
-    def __init__(self, config: METAR_MAP_Config):
+    def __init__(self, config: METAR_MAP_Config, clock: Clock = system_clock):
+        '''
+        :param config: Defines the map, its METAR_SOURCE, LED_DRIVER and features
+        :param clock: Time source for data ages, blinking and dimming, a Virtual_Clock runs the map faster than real time
+        '''
         self._logger = logging.getLogger(f'{self.__class__.__name__}')
 
         # A METAR_MAP_Config object defines all necessary elements of the system
         self.config: METAR_MAP_Config = config
+        self.clock: Clock = clock
 
         # The map holds the current METAR state that will drive the LEDs
-        self._current_metar_state: dict[str, METAR | None] | None = None   # Holder for the current metar state of the map
-        self._current_metar_state_datetime: timedelta | None = None      # The age of the live data
+        self._current_metar_state: typing.Mapping[str, METAR | None] | None = None   # Holder for the current metar state of the map
+        self._current_metar_state_time: float | None = None     # clock.monotonic() when the live data was taken
+
+        # Per-station errors repeat every frame until new data resolves them, log each one once and summarize repeats
+        self.error_reporter = Rate_Limited_Error_Reporter(self._logger, clock=self.clock)
 
         wind_blink_manager: Random_Blink_Manager | None = None
         wind_gust_manager: Random_Blink_Manager | None = None
-        if self.config.wind_animation.enabled:
+        lightning_cycle_manager: Burst_Blink_Manager | None = None
+        if self.config.wind_animation_enabled:
             if self.config.wind_animation.blink_threshold is not None:
                 wind_blink_manager = Random_Blink_Manager(blink_time_min=self.config.wind_animation.blink_duration_min, 
                                                           blink_time_max=self.config.wind_animation.blink_duration_min, 
-                                                          duty_cycle=self.config.wind_animation.blink_duty_cycle)
+                                                          duty_cycle=self.config.wind_animation.blink_duty_cycle,
+                                                          clock=self.clock)
             if self.config.wind_animation.gust_threshold is not None:
                 wind_gust_manager = Random_Blink_Manager(blink_time_min=self.config.wind_animation.gust_duration_min, 
                                                           blink_time_max=self.config.wind_animation.gust_duration_max, 
-                                                          duty_cycle=self.config.wind_animation.gust_duty_cycle)
+                                                          duty_cycle=self.config.wind_animation.gust_duty_cycle,
+                                                          clock=self.clock)
         if self.config.lightning_animation_enabled:
             lightning_cycle_manager = Burst_Blink_Manager(cycle_duration_min=self.config.lightning_animation.cycle_duration_min,
                                                           cycle_duration_max=self.config.lightning_animation.cycle_duration_max,
                                                           cycle_duty_cycle=self.config.lightning_animation.cycle_duty_cycle,
                                                           burst_duration_min=self.config.lightning_animation.burst_duration_min,
                                                           burst_duration_max=self.config.lightning_animation.burst_duration_max,
-                                                          burst_duty_cycle=self.config.lightning_animation.burst_duty_cycle)
+                                                          burst_duty_cycle=self.config.lightning_animation.burst_duty_cycle,
+                                                          clock=self.clock)
+        self._lightning_cycle_manager: Burst_Blink_Manager | None = lightning_cycle_manager
+
+        # Stations driving several LEDs can animate their whole segment
+        self._chase_animation: Chase_Animation | None = None
+        self._pulse_animation: Pulse_Animation | None = None
+        if self.config.segment_animation_enabled:
+            self._chase_animation = Chase_Animation(period=self.config.segment_animation.chase_period,
+                                                    tail=self.config.segment_animation.chase_tail)
+            self._pulse_animation = Pulse_Animation(period=self.config.segment_animation.pulse_period,
+                                                    min_brightness=self.config.segment_animation.pulse_min_brightness)
 
         # The map holds the list of stations to track their LED states
         self.stations: list[Station] = []
@@ -73,6 +122,61 @@ class MainLoop:
                 lightning_cycle_manager = lightning_cycle_manager
             ))
 
+        # The committed framebuffer, 3 bytes (R, G, B) per LED, mirrors what was last pushed to the LED_DRIVER
+        self.led_count: int = max((station.segment.stop for station in self.stations), default=0)
+        self.framebuffer: bytearray = bytearray(self.led_count*3)
+        self.frame_id: int = 0
+        self._frame_listeners: list[typing.Callable[[int, bytearray], None]] = []
+        # Drivers that accept a whole framebuffer get one call per frame instead of one per LED
+        self._led_driver_takes_frames: bool = hasattr(self.config.led_driver, 'update_frame')
+        # Drivers written before show() push each update_LED themselves
+        self._led_driver_show: typing.Callable[[], None] | None = getattr(self.config.led_driver, 'show', None)
+
+        # Per-stage timing of the loop, can be switched on and off at runtime through instrumentation.enabled
+        self.instrumentation: Loop_Instrumentation = Loop_Instrumentation.from_config(self.config.instrumentation)
+        self._timing_frame: bool = False        # Latched at the start of each loop so a frame is timed as a whole
+
+        # Opt-in stack sampler of all threads, idle until its signal arrives
+        self.profiler: Sampling_Profiler | None = None
+        if self.config.profiler is not None and self.config.profiler.enabled:
+            self.profiler = Sampling_Profiler(self.config.profiler)
+            self.profiler.install()
+
+        # Opt-in stall watchdog of the frames and the METAR_SOURCE, pings systemd while healthy
+        self.watchdog: Watchdog | None = None
+        if self.config.watchdog is not None and self.config.watchdog.enabled:
+            self.watchdog = Watchdog(self.config.watchdog, metar_source=self.config.metar_source, clock=self.clock)
+            self.watchdog.start()
+
+        # Opt-in adaptive quality, steps down the per-frame work while frames overrun their budget
+        self.quality: Quality_Controller | None = None
+        if self.config.quality is not None and self.config.quality.enabled:
+            self.quality = Quality_Controller(self.config.quality)
+        self.quality_level: int = 0
+        self._color_map_dirty: bool = True      # The METAR state or dimming changed since the last full color map
+
+        # New METAR states and stale clearing can be applied a slice of stations per frame
+        self._pending_metar_state: typing.Mapping[str, METAR | None] | None = None
+        self._pending_stale: bool = False       # Clearing to METAR() is pending
+        self._pending_cursor: int = 0           # Index of the next station to apply
+        self._stale_cleared: bool = False       # The current state was cleared for the stale data, once per staleness
+        self._owns_metar_state: bool = False    # The current state is a dict of the map's own, not the source's data
+        # With incremental updates the color map is sliced the same way: the stations a slice dirtied, and a sweep
+        # over every station when the whole map needs recoloring, are recolored within the slice limits. Stations
+        # whose color changes between METAR updates are recolored every frame
+        self._recolor_queue: deque[Station] = deque()
+        self._recolor_sweep: int | None = None      # Index of the next station of a whole map recolor
+        self._dynamic_stations: dict[Station, None] = {}
+        self._slice_deadline_frame: int = -1
+        self._slice_deadline_ns: int = 0
+
+        # Always-on counters for monitoring, plain attributes read by the metrics endpoint
+        self.frame_count: int = 0
+        self._first_frame_pending: bool = True      # Until the first frame with METAR data, for the startup timing
+        self.pixels_pushed: int = 0             # LED pixels sent to the LED_DRIVER
+        self.dimming_active: bool = False
+        self.frame_time_histogram: Stage_Histogram = Stage_Histogram()
+
         # Debug attributes for better debug function
         if self.config.logging_level == logging.DEBUG:
             self.debug_attrs = {
@@ -100,8 +204,8 @@ class MainLoop:
     @property
     def current_metar_state_age(self) -> timedelta:
         """Return time since last update (age of current date)"""
-        if self._current_metar_state_datetime is not None:
-            return datetime.now()-self._current_metar_state_datetime
+        if self._current_metar_state_time is not None:
+            return timedelta(seconds = self.clock.monotonic() - self._current_metar_state_time)
         return None
     
     def get_METAR_of_station(self, station_id: str):
@@ -110,9 +214,24 @@ class MainLoop:
         try:
             metar_data = self._current_metar_state[station_id]
         except KeyError:
-            self._logger.error(f'No METAR data for station: {station_id}')
+            self.error_reporter.report(station_id, 'missing', 'No METAR data for station: %s', station_id)
         return metar_data
     
+    def add_frame_listener(self, listener: typing.Callable[[int, bytearray], None]) -> None:
+        """
+        Register a callable that receives (frame_id, framebuffer) every time a changed frame is committed
+
+        Listeners run on the render loop, so they must return quickly and copy the framebuffer if they keep it
+        """
+        self._frame_listeners.append(listener)
+
+    def remove_frame_listener(self, listener: typing.Callable[[int, bytearray], None]) -> None:
+        """Unregister a frame listener, ignored if it was not registered"""
+        try:
+            self._frame_listeners.remove(listener)
+        except ValueError:
+            pass
+
     def _time_for_new_data(self) -> bool:
         """
         Check the current time against the age of the current METAR data, 
@@ -142,17 +261,101 @@ class MainLoop:
             if self._current_metar_state is None:
                 self._logger.debug(f'_current_metar_state is None')
             new_metar_dict = self.config.metar_source.live_metar_data       # Get the live data
-            self._current_metar_state = new_metar_dict              # Set the current data dict to the new data
-            self._current_metar_state_datetime = datetime.now()
+            self._current_metar_state_time = self.clock.monotonic()
             self.config.metar_source.new_metar_data = False                # Set the new data flag to false
-
-        # If the source signals that the data is stale, we want to clear out our live state
-        if self.config.metar_source.data_is_stale:
+            self._stale_cleared = False
+            if new_metar_dict is not None:
+                startup_timer.mark('first_fetch')
+
+            # Sliced into the state of the map a slice of stations per frame, or swapped in whole. A lazy snapshot
+            # is only decoded station by station as it is read, within the slices
+            if self.config.incremental_update_enabled and self._current_metar_state is not None and new_metar_dict is not None:
+                self._own_metar_state()
+                self._pending_metar_state = new_metar_dict
+                self._pending_stale = False
+                self._pending_cursor = 0
+            else:
+                self._current_metar_state = new_metar_dict              # Set the current data dict to the new data
+                self._owns_metar_state = False
+                self._pending_metar_state = None
+                self._pending_stale = False
+                self._color_map_dirty = True
+
+        # If the source signals that the data is stale, we want to clear out our live state, once
+        if self.config.metar_source.data_is_stale and not self._stale_cleared and self._current_metar_state is not None:
             self._logger.debug(f'metar_source signals that data is stale')
-            if self._current_metar_state is not None:
-                for station_id in self._current_metar_state:
-                    self._current_metar_state[station_id] = METAR()
-                    self._current_metar_state_datetime = None
+            self._stale_cleared = True
+            self._current_metar_state_time = None
+            if self.config.incremental_update_enabled:
+                self._own_metar_state()
+                self._pending_metar_state = None
+                self._pending_stale = True
+                self._pending_cursor = 0
+            else:
+                # A new dict, the state may be the source's own or read-only
+                self._current_metar_state = {station_id: METAR() for station_id in self._current_metar_state}
+                self._owns_metar_state = True
+                self._color_map_dirty = True
+
+        if self._pending_metar_state is not None or self._pending_stale:
+            self._apply_pending_metar_state()
+
+    def _own_metar_state(self) -> None:
+        """
+        Layer a dict of the map's own over the current state before slices are applied to it, the source's data is
+        never modified and nothing is copied. Once every station has had its turn the dict alone is the state
+        """
+        if self._owns_metar_state:
+            return
+        self._current_metar_state = _Layered_METAR_State(self._current_metar_state)
+        self._owns_metar_state = True
+
+    def _slice_deadline(self) -> int | None:
+        """perf_counter_ns() deadline of this frame's incremental work, shared by applying data and recoloring"""
+        budget = self.config.incremental_update.budget
+        if budget is None:
+            return None
+        if self._slice_deadline_frame != self.frame_count:
+            self._slice_deadline_frame = self.frame_count
+            self._slice_deadline_ns = perf_counter_ns() + int(budget*1e9)
+        return self._slice_deadline_ns
+
+    def _apply_pending_metar_state(self) -> None:
+        """Apply the next slice of a pending METAR state, or of the stale clearing, to the current state"""
+        incremental_update = self.config.incremental_update
+        stations = self.stations
+        current = self._current_metar_state
+        pending = self._pending_metar_state
+        stale = self._pending_stale
+
+        index = self._pending_cursor
+        end = len(stations)
+        if incremental_update.stations_per_frame is not None:
+            end = min(end, index + incremental_update.stations_per_frame)
+        deadline = self._slice_deadline()
+        recolor_queue = self._recolor_queue
+        while index < end:
+            station = stations[index]
+            index += 1
+            if stale:
+                current[station.id] = METAR()
+            elif station.id in pending:
+                current[station.id] = pending[station.id]
+            else:
+                current.pop(station.id, None)
+            station.dirty = True
+            recolor_queue.append(station)
+            if deadline is not None and perf_counter_ns() >= deadline:
+                break
+
+        self._pending_cursor = index
+        if index >= len(stations):
+            self._pending_metar_state = None
+            self._pending_stale = False
+            self._pending_cursor = 0
+            # Every station is in the map's own dict now
+            if isinstance(current, _Layered_METAR_State):
+                self._current_metar_state = current.maps[0]
 
     def _process_flight_category(self, station_metar: METAR) -> RGB_color:
         """Handle the flight category for the base color"""
@@ -172,6 +375,15 @@ class MainLoop:
             raise ValueError(f'station_metar: {station_metar} does not have the flight_category attribute')
         return color
     
+    def _update_dimming(self) -> None:
+        """Resolve the day_night_dimming state once per frame, it is the same for every station"""
+        if self.config.day_night_dimming is not None:
+            # The configuration itself provides the method to determine if it should be dim now
+            dimming_active = self.config.day_night_dimming.use_dim(self.clock.now())
+            if dimming_active != self.dimming_active:
+                self.dimming_active = dimming_active
+                self._color_map_dirty = True
+
     def _process_brightness(self, color: RGB_color) -> RGB_color:
         """Handle the brightness configuraitons and modify color appropriately"""
 
@@ -179,10 +391,9 @@ class MainLoop:
         modified_color = color
 
         # Check if there is a day_night_dimming configuration, if there is, apply the brightness multiplier
-        if self.config.day_night_dimming is not None:
-            if self.config.day_night_dimming.use_dim(datetime.now()):       # The configuration itself provides the method to determine if it should be dim now
-                brightness_multiplier = self.config.day_night_dimming.brightness_dim
-                modified_color = apply_brightness(color, brightness_multiplier)
+        if self.config.day_night_dimming is not None and self.dimming_active:
+            brightness_multiplier = self.config.day_night_dimming.brightness_dim
+            modified_color = apply_brightness(color, brightness_multiplier)
 
         return modified_color
 
@@ -211,17 +422,31 @@ class MainLoop:
         if gust_speed is None:
             gust_speed = 0
 
+        # Multi-LED segments animate the whole segment for wind instead of blinking it
+        segment_animated = self._chase_animation is not None and len(station.segment) > 1
+
         # High Wind feature first
         # If over the gust or wind threshold for high wind, run blink and grab the output
         if gust_speed > gust_threshold or wind_speed > gust_threshold:
+            station.dynamic = True
+            if segment_animated:
+                station.animation = self._pulse_animation
+                station.animation_color = self.config.metar_colors.color_high_winds
+                return color
             if station.high_wind_state.blink():
                 return self.config.metar_colors.color_high_winds
 
         # Low wind blink second
         elif wind_speed > blink_threshold:
+            station.dynamic = True
+            if segment_animated:
+                station.animation = self._chase_animation
+                station.animation_color = self.config.metar_colors.fade(color)
+                return color
             if station.wind_state.blink():
                 return self.config.metar_colors.fade(color)
 
+        station.animation = None
         return color
     
     def _process_lightning(self, color: RGB_color, station: Station, station_metar: METAR) -> RGB_color:
@@ -263,63 +488,197 @@ class MainLoop:
         if self._current_metar_state is None:
             return
         
+        # Per-feature time is summed over the stations and recorded once per frame
+        timed = self._timing_frame
+        category_ns = lightning_ns = wind_ns = brightness_ns = 0
+        if timed:
+            t0 = perf_counter_ns()
+        self._update_dimming()
+        if timed:
+            brightness_ns += perf_counter_ns() - t0
+
+        # Degraded quality skips stations whose color cannot have changed, and halves the rate of the others
+        quality_level = self.quality_level
+        skip_static = quality_level >= 1 and not self._color_map_dirty
+        half_rate_parity = self.frame_count & 1 if quality_level >= 3 else None
+        stations: typing.Iterable[Station] = self.stations
+        if self.config.incremental_update_enabled:
+            if self._color_map_dirty:
+                self._recolor_sweep = 0
+            stations = self._incremental_recolor()
+            skip_static = False
+        self._color_map_dirty = False
+        
         # Get the station state and the METAR data
-        for station in self.stations:
+        for station in stations:
+            if station.dynamic:
+                if half_rate_parity is not None and station.idx & 1 == half_rate_parity:
+                    continue
+            elif skip_static and not station.dirty:
+                continue
             try:
                 station_metar = self._current_metar_state[station.id]
             except KeyError:
-                self._logger.error(f'No METAR data for station: {station}')
+                self.error_reporter.report(station.id, 'missing', 'No METAR data for station: %s', station)
                 continue
             
             # It's possible that the metar for a given station ID is None, if it could not be retreived
             if station_metar is None:
-                self._logger.error(f'Station: {station.id} has no data in _current_metar_state: {self._current_metar_state[station.id]}')
+                self.error_reporter.report(station.id, 'no_data', 'Station: %s has no data in _current_metar_state', station.id)
                 continue
             
+            if timed:
+                t0 = perf_counter_ns()
             color = None
             try:
                 color = self._process_flight_category(station_metar)
             # A ValueError is raised if the station_metar does not have a supported flight category
             # Log the error, but continue through the loop (ignore this case, hopefully a new METAR will resolve it)
             except (ValueError, AttributeError) as e:
-                self._logger.exception(f'Error encountered in process_flight_category for station_id: {station.id}, METAR: {station_metar}')
+                self.error_reporter.report(station.id, 'flight_category', 'Error encountered in process_flight_category for station_id: %s, METAR: %s',
+                                           station.id, station_metar, exc_info=True)
                 continue
             
+            if timed:
+                t1 = perf_counter_ns()
+                category_ns += t1 - t0
             lightning_color = color
             lightning_colored = False
             try:
                 lightning_colored, lightning_color = self._process_lightning(color, station, station_metar)
             except (ValueError, AttributeError) as e:
-                self._logger.exception(f'Error encountered in _process_lightning for station_id: {station.id}, METAR: {station_metar}')
+                self.error_reporter.report(station.id, 'lightning', 'Error encountered in _process_lightning for station_id: %s, METAR: %s',
+                                           station.id, station_metar, exc_info=True)
                 continue
+            station.dynamic = lightning_colored        # _process_wind marks windy stations
             
 
+            if timed:
+                t2 = perf_counter_ns()
+                lightning_ns += t2 - t1
             wind_color = lightning_color
             if not lightning_colored:
                 try:
                     wind_color = self._process_wind(color, station, station_metar)
                 except (ValueError, AttributeError) as e:
-                    self._logger.exception(f'Error encountered in _process_wind for station_id: {station.id}, METAR: {station_metar}')
+                    self.error_reporter.report(station.id, 'wind', 'Error encountered in _process_wind for station_id: %s, METAR: %s',
+                                               station.id, station_metar, exc_info=True)
                     continue
+            else:
+                station.animation = None
 
+            if timed:
+                t3 = perf_counter_ns()
+                wind_ns += t3 - t2
             brightness_modified_color = self._process_brightness(wind_color)
+            if station.animation is not None:
+                station.animation_color = self._process_brightness(station.animation_color)
+            if timed:
+                brightness_ns += perf_counter_ns() - t3
 
             # Apply the result to the object station list
             station.active_color = brightness_modified_color
+            station.dirty = False
+            # The station colored cleanly, any error it was reporting has cleared
+            self.error_reporter.clear(station.id)
+
+        if timed:
+            self.instrumentation.record('color_map.category', category_ns)
+            self.instrumentation.record('color_map.lightning', lightning_ns)
+            self.instrumentation.record('color_map.wind', wind_ns)
+            self.instrumentation.record('color_map.brightness', brightness_ns)
             
         return
 
+    def _incremental_recolor(self) -> typing.Iterator[Station]:
+        """
+        The stations to recolor this frame with incremental updates: the dynamic ones, then the queued and swept
+        ones up to stations_per_frame or the slice deadline
+        """
+        dynamic_stations = self._dynamic_stations
+        for station in list(dynamic_stations):
+            yield station
+            if not station.dynamic:
+                del dynamic_stations[station]
+
+        incremental_update = self.config.incremental_update
+        limit = incremental_update.stations_per_frame
+        deadline = self._slice_deadline()
+        recolor_queue = self._recolor_queue
+        colored = 0
+        while limit is None or colored < limit:
+            if recolor_queue:
+                station = recolor_queue.popleft()
+                # Already recolored, as a dynamic station or by the sweep
+                if not station.dirty:
+                    continue
+            elif self._recolor_sweep is not None:
+                station = self.stations[self._recolor_sweep]
+                self._recolor_sweep += 1
+                if self._recolor_sweep >= len(self.stations):
+                    self._recolor_sweep = None
+            else:
+                break
+            yield station
+            colored += 1
+            if station.dynamic:
+                dynamic_stations[station] = None
+            if deadline is not None and perf_counter_ns() >= deadline:
+                break
+
     def _update_LEDs(self) -> None:
         """
         Update the LED state using the current active station data
         """
 
+        led_driver = self.config.led_driver
+        framebuffer = self.framebuffer
+        changed_stations: list[Station] = []
+        now = self.clock.monotonic()
+
         for station in self.stations:
-            # Only call this update if the color has actually changed
-            if station.updated:
-                # Bypass if LED_driver is not configured (allows for testing without actually using LEDs)
-                if self.config.led_driver is not None:
-                    self.config.led_driver.update_LED(station.pin_index, station.active_color)
+            color = station.active_color
+            if color is None:
+                continue
+            rgb = bytes((color.r, color.g, color.b))
+            # Animated segments are rendered in bulk every frame
+            if station.animation is not None:
+                animation_color = station.animation_color
+                pixels = station.animation.render(len(station.segment),
+                                                  bytes((animation_color.r, animation_color.g, animation_color.b)),
+                                                  rgb, now)
+                station.segment.write(framebuffer, pixels)
+                changed_stations.append(station)
+            # Otherwise only fill the segment if the color has actually changed
+            elif station.updated:
+                station.segment.fill(framebuffer, rgb)
+                changed_stations.append(station)
+            station.updated = False
+
+        # Bypass if LED_driver is not configured (allows for testing without actually using LEDs)
+        if led_driver is not None:
+            if self._timing_frame:
+                transmit_start = perf_counter_ns()
+            if changed_stations:
+                self.pixels_pushed += sum(len(station.segment) for station in changed_stations)
+                if self._led_driver_takes_frames:
+                    led_driver.update_frame(framebuffer)
+                else:
+                    for station in changed_stations:
+                        for index in station.segment.indices:
+                            offset = index*3
+                            led_driver.update_LED(index, RGB_color(*framebuffer[offset:offset + 3]))
+            # Signal the end of the frame, the driver decides if anything needs to be transmitted
+            if self._led_driver_show is not None:
+                self._led_driver_show()
+            if self._timing_frame:
+                self.instrumentation.record('driver_transmit', perf_counter_ns() - transmit_start)
+
+        # Publish the committed frame to any listeners (previews, mirrors)
+        if changed_stations:
+            self.frame_id += 1
+            for listener in self._frame_listeners:
+                listener(self.frame_id, framebuffer)
 
         return
     
@@ -327,13 +686,13 @@ class MainLoop:
         """Debug functions"""
         # Log the activation and deactivation of night mode
         if self.config.day_night_dimming is not None:
-            if self.config.day_night_dimming.use_dim(datetime.now()):       # The configuration itself provides the method to determine if it should be dim now
+            if self.dimming_active:       # Resolved for this frame by _update_dimming
                 if not self.debug_attrs['night_mode_active']:
                     self.debug_attrs['night_mode_active'] = True
-                    self._logger.debug(f'Night Mode activated: {datetime.now()}')
+                    self._logger.debug(f'Night Mode activated: {self.clock.now()}')
             elif self.debug_attrs['night_mode_active']:
                 self.debug_attrs['night_mode_active'] = False
-                self._logger.debug(f'Night Mode deactivated: {datetime.now()}')
+                self._logger.debug(f'Night Mode deactivated: {self.clock.now()}')
 
         # Log that there is no LED driver (once)
         if self.config.led_driver is None:
@@ -341,8 +700,23 @@ class MainLoop:
                 self.debug_attrs['no_LED_Driver'] = True
                 self._logger.debug(f'No LED Driver present')
 
+    def _apply_quality_level(self, level: int) -> None:
+        """Switch the per-frame work to a quality level, see metarmap.Quality.QUALITY_LEVELS"""
+        self.quality_level = level
+        if self._lightning_cycle_manager is not None:
+            self._lightning_cycle_manager.burst_resolution = 0.5 if level >= 2 else 1.0
+        # Recompute every station once at the new level
+        self._color_map_dirty = True
+
     def loop(self):
 
+        # Stage timing costs a single attribute check per frame when disabled
+        self._timing_frame = self.instrumentation.enabled
+        if self._timing_frame:
+            self._timed_loop()
+            return
+        frame_start = perf_counter_ns()
+
         # See if the METAR_SOURCE has new data available and update the mainloop data if so
         self._check_for_new_METAR_data()
 
@@ -356,6 +730,46 @@ class MainLoop:
         if self.config.logging_level == logging.DEBUG:
             self.debug_funcs()
 
+        self._end_frame(perf_counter_ns() - frame_start)
+
+    def _end_frame(self, frame_ns: int) -> None:
+        """Bookkeeping after every frame, timed or not: frame time, watchdog heartbeat, quality level and frame count"""
+        self.frame_time_histogram.record(frame_ns)
+        if self.watchdog is not None:
+            self.watchdog.heartbeat(frame_ns)
+        if self.quality is not None and self.quality.record(frame_ns):
+            self._apply_quality_level(self.quality.level)
+        self.frame_count += 1
+        if self._first_frame_pending and self._current_metar_state is not None:
+            self._first_frame_pending = False
+            startup_timer.mark('first_frame')
+
+    def _timed_loop(self):
+        """The loop, with every stage timed into the instrumentation histograms"""
+        instrumentation = self.instrumentation
+
+        t0 = perf_counter_ns()
+        self._check_for_new_METAR_data()
+        t1 = perf_counter_ns()
+        self._update_color_map()
+        t2 = perf_counter_ns()
+        self._update_LEDs()
+        t3 = perf_counter_ns()
+
+        if self.config.logging_level == logging.DEBUG:
+            self.debug_funcs()
+
+        instrumentation.record('check_for_new_METAR_data', t1 - t0)
+        instrumentation.record('update_color_map', t2 - t1)
+        instrumentation.record('update_LEDs', t3 - t2)
+        instrumentation.record('loop', t3 - t0)
+        self._end_frame(t3 - t0)
+        instrumentation.maybe_log_summary(t3)
+
     def close(self):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.profiler is not None:
+            self.profiler.uninstall()
         if self.config.led_driver is not None:
             self.config.led_driver.close()
\ No newline at end of file
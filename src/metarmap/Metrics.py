@@ -0,0 +1,247 @@
+from __future__ import annotations
+import logging
+import math
+import typing
+from types import TracebackType
+from threading import Thread, Lock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from metarmap.Instrumentation import Stage_Histogram, BUCKET_UPPER_BOUNDS_NS
+
+if typing.TYPE_CHECKING:
+    from metarmap.MainLoop import MainLoop
+    from metarmap.METAR_SOURCE import METAR_SOURCE
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_value(value: float) -> str:
+    """Prometheus text representation of a sample value"""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label_value(str(value))}"' for key, value in labels.items()) + '}'
+
+class Metric_Family:
+    """One named metric (counter, gauge or histogram) and its samples"""
+
+    def __init__(self, name: str, metric_type: typing.Literal['counter', 'gauge', 'histogram'], help: str):
+        self.name = name
+        self.metric_type = metric_type
+        self.help = help
+        self.samples: list[tuple[str, dict[str, str], float]] = []     # (name suffix, labels, value)
+
+    def add(self, value: float, labels: dict[str, str] | None = None, suffix: str = '') -> Metric_Family:
+        """Add a sample, returns the family for chaining"""
+        self.samples.append((suffix, labels or {}, value))
+        return self
+
+    def add_histogram(self, histogram: Stage_Histogram, labels: dict[str, str] | None = None, scale: float = 1e-9) -> Metric_Family:
+        """
+        Add the samples of a Stage_Histogram, durations converted by scale (ns to seconds by default)
+
+        The bucket counts are copied first and the count derived from them, so a histogram being written
+        by the render loop still produces a consistent (cumulative, +Inf == count) set of samples
+        """
+        labels = labels or {}
+        counts = list(histogram.counts)
+        total = histogram.total_ns
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKET_UPPER_BOUNDS_NS, counts):
+            cumulative += bucket_count
+            self.add(cumulative, {**labels, 'le': _format_value(bound*scale)}, '_bucket')
+        cumulative += counts[-1]
+        self.add(cumulative, {**labels, 'le': '+Inf'}, '_bucket')
+        self.add(total*scale, labels, '_sum')
+        self.add(cumulative, labels, '_count')
+        return self
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.metric_type}']
+        for suffix, labels, value in self.samples:
+            lines.append(f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+Collector = typing.Callable[[], typing.Iterable[Metric_Family]]
+
+class Metrics_Registry:
+    """Holds the collectors, which are only evaluated when the metrics are scraped"""
+
+    def __init__(self):
+        self._collectors: list[Collector] = []
+        self._lock = Lock()
+
+    def register(self, collector: Collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def unregister(self, collector: Collector) -> None:
+        with self._lock:
+            try:
+                self._collectors.remove(collector)
+            except ValueError:
+                pass
+
+    def collect(self) -> list[Metric_Family]:
+        """Evaluate every collector, merging families of the same name (e.g. one per map)"""
+        with self._lock:
+            collectors = list(self._collectors)
+        families: dict[str, Metric_Family] = {}
+        for collector in collectors:
+            for family in collector():
+                merged = families.get(family.name)
+                if merged is None:
+                    families[family.name] = family
+                else:
+                    merged.samples.extend(family.samples)
+        return list(families.values())
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines: list[str] = []
+        for family in self.collect():
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+class Main_Loop_Collector:
+    """
+    Render loop metrics of a MainLoop, read from its plain counters at scrape time
+
+    Nothing is kept between scrapes, so any number of scrapers see the same values. The frame rate is
+    rate(metarmap_frames_total[1m]) on the Prometheus side
+    """
+
+    def __init__(self, main_loop: MainLoop, map_name: str | None = None):
+        self.main_loop = main_loop
+        self.labels = {'map': map_name if map_name is not None else main_loop.config.name}
+
+    def __call__(self) -> list[Metric_Family]:
+        main_loop = self.main_loop
+        labels = self.labels
+
+        families = [
+            Metric_Family('metarmap_frames_total', 'counter', 'Frames rendered').add(main_loop.frame_count, labels),
+            Metric_Family('metarmap_frame_time_seconds', 'histogram', 'Time spent in MainLoop.loop').add_histogram(main_loop.frame_time_histogram, labels),
+            Metric_Family('metarmap_pixels_pushed_total', 'counter', 'LED pixels sent to the LED driver').add(main_loop.pixels_pushed, labels),
+            Metric_Family('metarmap_dimming_active', 'gauge', '1 while day-night dimming is applied').add(main_loop.dimming_active, labels),
+            Metric_Family('metarmap_quality_level', 'gauge', 'Adaptive quality level, 0 is full quality').add(main_loop.quality_level, labels),
+            Metric_Family('metarmap_station_errors_suppressed_total', 'counter', 'Repeated station errors not logged in full').add(main_loop.error_reporter.suppressed_total, labels),
+        ]
+        data_age = main_loop.current_metar_state_age
+        if data_age is not None:
+            families.append(Metric_Family('metarmap_data_age_seconds', 'gauge', 'Age of the METAR state being displayed').add(data_age.total_seconds(), labels))
+        return families
+
+class METAR_Source_Collector:
+    """Fetch metrics of a METAR_SOURCE, including the retrieval statistics of sources that keep fetch_stats"""
+
+    def __init__(self, metar_source: METAR_SOURCE, source_name: str | None = None):
+        self.metar_source = metar_source
+        self.labels = {'source': source_name if source_name is not None else metar_source.__class__.__name__}
+
+    def __call__(self) -> list[Metric_Family]:
+        labels = self.labels
+        families = [
+            Metric_Family('metarmap_source_running', 'gauge', '1 while the METAR source is running').add(self.metar_source.is_running, labels),
+            Metric_Family('metarmap_source_data_stale', 'gauge', '1 while the METAR source data is stale').add(self.metar_source.data_is_stale, labels),
+        ]
+        fetch_stats = getattr(self.metar_source, 'fetch_stats', None)
+        if fetch_stats is None:
+            return families
+        families.extend([
+            Metric_Family('metarmap_fetch_attempts_total', 'counter', 'METAR retrievals attempted').add(fetch_stats.attempts, labels),
+            Metric_Family('metarmap_fetch_successes_total', 'counter', 'METAR retrievals that returned data').add(fetch_stats.successes, labels),
+            Metric_Family('metarmap_fetch_bytes_total', 'counter', 'Bytes of METAR XML downloaded').add(fetch_stats.bytes_downloaded, labels),
+            Metric_Family('metarmap_parse_duration_seconds', 'gauge', 'Duration of the last METAR XML parse').add(fetch_stats.parse_duration_s, labels),
+            Metric_Family('metarmap_parse_duration_seconds_total', 'counter', 'Total time spent parsing METAR XML').add(fetch_stats.parse_duration_total_s, labels),
+            Metric_Family('metarmap_stations_missing', 'gauge', 'Requested stations missing from the last retrieval').add(fetch_stats.stations_missing, labels),
+        ])
+        last_success_age = fetch_stats.last_success_age
+        if last_success_age is not None:
+            families.append(Metric_Family('metarmap_fetch_last_success_age_seconds', 'gauge', 'Seconds since the last successful retrieval').add(last_success_age, labels))
+        return families
+
+class Metrics_Server:
+    """Optional HTTP endpoint serving a Metrics_Registry at /metrics in Prometheus text format"""
+
+    def __init__(self, registry: Metrics_Registry, host: str = '127.0.0.1', port: int = 9108):
+        """
+        :param registry: The registry to serve
+        :param host: Interface to listen on, defaults to localhost only
+        :param port: TCP port, 0 picks a free port (see the address property)
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Thread | None = None
+
+    def __enter__(self) -> Metrics_Server:
+        self.start()
+        return self
+
+    def __exit__(self, exception_type: typing.Optional[typing.Type[BaseException]],
+                 exception_value: typing.Optional[BaseException],
+                 traceback: typing.Optional[TracebackType],
+    ) -> None:
+        self.close()
+        return
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """The (host, port) the server is bound to"""
+        return self._server.server_address[:2]
+
+    def start(self) -> None:
+        """Serve in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = Thread(target=self._server.serve_forever, name=f'{self.__class__.__name__}', daemon=True)
+        self._thread.start()
+        self._logger.info(f'Metrics available at http://{self.address[0]}:{self.address[1]}/metrics')
+
+    def close(self) -> None:
+        """Stop serving"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def _make_handler(self) -> typing.Type[BaseHTTPRequestHandler]:
+        """Build the request handler class bound to this server"""
+        metrics_server = self
+
+        class Metrics_Request_Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                try:
+                    body = metrics_server.registry.render().encode('utf-8')
+                except Exception:
+                    metrics_server._logger.exception(f'Failed to collect metrics')
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: typing.Any) -> None:
+                metrics_server._logger.debug(f'{self.address_string()} {format % args}')
+
+        return Metrics_Request_Handler
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import logging
+import typing
+from types import TracebackType
+from threading import Event
+from time import perf_counter
+
+from METAR import METAR
+from metarmap.METAR_SOURCE import METAR_SOURCE
+
+if typing.TYPE_CHECKING:
+    from metarmap.MainLoop import MainLoop
+
+def station_union(station_maps: typing.Iterable[typing.Iterable[str]]) -> list[str]:
+    """Distinct station IDs across several station_maps, in first-seen order"""
+    stations: dict[str, None] = {}
+    for station_map in station_maps:
+        for station_id in station_map:
+            stations[station_id] = None
+    return list(stations)
+
+class Shared_METAR_Source:
+    """
+    Fans a single upstream METAR_SOURCE out to several maps
+
+    The upstream source should track the union of the stations of every map (see station_union), so upstream
+    requests scale with the distinct stations rather than with the number of maps. Each map gets its own
+    view, which implements METAR_SOURCE with an independent new_metar_data flag
+
+    Views are meant to be polled from a single render thread (see Frame_Scheduler)
+    """
+
+    def __init__(self, source: METAR_SOURCE):
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.source = source
+        self._snapshot: dict[str, METAR | None] | None = None
+        self._generation: int = 0       # Incremented for every snapshot taken from the upstream source
+
+    @property
+    def generation(self) -> int:
+        """Snapshot generation, polls the upstream source for new data first"""
+        self._poll()
+        return self._generation
+
+    @property
+    def snapshot(self) -> dict[str, METAR | None] | None:
+        """The latest snapshot taken from the upstream source"""
+        return self._snapshot
+
+    @property
+    def data_is_stale(self) -> bool:
+        return self.source.data_is_stale
+
+    @property
+    def is_running(self) -> bool:
+        return self.source.is_running
+
+    def _poll(self) -> None:
+        """Take a new snapshot if the upstream source signals new data"""
+        if self.source.new_metar_data:
+            self._snapshot = self.source.live_metar_data
+            self._generation += 1
+            self.source.new_metar_data = False
+            self._logger.debug(f'New upstream snapshot, generation {self._generation}')
+
+    def view(self, stations: typing.Iterable[str]) -> Shared_METAR_Source_View:
+        """Create the METAR_SOURCE for one map, covering the stations provided (e.g. its station_map)"""
+        return Shared_METAR_Source_View(self, stations)
+
+class Shared_METAR_Source_View(METAR_SOURCE):
+    """One map's METAR_SOURCE onto a Shared_METAR_Source"""
+
+    def __init__(self, shared: Shared_METAR_Source, stations: typing.Iterable[str]):
+        self.shared = shared
+        self.stations: list[str] = list(stations)
+        self._seen_generation: int = 0
+        self._view_generation: int = -1
+        self._view: dict[str, METAR | None] | None = None
+
+    @property
+    def new_metar_data(self) -> bool:
+        return self.shared.generation != self._seen_generation
+
+    @new_metar_data.setter
+    def new_metar_data(self, state: bool) -> None:
+        # Clearing the flag marks the current shared snapshot as consumed by this map
+        if state:
+            self._seen_generation = -1
+        else:
+            self._seen_generation = self.shared.generation
+
+    @property
+    def live_metar_data(self) -> dict[str, METAR | None] | None:
+        """
+        This map's stations from the current shared snapshot
+
+        Each map gets its own dict, so a map clearing stale entries does not touch the other maps
+        """
+        generation = self.shared.generation
+        if generation != self._view_generation:
+            snapshot = self.shared.snapshot
+            if snapshot is None:
+                self._view = None
+            else:
+                self._view = {station_id: snapshot.get(station_id) for station_id in self.stations}
+            self._view_generation = generation
+        return self._view
+
+    @property
+    def data_is_stale(self) -> bool:
+        return self.shared.data_is_stale
+
+    @property
+    def is_running(self) -> bool:
+        return self.shared.is_running
+
+class Frame_Scheduler:
+    """
+    Renders several MainLoops (each with its own LED_DRIVER) on one shared frame clock
+
+    Every frame calls loop() on each map in order, then sleeps off what remains of the frame period
+    """
+
+    def __init__(self, main_loops: typing.Iterable[MainLoop], frame_rate: float | None = 60.0):
+        """
+        :param main_loops: The maps to render
+        :param frame_rate: Target frames per second, None runs as fast as possible
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.main_loops: list[MainLoop] = list(main_loops)
+        self.frame_rate = frame_rate
+        self.frame_count: int = 0
+        self.overrun_count: int = 0     # Frames that took longer than the frame period
+
+    def __enter__(self) -> Frame_Scheduler:
+        return self
+
+    def __exit__(self, exception_type: typing.Optional[typing.Type[BaseException]],
+                 exception_value: typing.Optional[BaseException],
+                 traceback: typing.Optional[TracebackType],
+    ) -> None:
+        self.close()
+        return
+
+    def step(self) -> None:
+        """Render one frame of every map"""
+        for main_loop in self.main_loops:
+            main_loop.loop()
+        self.frame_count += 1
+
+    def run(self, stop_request: Event | None = None, frames: int | None = None) -> None:
+        """
+        Render frames until stop_request is set, or until the number of frames provided has been rendered
+
+        :param stop_request: Optional Event to stop the scheduler from another thread
+        :param frames: Optional number of frames to render before returning
+        """
+        if stop_request is None:
+            stop_request = Event()
+        frame_period = 1.0/self.frame_rate if self.frame_rate else 0.0
+        rendered = 0
+        next_frame = perf_counter()
+        while not stop_request.is_set():
+            if frames is not None and rendered >= frames:
+                break
+            self.step()
+            rendered += 1
+            if frame_period:
+                next_frame += frame_period
+                remaining = next_frame - perf_counter()
+                if remaining > 0:
+                    # Event.wait doubles as an interruptible sleep
+                    stop_request.wait(remaining)
+                else:
+                    # Overran the frame, resynchronize instead of trying to catch up
+                    self.overrun_count += 1
+                    next_frame = perf_counter()
+
+    def close(self) -> None:
+        """Close every map"""
+        for main_loop in self.main_loops:
+            main_loop.close()
@@ -0,0 +1,252 @@
+from __future__ import annotations
+import logging
+import typing
+from types import TracebackType
+from threading import Thread, Condition
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from metarmap.Framebuffer import frame_delta
+
+if typing.TYPE_CHECKING:
+    from metarmap.MainLoop import MainLoop
+
+_PREVIEW_PAGE = '''<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>METARMAP Preview</title>
+<style>
+body { background: #111; color: #ccc; font-family: monospace; }
+#pixels { display: flex; flex-wrap: wrap; max-width: 52em; }
+#pixels div { width: 1.6em; height: 1.6em; margin: 0.2em; border-radius: 50%; background: #000; }
+</style>
+</head>
+<body>
+<div id="status">connecting...</div>
+<div id="pixels"></div>
+<script>
+const pixels = document.getElementById('pixels');
+const status = document.getElementById('status');
+let cells = [];
+function resize(count) {
+  pixels.innerHTML = '';
+  cells = [];
+  for (let i = 0; i < count; i++) {
+    const cell = document.createElement('div');
+    cell.title = i;
+    pixels.appendChild(cell);
+    cells.push(cell);
+  }
+}
+const source = new EventSource('/events');
+source.addEventListener('keyframe', (event) => {
+  const [frame, hex] = event.data.split(' ');
+  if (cells.length !== hex.length / 6) { resize(hex.length / 6); }
+  for (let i = 0; i < cells.length; i++) { cells[i].style.background = '#' + hex.substr(i * 6, 6); }
+  status.textContent = 'frame ' + frame;
+});
+source.addEventListener('delta', (event) => {
+  const [frame, changes] = event.data.split(' ');
+  for (const change of changes.split(',')) {
+    const [index, color] = change.split(':');
+    cells[Number(index)].style.background = '#' + color;
+  }
+  status.textContent = 'frame ' + frame;
+});
+source.onerror = () => { status.textContent = 'disconnected, retrying...'; };
+</script>
+</body>
+</html>
+'''
+
+def encode_keyframe(frame_id: int, frame: bytes) -> bytes:
+    """
+    Encode a full frame as a Server-Sent Event
+
+    data is '<frame_id> <rrggbb for every pixel>'
+    """
+    return f'event: keyframe\ndata: {frame_id} {frame.hex()}\n\n'.encode('ascii')
+
+def encode_delta(frame_id: int, changes: list[tuple[int, bytes]]) -> bytes:
+    """
+    Encode the changed pixels of a frame as a Server-Sent Event
+
+    data is '<frame_id> <index>:<rrggbb>,<index>:<rrggbb>,...'
+    """
+    body = ','.join(f'{index}:{rgb.hex()}' for index, rgb in changes)
+    return f'event: delta\ndata: {frame_id} {body}\n\n'.encode('ascii')
+
+class Preview_Server:
+    """
+    Optional HTTP server that mirrors the committed framebuffer of a MainLoop to web browsers
+
+    Browsers receive a keyframe on connect, then per-frame deltas (pixel index + color) over Server-Sent Events.
+    The render loop only swaps in a copy of the latest frame and wakes the client threads. Each client keeps
+    a single copy of the last frame it sent and always diffs against the newest frame, so a slow client skips
+    intermediate frames (coalescing) instead of queuing them, bounding its memory to one frame
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080,
+                 max_clients: int = 8,
+                 keepalive_interval: float = 15.0,
+                 client_timeout: float = 10.0):
+        """
+        :param host: Interface to listen on, defaults to localhost only
+        :param port: TCP port, 0 picks a free port (see the address property)
+        :param max_clients: Maximum number of simultaneous event streams, further clients get a 503
+        :param keepalive_interval: Seconds between keepalive comments when no frames change
+        :param client_timeout: Seconds a blocked socket write may take before the client is dropped
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.max_clients = max_clients
+        self.keepalive_interval = keepalive_interval
+        self.client_timeout = client_timeout
+
+        # Latest published frame, guarded by the condition's lock
+        self._frame_condition = Condition()
+        self._frame_id: int = 0
+        self._frame: bytes = b''
+        self._client_count: int = 0
+        self._closing = False
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Thread | None = None
+        self._main_loop: MainLoop | None = None
+
+    def __enter__(self) -> Preview_Server:
+        self.start()
+        return self
+
+    def __exit__(self, exception_type: typing.Optional[typing.Type[BaseException]],
+                 exception_value: typing.Optional[BaseException],
+                 traceback: typing.Optional[TracebackType],
+    ) -> None:
+        self.close()
+        return
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """The (host, port) the server is bound to"""
+        return self._server.server_address[:2]
+
+    @property
+    def client_count(self) -> int:
+        """Number of connected event streams"""
+        with self._frame_condition:
+            return self._client_count
+
+    def attach(self, main_loop: MainLoop) -> None:
+        """Mirror the committed frames of the MainLoop, starting from its current framebuffer"""
+        self._main_loop = main_loop
+        self.publish(main_loop.frame_id, main_loop.framebuffer)
+        main_loop.add_frame_listener(self.publish)
+
+    def publish(self, frame_id: int, framebuffer: bytes | bytearray) -> None:
+        """Make a frame available to the clients, safe to call from the render loop"""
+        frame = bytes(framebuffer)
+        with self._frame_condition:
+            self._frame_id = frame_id
+            self._frame = frame
+            self._frame_condition.notify_all()
+
+    def start(self) -> None:
+        """Serve in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = Thread(target=self._server.serve_forever, name=f'{self.__class__.__name__}', daemon=True)
+        self._thread.start()
+        self._logger.info(f'Preview server listening on http://{self.address[0]}:{self.address[1]}/')
+
+    def close(self) -> None:
+        """Stop serving and disconnect the clients"""
+        if self._main_loop is not None:
+            self._main_loop.remove_frame_listener(self.publish)
+            self._main_loop = None
+        with self._frame_condition:
+            self._closing = True
+            self._frame_condition.notify_all()
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def _latest_frame(self, frame_id: int, timeout: float) -> tuple[int, bytes] | None:
+        """Wait until a frame newer than frame_id is published, None on timeout or close"""
+        with self._frame_condition:
+            if self._frame_id == frame_id and not self._closing:
+                self._frame_condition.wait(timeout)
+            if self._closing or self._frame_id == frame_id:
+                return None
+            return self._frame_id, self._frame
+
+    def _stream_events(self, handler: BaseHTTPRequestHandler) -> None:
+        """Send a keyframe, then deltas against the last frame this client received"""
+        with self._frame_condition:
+            if self._client_count >= self.max_clients:
+                handler.send_error(503, 'Too many preview clients')
+                return
+            self._client_count += 1
+            sent_id, sent_frame = self._frame_id, self._frame
+        try:
+            handler.connection.settimeout(self.client_timeout)
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'text/event-stream')
+            handler.send_header('Cache-Control', 'no-cache')
+            handler.end_headers()
+            handler.wfile.write(encode_keyframe(sent_id, sent_frame))
+            handler.wfile.flush()
+
+            while True:
+                latest = self._latest_frame(sent_id, self.keepalive_interval)
+                if latest is None:
+                    if self._closing:
+                        return
+                    handler.wfile.write(b': keepalive\n\n')
+                    handler.wfile.flush()
+                    continue
+
+                frame_id, frame = latest
+                if len(frame) != len(sent_frame):
+                    message = encode_keyframe(frame_id, frame)
+                else:
+                    changes = frame_delta(sent_frame, frame)
+                    # A delta naming most of the pixels is larger than the keyframe itself
+                    if len(changes)*2 > len(frame)//3:
+                        message = encode_keyframe(frame_id, frame)
+                    elif changes:
+                        message = encode_delta(frame_id, changes)
+                    else:
+                        message = b''
+                if message:
+                    handler.wfile.write(message)
+                    handler.wfile.flush()
+                sent_id, sent_frame = frame_id, frame
+        except OSError:
+            # Client went away or stalled past client_timeout
+            self._logger.debug(f'Preview client disconnected: {handler.client_address}')
+        finally:
+            with self._frame_condition:
+                self._client_count -= 1
+
+    def _make_handler(self) -> typing.Type[BaseHTTPRequestHandler]:
+        """Build the request handler class bound to this server"""
+        preview_server = self
+
+        class Preview_Request_Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path == '/events':
+                    preview_server._stream_events(self)
+                elif self.path in ('/', '/index.html'):
+                    body = _PREVIEW_PAGE.encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format: str, *args: typing.Any) -> None:
+                preview_server._logger.debug(f'{self.address_string()} {format % args}')
+
+        return Preview_Request_Handler
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import logging
+import signal
+import sys
+import threading
+import typing
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+@dataclass
+class Profiler_Config:
+    """Configure the signal triggered sampling profiler of MainLoop"""
+    enabled: bool = False
+    signal_name: str = 'SIGUSR1'            # Signal that starts a profile
+    duration: float = 30.0                  # Seconds sampled per signal
+    interval: float = 0.01                  # Seconds between samples, 100 Hz
+    output_directory: Path | str = 'profiles'      # Usually the active log directory of a Boot_Cycle_Log_Manager
+    max_depth: int = 64                     # Frames kept per stack, from the innermost
+
+@dataclass
+class Profile_Result:
+    """Where a profile was written and what it saw"""
+    samples: int
+    duration: float
+    collapsed_path: Path
+    summary_path: Path
+
+def _frame_label(code: typing.Any) -> str:
+    """Function label of a collapsed stack, file and function, with no ';' (the frame separator)"""
+    return f'{Path(code.co_filename).name}:{code.co_name}'.replace(';', ':')
+
+class Stack_Sampler:
+    """
+    Statistical profiler of every thread, sampling the Python stacks from a background thread
+
+    Each sample reads sys._current_frames() and counts each distinct stack, keyed by its code objects so a sample
+    costs a dict update per thread. Labels are only built when the profile is written
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        """
+        :param interval: Seconds between samples
+        :param max_depth: Frames kept per stack, deeper stacks are cut at the outermost frames
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: int = 0
+        self.counts: dict[tuple[str, tuple], int] = {}      # (thread name, code objects root first): samples
+        self._stop = threading.Event()
+
+    def sample(self, exclude: set[int] = frozenset()) -> None:
+        """Take one sample of every thread but the excluded idents"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts = self.counts
+        max_depth = self.max_depth
+        for ident, frame in sys._current_frames().items():
+            if ident in exclude:
+                continue
+            stack = []
+            while frame is not None and len(stack) < max_depth:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            key = (names.get(ident, f'thread-{ident}'), tuple(stack))
+            counts[key] = counts.get(key, 0) + 1
+        self.samples += 1
+
+    def run(self, duration: float) -> None:
+        """Sample from the calling thread for duration seconds, or until stop()"""
+        exclude = {threading.get_ident()}
+        deadline = perf_counter() + duration
+        self._stop.clear()
+        while perf_counter() < deadline and not self._stop.is_set():
+            self.sample(exclude)
+            self._stop.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def collapsed(self) -> list[str]:
+        """Stacks in the collapsed format of flamegraph.pl and speedscope, 'thread;outer;...;inner count'"""
+        merged: dict[str, int] = {}
+        for (thread_name, stack), count in self.counts.items():
+            line = ';'.join([thread_name.replace(';', ':')] + [_frame_label(code) for code in stack])
+            merged[line] = merged.get(line, 0) + count
+        return [f'{line} {count}' for line, count in sorted(merged.items())]
+
+    def function_summary(self) -> list[tuple[str, int, int]]:
+        """(function, self samples, total samples) of every sampled function, by total then self samples"""
+        self_counts: dict[str, int] = {}
+        total_counts: dict[str, int] = {}
+        for (_, stack), count in self.counts.items():
+            if not stack:
+                continue
+            labels = [_frame_label(code) for code in stack]
+            self_counts[labels[-1]] = self_counts.get(labels[-1], 0) + count
+            for label in set(labels):        # Recursion counts once per sample
+                total_counts[label] = total_counts.get(label, 0) + count
+        return sorted(((label, self_counts.get(label, 0), total) for label, total in total_counts.items()),
+                      key=lambda row: (-row[2], -row[1], row[0]))
+
+    def thread_summary(self) -> dict[str, int]:
+        """Samples per thread name"""
+        threads: dict[str, int] = {}
+        for (thread_name, _), count in self.counts.items():
+            threads[thread_name] = threads.get(thread_name, 0) + count
+        return threads
+
+class Sampling_Profiler:
+    """
+    Profiles the running process on a signal, so a deployed map can be profiled without stopping the service
+
+    Idle until the signal arrives: nothing is sampled and no thread runs. On the signal a daemon thread samples
+    every thread for the configured duration, then writes a collapsed stack file (for a flamegraph) and a
+    per-function summary to the output directory. Signals during a profile are ignored
+    """
+
+    def __init__(self, config: Profiler_Config):
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.config = config
+        self._thread: threading.Thread | None = None
+        self._sampler: Stack_Sampler | None = None
+        self._signal: int | None = None
+        self._previous_handler: typing.Any = None
+        self.last_result: Profile_Result | None = None
+
+    @property
+    def is_profiling(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def install(self) -> bool:
+        """
+        Install the signal handler, only possible from the main thread of a platform with the signal
+
+        :return: Whether it was installed
+        """
+        signum = getattr(signal, self.config.signal_name, None)
+        if signum is None:
+            self._logger.warning(f'{self.config.signal_name} is not available on this platform, profiling disabled')
+            return False
+        try:
+            self._previous_handler = signal.signal(signum, self._on_signal)
+        except ValueError:
+            self._logger.warning(f'{self.config.signal_name} handler can only be installed from the main thread, profiling disabled')
+            return False
+        self._signal = signum
+        self._logger.info(f'Send {self.config.signal_name} to process to profile it for {self.config.duration} s')
+        return True
+
+    def uninstall(self) -> None:
+        """Restore the previous signal handler and stop a running profile"""
+        if self._signal is not None:
+            signal.signal(self._signal, self._previous_handler)
+            self._signal = None
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    def _on_signal(self, signum: int, frame: typing.Any) -> None:
+        self.start()
+
+    def start(self, duration: float | None = None) -> bool:
+        """
+        Start a profile in the background
+
+        :param duration: Seconds to sample, defaults to the configured duration
+        :return: False if a profile is already running
+        """
+        if self.is_profiling:
+            return False
+        self._sampler = Stack_Sampler(self.config.interval, self.config.max_depth)
+        self._thread = threading.Thread(target=self._profile, args=(self._sampler, duration or self.config.duration),
+                                        name=f'{self.__class__.__name__}', daemon=True)
+        self._thread.start()
+        return True
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait for a running profile to be written, returns False on timeout"""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _profile(self, sampler: Stack_Sampler, duration: float) -> None:
+        self._logger.info(f'Profiling all threads for {duration} s')
+        start = perf_counter()
+        try:
+            sampler.run(duration)
+            self.last_result = self.write(sampler, perf_counter() - start)
+        except Exception:
+            self._logger.exception('Profile failed')
+
+    def write(self, sampler: Stack_Sampler, duration: float) -> Profile_Result:
+        """Write the collapsed stacks and the summary of a sampler to the output directory"""
+        output_directory = Path(self.config.output_directory)
+        output_directory.mkdir(parents=True, exist_ok=True)
+        stem = f'profile_{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}'
+        collapsed_path = output_directory / f'{stem}.collapsed'
+        summary_path = output_directory / f'{stem}.txt'
+        collapsed_path.write_text('\n'.join(sampler.collapsed()) + '\n')
+
+        samples = max(sampler.samples, 1)
+        functions = sampler.function_summary()
+        lines = [f'{sampler.samples} samples over {duration:.1f} s, every {self.config.interval*1e3:.1f} ms',
+                 '', 'Samples per thread:']
+        for thread_name, count in sorted(sampler.thread_summary().items(), key=lambda item: -item[1]):
+            lines.append(f'  {count:8d}  {thread_name}')
+        lines += ['', f'{"total %":>8} {"self %":>8}  function']
+        for label, self_count, total_count in functions:
+            lines.append(f'{100*total_count/samples:8.1f} {100*self_count/samples:8.1f}  {label}')
+        summary_path.write_text('\n'.join(lines) + '\n')
+
+        # The busiest functions also go to the log, for when only the log comes back from the field
+        busiest = sorted(functions, key=lambda row: -row[1])[:10]
+        self._logger.info(f'Profile written to {collapsed_path} and {summary_path}, busiest functions: '
+                          + ', '.join(f'{label} {100*self_count/samples:.1f}%' for label, self_count, _ in busiest))
+        return Profile_Result(sampler.samples, duration, collapsed_path, summary_path)
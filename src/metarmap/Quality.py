@@ -0,0 +1,93 @@
+from __future__ import annotations
+import logging
+from dataclasses import dataclass
+
+# Quality levels, each keeps the savings of the levels before it
+QUALITY_LEVELS: tuple[str, ...] = (
+    'full',                     # Every station recomputed every frame
+    'skip_static',              # Stations without blinks or animations only recomputed on new METAR data or dimming changes
+    'reduced_bursts',           # Lightning bursts flash at half the resolution
+    'half_rate_animations',     # Blinking and animated stations recomputed every other frame, staggered
+)
+
+@dataclass
+class Quality_Config:
+    """Configure the adaptive quality of MainLoop"""
+    enabled: bool = False
+    frame_budget: float = 1/30          # Seconds, target frame time
+    window: int = 90                    # Frames per evaluation
+    overrun_tolerance: float = 0.1      # Fraction of a window's frames over budget before degrading
+    restore_ratio: float = 0.5          # A window's mean frame time must be under this fraction of the budget to restore
+    restore_windows: int = 3            # Consecutive windows with headroom before restoring a level
+    max_level: int = len(QUALITY_LEVELS) - 1
+
+class Quality_Controller:
+    """
+    Tracks frame time against a budget and steps the quality level down when frames overrun it, and back up once
+    there is headroom again
+
+    record() is called with every frame time and costs a few additions, the decision is made once per window.
+    Degrading takes a single window over tolerance, restoring takes restore_windows in a row with no overrun
+    and a mean under restore_ratio of the budget, so the level does not flap around the budget
+    """
+
+    def __init__(self, config: Quality_Config):
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.config = config
+        if not 0 <= config.max_level < len(QUALITY_LEVELS):
+            raise ValueError(f'max_level must be between 0 and {len(QUALITY_LEVELS) - 1}: {config.max_level}')
+        if config.window < 1:
+            raise ValueError(f'window must be greater than or equal to 1: {config.window}')
+        self._budget_ns: int = int(config.frame_budget*1e9)
+        self.level: int = 0
+        self.changes: int = 0
+
+        self._window_frames: int = 0
+        self._window_total_ns: int = 0
+        self._window_overruns: int = 0
+        self._headroom_windows: int = 0
+
+    @property
+    def level_name(self) -> str:
+        return QUALITY_LEVELS[self.level]
+
+    def record(self, frame_ns: int) -> bool:
+        """
+        Record one frame time
+
+        :return: True if the quality level changed
+        """
+        self._window_total_ns += frame_ns
+        if frame_ns > self._budget_ns:
+            self._window_overruns += 1
+        self._window_frames += 1
+        if self._window_frames < self.config.window:
+            return False
+        return self._evaluate_window()
+
+    def _evaluate_window(self) -> bool:
+        frames = self._window_frames
+        mean_ns = self._window_total_ns/frames
+        overruns = self._window_overruns
+        self._window_frames = self._window_total_ns = self._window_overruns = 0
+
+        previous_level = self.level
+        if overruns > frames*self.config.overrun_tolerance:
+            self._headroom_windows = 0
+            if self.level < self.config.max_level:
+                self.level += 1
+        elif overruns == 0 and mean_ns < self._budget_ns*self.config.restore_ratio:
+            self._headroom_windows += 1
+            if self._headroom_windows >= self.config.restore_windows and self.level > 0:
+                self._headroom_windows = 0
+                self.level -= 1
+        else:
+            self._headroom_windows = 0
+
+        if self.level == previous_level:
+            return False
+        self.changes += 1
+        log = self._logger.warning if self.level > previous_level else self._logger.info
+        log(f'Quality {QUALITY_LEVELS[previous_level]} -> {self.level_name}: mean frame {mean_ns/1e6:.1f} ms, '
+            f'{overruns}/{frames} frames over the {self._budget_ns/1e6:.1f} ms budget')
+        return True
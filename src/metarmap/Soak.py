@@ -0,0 +1,300 @@
+from __future__ import annotations
+import argparse
+import gc
+import logging
+import os
+import tracemalloc
+import typing
+from dataclasses import dataclass, field, asdict
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+
+from METAR.clock import Virtual_Clock
+
+if typing.TYPE_CHECKING:
+    from metarmap.MainLoop import MainLoop
+
+# Allocation sites are grouped by the part of the system that owns them, the first match wins
+SITE_CATEGORIES: tuple[tuple[str, str], ...] = (
+    ('METAR', f'{os.sep}METAR{os.sep}'),
+    ('RGB_color', f'{os.sep}metarmap{os.sep}RGB_color.py'),
+    ('logging', f'{os.sep}metarmap{os.sep}Logging.py'),
+    ('logging', f'{os.sep}logging{os.sep}'),
+    ('metarmap', f'{os.sep}metarmap{os.sep}'),
+    ('LED_Control', f'{os.sep}LED_Control{os.sep}'),
+)
+
+def site_category(filename: str) -> str:
+    """The part of the system an allocation site belongs to, 'other' for the standard library and the rest"""
+    for category, fragment in SITE_CATEGORIES:
+        if fragment in filename:
+            return category
+    return 'other'
+
+def read_rss_bytes() -> int | None:
+    """Resident set size of this process, None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def growth_per_day(times_s: typing.Sequence[float], values: typing.Sequence[float]) -> float:
+    """Least squares slope of values over times, per day"""
+    n = len(times_s)
+    if n < 2:
+        return 0.0
+    mean_t = sum(times_s)/n
+    mean_v = sum(values)/n
+    variance = sum((t - mean_t)**2 for t in times_s)
+    if variance == 0:
+        return 0.0
+    slope = sum((t - mean_t)*(v - mean_v) for t, v in zip(times_s, values))/variance
+    return slope*86400
+
+def is_sustained_growth(times_s: typing.Sequence[float], values: typing.Sequence[float], max_growth_per_day: float) -> bool:
+    """
+    Growth is sustained when the trend exceeds max_growth_per_day and the last quarter of the samples sits
+    entirely above the first quarter, a one-off step (a cache filling, a log file rotating) does not count
+    """
+    if len(values) < 4:
+        return False
+    quarter = len(values)//4
+    return (growth_per_day(times_s, values) > max_growth_per_day
+            and min(values[-quarter:]) > max(values[:quarter]))
+
+@dataclass
+class Memory_Sample:
+    """Memory use at one point of a soak"""
+    virtual_s: float                # Virtual seconds since the start of the soak
+    frames: int
+    traced_bytes: int               # Live memory allocated by Python, from tracemalloc
+    rss_bytes: int | None
+    frame_transient_bytes: int      # Memory allocated and released within the frame before the sample
+
+@dataclass
+class Allocation_Site:
+    """Growth of the memory allocated at one line between the end of the warmup and the end of the soak"""
+    category: str
+    location: str
+    size_diff: int
+    count_diff: int
+    size: int
+
+@dataclass
+class Soak_Result:
+    frames: int
+    virtual_duration_s: float
+    real_duration_s: float
+    samples: list[Memory_Sample]
+    traced_growth_per_day: float
+    rss_growth_per_day: float | None
+    traced_growth_sustained: bool
+    rss_growth_sustained: bool
+    top_sites: list[Allocation_Site] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        """No sustained growth of the traced memory or the RSS"""
+        return not (self.traced_growth_sustained or self.rss_growth_sustained)
+
+    def growth_by_category(self) -> dict[str, int]:
+        """Memory growth of the top sites summed per category"""
+        totals: dict[str, int] = {}
+        for site in self.top_sites:
+            totals[site.category] = totals.get(site.category, 0) + site.size_diff
+        return totals
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        result = asdict(self)
+        result['passed'] = self.passed
+        return result
+
+    def summary(self) -> str:
+        days = self.virtual_duration_s/86400
+        lines = [
+            f'Soak {"PASSED" if self.passed else "FAILED"}: {days:.1f} virtual days, {self.frames} frames '
+            f'in {self.real_duration_s:.1f} s',
+            f'  traced memory {self.samples[-1].traced_bytes/1024:.1f} KiB, '
+            f'growth {self.traced_growth_per_day/1024:+.2f} KiB/day{" (sustained)" if self.traced_growth_sustained else ""}',
+        ]
+        if self.rss_growth_per_day is not None:
+            lines.append(f'  RSS {self.samples[-1].rss_bytes/2**20:.1f} MiB, growth {self.rss_growth_per_day/1024:+.2f} KiB/day'
+                         f'{" (sustained)" if self.rss_growth_sustained else ""}')
+        transient = max(sample.frame_transient_bytes for sample in self.samples)
+        lines.append(f'  per-frame transient allocations up to {transient/1024:.1f} KiB')
+        lines.append('  top allocation sites since warmup:')
+        for site in self.top_sites:
+            lines.append(f'    {site.size_diff/1024:+9.1f} KiB {site.count_diff:+8d} blocks  {site.category:<12} {site.location}')
+        return '\n'.join(lines)
+
+class Soak_Harness:
+    """
+    Runs a MainLoop for weeks of virtual time, sampling memory, to find leaks before a map running unattended does
+
+    The METAR_SOURCE and the MainLoop must run on the harness clock (MainLoop(config, clock=clock), sources with
+    clock=clock). Frames are rendered every frame_interval of virtual time, coarser than a real map so a
+    soak finishes in minutes. Memory is sampled every sample_interval after a warmup, and the soak fails if the
+    traced memory or the RSS grows steadily
+    """
+
+    def __init__(self, main_loop: MainLoop, clock: Virtual_Clock,
+                 duration: timedelta = timedelta(days = 14),
+                 frame_interval: timedelta = timedelta(seconds = 30),
+                 sample_interval: timedelta = timedelta(hours = 6),
+                 warmup: timedelta = timedelta(days = 1),
+                 max_traced_growth_per_day: int = 64*1024,
+                 max_rss_growth_per_day: int = 1024*1024,
+                 top_site_count: int = 15,
+                 traceback_frames: int = 1):
+        """
+        :param main_loop: The map to soak
+        :param clock: Virtual clock of the map and its METAR_SOURCE, advanced by the harness
+        :param duration: Virtual time to run for, including the warmup
+        :param frame_interval: Virtual time between frames
+        :param sample_interval: Virtual time between memory samples
+        :param warmup: Virtual time before the baseline, for caches, histograms and logs to reach their steady size
+        :param max_traced_growth_per_day: Bytes per virtual day of traced memory growth tolerated
+        :param max_rss_growth_per_day: Bytes per virtual day of RSS growth tolerated
+        :param top_site_count: Number of allocation sites reported
+        :param traceback_frames: Stack frames kept per allocation by tracemalloc, more is slower
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        if warmup >= duration:
+            raise ValueError(f'The warmup ({warmup}) must be shorter than the duration ({duration})')
+        self.main_loop = main_loop
+        self.clock = clock
+        self.duration = duration
+        self.frame_interval = frame_interval
+        self.sample_interval = sample_interval
+        self.warmup = warmup
+        self.max_traced_growth_per_day = max_traced_growth_per_day
+        self.max_rss_growth_per_day = max_rss_growth_per_day
+        self.top_site_count = top_site_count
+        self.traceback_frames = traceback_frames
+
+    def _sample(self, virtual_s: float, frames: int) -> Memory_Sample:
+        """Render one frame measuring its transient allocations, then sample the live memory"""
+        gc.collect()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        self.main_loop.loop()
+        after, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        return Memory_Sample(virtual_s, frames + 1, traced, read_rss_bytes(), peak - max(before, after))
+
+    def _top_sites(self, baseline: tracemalloc.Snapshot, final: tracemalloc.Snapshot) -> list[Allocation_Site]:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+                   tracemalloc.Filter(False, '<frozen *>'), tracemalloc.Filter(False, '<unknown>')]
+        stats = final.filter_traces(filters).compare_to(baseline.filter_traces(filters), 'lineno')
+        sites = []
+        for stat in stats[:self.top_site_count]:
+            frame = stat.traceback[0]
+            sites.append(Allocation_Site(site_category(frame.filename), f'{frame.filename}:{frame.lineno}',
+                                         stat.size_diff, stat.count_diff, stat.size))
+        return sites
+
+    def run(self) -> Soak_Result:
+        """Run the soak, returns the result whether it passed or not"""
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.traceback_frames)
+        real_start = perf_counter()
+        frame_s = self.frame_interval.total_seconds()
+        total_frames = int(self.duration.total_seconds()//frame_s)
+        warmup_frames = int(self.warmup.total_seconds()//frame_s)
+        frames_per_sample = max(1, int(self.sample_interval.total_seconds()//frame_s))
+
+        samples: list[Memory_Sample] = []
+        baseline: tracemalloc.Snapshot | None = None
+        try:
+            loop = self.main_loop.loop
+            advance = self.clock.advance
+            for frame in range(total_frames):
+                advance(frame_s)
+                if frame >= warmup_frames and (frame - warmup_frames) % frames_per_sample == 0:
+                    if baseline is None:
+                        gc.collect()
+                        baseline = tracemalloc.take_snapshot()
+                    samples.append(self._sample((frame + 1)*frame_s, frame))
+                    self._logger.debug(f'Soak sample {samples[-1]}')
+                else:
+                    loop()
+            samples.append(self._sample(total_frames*frame_s, total_frames))
+            gc.collect()
+            final = tracemalloc.take_snapshot()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        times = [sample.virtual_s for sample in samples]
+        traced = [sample.traced_bytes for sample in samples]
+        rss = [sample.rss_bytes for sample in samples]
+        rss_available = all(value is not None for value in rss)
+        result = Soak_Result(
+            frames = total_frames + 1,
+            virtual_duration_s = total_frames*frame_s,
+            real_duration_s = perf_counter() - real_start,
+            samples = samples,
+            traced_growth_per_day = growth_per_day(times, traced),
+            rss_growth_per_day = growth_per_day(times, rss) if rss_available else None,
+            traced_growth_sustained = is_sustained_growth(times, traced, self.max_traced_growth_per_day),
+            rss_growth_sustained = rss_available and is_sustained_growth(times, rss, self.max_rss_growth_per_day),
+            top_sites = self._top_sites(baseline, final),
+        )
+        self._logger.info(result.summary())
+        return result
+
+def main(argv: list[str] | None = None) -> int:
+    """Soak a synthetic or replayed map from the command line, exits 1 on sustained memory growth"""
+    import json
+    from datetime import datetime, timezone
+    from metarmap.MainLoop import MainLoop
+    from metarmap.METAR_Map_Config import (METAR_MAP_Config, Day_Night_Dimming_Config, Wind_Animation_Config,
+                                           Lightning_Animation_Config)
+    from metarmap.METAR_SOURCE import Synthetic_METAR_Source, Replay_METAR_Source
+    from metarmap.Logging import Boot_Cycle_Log_Manager
+    from METAR.synthetic import Synthetic_METAR_Population
+
+    parser = argparse.ArgumentParser(description='Run a METAR map for weeks of virtual time and check its memory')
+    parser.add_argument('--stations', type=int, default=100, help='Synthetic stations')
+    parser.add_argument('--recording', type=Path, help='Replay this recording instead of synthetic weather')
+    parser.add_argument('--days', type=float, default=14.0, help='Virtual days to run')
+    parser.add_argument('--frame-interval', type=float, default=30.0, help='Virtual seconds between frames')
+    parser.add_argument('--log-root', type=Path, help='Log through a Boot_Cycle_Log_Manager in this directory')
+    parser.add_argument('--json', type=Path, help='Write the result as JSON')
+    args = parser.parse_args(argv)
+
+    if args.log_root is not None:
+        Boot_Cycle_Log_Manager(args.log_root, 'soak', log_level=logging.INFO).run()
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    clock = Virtual_Clock(datetime(2024, 6, 1, tzinfo=timezone.utc))
+    if args.recording is not None:
+        # Replayed in real time against the virtual clock, the soak lasts as long as the recording stays fresh
+        source = Replay_METAR_Source(args.recording, clock = clock)
+        station_ids = list(source.live_metar_data or {})
+    else:
+        population = Synthetic_METAR_Population(args.stations, start = clock.now())
+        source = Synthetic_METAR_Source(population, clock = clock)
+        station_ids = population.station_ids
+    config = METAR_MAP_Config('soak', metar_source = source,
+                              station_map = {station_id: index for index, station_id in enumerate(station_ids)},
+                              day_night_dimming_config = Day_Night_Dimming_Config(True, 0.3, use_sunrise_sunet = True,
+                                                                                  day_night_latitude = 43.0,
+                                                                                  day_night_longitude = -88.0),
+                              wind_animation_config = Wind_Animation_Config(enabled = True),
+                              lightning_animation_config = Lightning_Animation_Config(enabled = True))
+    main_loop = MainLoop(config, clock = clock)
+    result = Soak_Harness(main_loop, clock, duration = timedelta(days = args.days),
+                          frame_interval = timedelta(seconds = args.frame_interval)).run()
+    print(result.summary())
+    if args.json is not None:
+        args.json.write_text(json.dumps(result.to_dict(), indent = 2))
+    return 0 if result.passed else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,9 +1,11 @@
 from __future__ import annotations
-from datetime import datetime, timedelta
+from datetime import timedelta
 from dataclasses import dataclass
 import typing
 from random import random
 from metarmap.RGB_color import RGB_color
+from metarmap.Framebuffer import Segment, Chase_Animation, Pulse_Animation
+from METAR.clock import Clock, system_clock
 
 @dataclass
 class Burst_Blink_Manager:
@@ -19,10 +21,12 @@ class Burst_Blink_Manager:
 
     state: bool = False
     cycle_running: bool = False
+    clock: Clock = system_clock
+    burst_resolution: float = 1.0       # 1.0 for the configured bursts, lower flashes proportionally less often
 
     def __post_init__(self):
         self.burst: Random_Blink_Manager | None = None
-        self.start: datetime | None = None
+        self.start: int | None = None       # clock.monotonic_ns() at the start of the current portion
         self.active: bool = False
 
         self.initialize(False)
@@ -30,7 +34,7 @@ class Burst_Blink_Manager:
     def initialize(self, start_state: bool):
         """Initialize the object for a blinking period"""
         self.state = start_state
-        self.start = datetime.now()
+        self.start = self.clock.monotonic_ns()
         self.update_durations(self.get_cycle_duration())
         self.running = True
         
@@ -38,9 +42,11 @@ class Burst_Blink_Manager:
         """Generate a random timedelta between blink_time_min and blink_time_max"""
         return timedelta(seconds = random()*(self.cycle_duration_max - self.cycle_duration_min)+self.cycle_duration_min)
     
-    def update_durations(self, duration: float) -> None:
-        self.up_duration = duration*self.cycle_duty_cycle
-        self.down_duration = duration - self.up_duration
+    def update_durations(self, duration: timedelta) -> None:
+        """Split a cycle duration into the active and quiet portions, in integer nanoseconds"""
+        duration_ns = duration//timedelta(microseconds = 1)*1000
+        self.up_duration = int(duration_ns*self.cycle_duty_cycle)
+        self.down_duration = duration_ns - self.up_duration
         return
 
     def blink(self):
@@ -48,14 +54,16 @@ class Burst_Blink_Manager:
         Flip the state if the duration has expired, and set the next duration to a random value
         between the two times (seconds) in blink_time_range
         """
-        now = datetime.now()
+        now = self.clock.monotonic_ns()
 
         # Check if we're in the active portion of the cycle
         if self.active:
             if now - self.start < self.up_duration:
                 # If there is no Burst manager, create one
                 if self.burst is None:
-                    self.burst = Random_Blink_Manager(0.01,0.02,0.5,False)
+                    self.burst = Random_Blink_Manager(self.burst_duration_min/self.burst_resolution,
+                                                      self.burst_duration_max/self.burst_resolution,
+                                                      self.burst_duty_cycle, False, clock = self.clock)
                 
                 # Otherwise, blink the burst manager and use its state in this portion
                 self.state = self.burst.blink()
@@ -84,9 +92,10 @@ class Random_Blink_Manager:
     blink_time_max: float
     duty_cycle: float
     state: bool = False
-    start: typing.Optional[datetime] = None
+    start: typing.Optional[int] = None      # clock.monotonic_ns() at the last flip
     duration: typing.Optional[timedelta] = None
     running: bool = False
+    clock: Clock = system_clock
 
     def __post_init__(self):
         self.initialize(False)
@@ -94,7 +103,7 @@ class Random_Blink_Manager:
     def initialize(self, start_state: bool):
         """Initialize the object for a blinking period"""
         self.state = start_state
-        self.start = datetime.now()
+        self.start = self.clock.monotonic_ns()
         self.update_durations(self.get_blink_duration())
         self.running = True
 
@@ -102,9 +111,11 @@ class Random_Blink_Manager:
         """Generate a random timedelta between blink_time_min and blink_time_max"""
         return timedelta(seconds = random()*(self.blink_time_max - self.blink_time_min)+self.blink_time_min)
     
-    def update_durations(self, duration: float) -> None:
-        self.up_duration = duration*self.duty_cycle
-        self.down_duration = duration - self.up_duration
+    def update_durations(self, duration: timedelta) -> None:
+        """Split a blink duration into the on and off portions, in integer nanoseconds"""
+        duration_ns = duration//timedelta(microseconds = 1)*1000
+        self.up_duration = int(duration_ns*self.duty_cycle)
+        self.down_duration = duration_ns - self.up_duration
         return
 
     def blink(self):
@@ -112,17 +123,18 @@ class Random_Blink_Manager:
         Flip the state if the duration has expired, and set the next duration to a random value
         between the two times (seconds) in blink_time_range
         """
+        now = self.clock.monotonic_ns()
 
         # If the duration has elapsed, flip the state
         if self.state:
-            if datetime.now() - self.start > self.up_duration:
+            if now - self.start > self.up_duration:
                 self.state = False
-                self.start = datetime.now()
+                self.start = now
                 self.update_durations(self.get_blink_duration())
         elif not self.state:
-            if datetime.now() - self.start > self.down_duration:
+            if now - self.start > self.down_duration:
                 self.state = True
-                self.start = datetime.now()
+                self.start = now
                 self.update_durations(self.get_blink_duration())
         
         else:
@@ -131,14 +143,22 @@ class Random_Blink_Manager:
 
 class Station:
     """Object to hold information about a station light on the METAR MAP"""
-    def __init__(self, idx: int, id: str, pin_index: int, active_color: RGB_color | None = None,
+    def __init__(self, idx: int, id: str, pin_index: int | range | typing.Sequence[int], active_color: RGB_color | None = None,
                  wind_blink_manager: Random_Blink_Manager | None = None, wind_gust_manager: Random_Blink_Manager | None = None,
                  lightning_cycle_manager: Burst_Blink_Manager | None = None):
         self.idx = idx
         self.id = id
-        self.pin_index = pin_index
+        # A station can drive a single LED or a segment (ring or strip) of several LEDs
+        self.segment = Segment(pin_index)
+        self.pin_index = self.segment.first
         self._active_color = None
         self.updated = False
+        self.dynamic = True         # Color changes between METAR updates (blinks or animations), unknown until colored
+        self.dirty = True           # Its METAR changed since its color was last derived
+
+        # Optional per-segment animation, rendered every frame over the whole segment while set
+        self._animation: Chase_Animation | Pulse_Animation | None = None
+        self.animation_color: RGB_color | None = None
 
         self.wind_state: Random_Blink_Manager | None = wind_blink_manager
         self.high_wind_state: Random_Blink_Manager | None = wind_gust_manager
@@ -149,7 +169,7 @@ class Station:
         return
     
     def __repr__(self):
-        return f'{self.__class__.__name__}: idx = {self.idx}, id = {self.id}, pin_index = {self.pin_index}, color = {self._active_color}'
+        return f'{self.__class__.__name__}: idx = {self.idx}, id = {self.id}, segment = {self.segment}, color = {self._active_color}'
     
     @property
     def active_color(self):
@@ -161,6 +181,17 @@ class Station:
             self._active_color = new_active_color
             self.updated = True
 
+    @property
+    def animation(self) -> Chase_Animation | Pulse_Animation | None:
+        return self._animation
+
+    @animation.setter
+    def animation(self, new_animation: Chase_Animation | Pulse_Animation | None) -> None:
+        # When an animation stops, the segment has to be refilled with the plain active color
+        if self._animation is not None and new_animation is None:
+            self.updated = True
+        self._animation = new_animation
+
     def __lt__(self, other: Station) -> bool:
         return self.idx < other.idx
     
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import logging
+import os
+import socket
+import sys
+import threading
+import traceback
+import typing
+from dataclasses import dataclass
+
+from METAR.clock import Clock, system_clock
+
+if typing.TYPE_CHECKING:
+    from metarmap.METAR_SOURCE import METAR_SOURCE
+
+@dataclass
+class Watchdog_Config:
+    """Configure the stall watchdog of MainLoop"""
+    enabled: bool = False
+    frame_stall_threshold: float = 10.0     # Seconds without a finished frame before the render loop is stalled
+    frame_spike_threshold: float = 1.0      # Seconds, a slower frame withholds that check's ping and is logged
+    fetch_stall_threshold: float = 120.0    # Seconds without a METAR_SOURCE loop, above the fetch timeout plus a poll
+    check_interval: float | None = None     # Seconds between checks, defaults to half of systemd's WatchdogSec, else 5
+    notify_socket: str | None = None        # Defaults to $NOTIFY_SOCKET, no notifications without either
+
+def sd_notify(message: str, notify_socket: str | None = None) -> bool:
+    """
+    Send a state to the service manager over the sd_notify datagram protocol, without depending on libsystemd
+
+    :param message: Newline separated assignments, e.g. 'READY=1' or 'WATCHDOG=1'
+    :param notify_socket: Path of the unix datagram socket, '@' prefixes an abstract socket, defaults to $NOTIFY_SOCKET
+    :return: False if there is no socket to notify or the send failed
+    """
+    notify_socket = notify_socket or os.environ.get('NOTIFY_SOCKET')
+    if not notify_socket or not hasattr(socket, 'AF_UNIX'):
+        return False
+    address = '\0' + notify_socket[1:] if notify_socket.startswith('@') else notify_socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message.encode(), address)
+    except OSError:
+        return False
+    return True
+
+def format_thread_stacks() -> str:
+    """Current stack of every thread, by thread name"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        stacks.append(f'Thread {names.get(ident, "unknown")} ({ident}):\n' + ''.join(traceback.format_stack(frame)))
+    return '\n'.join(stacks)
+
+class Watchdog:
+    """
+    Watches the render loop and the METAR_SOURCE from a daemon thread, and pings the systemd watchdog while both are healthy
+
+    The render loop reports each finished frame through heartbeat(), a stall is no frame for frame_stall_threshold.
+    The METAR_SOURCE is stalled when it is no longer running, or when it reports a last_loop_time (like
+    Aviation_Weather_METAR_Thread) older than fetch_stall_threshold, as during a fetch hung on the network.
+    A stall dumps the stacks of every thread to the log, once per stall, and WATCHDOG=1 is withheld until it
+    clears, so systemd restarts a map that stays frozen for WatchdogSec
+    """
+
+    def __init__(self, config: Watchdog_Config, metar_source: METAR_SOURCE | None = None, clock: Clock = system_clock):
+        """
+        :param config: Thresholds and the notify socket
+        :param metar_source: Source whose liveness is watched, None to only watch the frames
+        :param clock: Time source of the thresholds
+        """
+        self._logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.config = config
+        self.metar_source = metar_source
+        self.clock = clock
+        self.notify_socket: str | None = config.notify_socket or os.environ.get('NOTIFY_SOCKET')
+
+        self.check_interval: float = config.check_interval or self._default_check_interval()
+        self._last_frame_time: float = clock.monotonic()    # Startup counts as a frame, the first one has the same budget
+        self._worst_frame_ns: int = 0           # Since the last check
+        self._ready_sent: bool = False
+
+        # Outcome of the last check, for monitoring
+        self.healthy: bool = True
+        self.stalled: bool = False
+        self.problems: list[str] = []
+        self.stall_count: int = 0
+        self.pings: int = 0
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _default_check_interval() -> float:
+        """Half of the WatchdogSec systemd passes in $WATCHDOG_USEC, as sd_watchdog_enabled recommends"""
+        try:
+            return int(os.environ['WATCHDOG_USEC'])/2e6
+        except (KeyError, ValueError):
+            return 5.0
+
+    def heartbeat(self, frame_ns: int) -> None:
+        """Called by the render loop after each frame with its duration"""
+        self._last_frame_time = self.clock.monotonic()
+        if frame_ns > self._worst_frame_ns:
+            self._worst_frame_ns = frame_ns
+
+    def check(self) -> bool:
+        """
+        Check the render loop and the METAR_SOURCE once, ping the watchdog if healthy
+
+        :return: Whether everything was healthy
+        """
+        now = self.clock.monotonic()
+        problems = []
+        stalled = False
+
+        frame_age = now - self._last_frame_time
+        if frame_age > self.config.frame_stall_threshold:
+            problems.append(f'no frame for {frame_age:.1f} s')
+            stalled = True
+        worst_frame, self._worst_frame_ns = self._worst_frame_ns/1e9, 0
+        if worst_frame > self.config.frame_spike_threshold:
+            problems.append(f'frame took {worst_frame:.2f} s')
+
+        if self.metar_source is not None:
+            if not self.metar_source.is_running:
+                problems.append('METAR_SOURCE is not running')
+                stalled = True
+            else:
+                last_loop_time = getattr(self.metar_source, 'last_loop_time', None)
+                if last_loop_time is not None and now - last_loop_time > self.config.fetch_stall_threshold:
+                    problems.append(f'METAR_SOURCE has not looped for {now - last_loop_time:.1f} s')
+                    stalled = True
+
+        if stalled and not self.stalled:
+            self.stall_count += 1
+            self._logger.critical(f'Stall detected: {", ".join(problems)}, thread stacks:\n{format_thread_stacks()}')
+        elif problems:
+            self._logger.warning(f'Unhealthy: {", ".join(problems)}')
+        elif self.problems:
+            self._logger.info('Healthy again')
+        self.problems = problems
+        self.stalled = stalled
+        self.healthy = not problems
+
+        if self.healthy:
+            if not self._ready_sent:
+                self._ready_sent = sd_notify('READY=1', self.notify_socket)
+            if sd_notify('WATCHDOG=1', self.notify_socket):
+                self.pings += 1
+        return self.healthy
+
+    def start(self) -> None:
+        """Start checking every check_interval from a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'{self.__class__.__name__}', daemon=True)
+        self._thread.start()
+        self._logger.info(f'Watching the render loop and METAR_SOURCE every {self.check_interval} s'
+                          + (f', notifying {self.notify_socket}' if self.notify_socket else ''))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                self._logger.exception('Watchdog check failed')
+
+    def stop(self) -> None:
+        """Stop the checks and tell the service manager the map is stopping"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        sd_notify('STOPPING=1', self.notify_socket)
@@ -1,2 +1,5 @@
-from metarmap.METAR_Map_Config import METAR_MAP_Config, Day_Night_Dimming_Config, METAR_COLOR_CONFIG, Wind_Animation_Config, Lightning_Animation_Config
-from metarmap.MainLoop import MainLoop
\ No newline at end of file
+from metarmap.Instrumentation import startup_timer
+from metarmap.METAR_Map_Config import METAR_MAP_Config, Day_Night_Dimming_Config, METAR_COLOR_CONFIG, Wind_Animation_Config, Lightning_Animation_Config, Segment_Animation_Config, Incremental_Update_Config
+from metarmap.MainLoop import MainLoop
+
+startup_timer.mark('import')
@@ -1,32 +1,36 @@
 from __future__ import annotations
 import logging
-from logging.handlers import RotatingFileHandler
-from pathlib import Path
 from datetime import datetime, timedelta
+from pathlib import Path
 import typing
 numeric = typing.Union[int, float, complex]     # Define numeric type
 from collections import deque
 from time import perf_counter
 import random
-import astral, astral.sun
 
 def is_between_sunrise_sunset(latitude: float, longitude: float, time: datetime) -> bool:
     """Returns True if the time provided at location is between sunrise and sunset"""
+    # astral is only needed once dimming is evaluated, keep it out of the import of metarmap
+    import astral, astral.sun
     observer = astral.Observer(latitude=latitude, longitude=longitude)
-    sunrise = astral.sun.sunrise(observer=observer, date = time.date())
-    sunset = astral.sun.sunset(observer=observer, date = time.date())
-    current_time = time
-    # For some reason, astral.sun does not properly account for the date rolling over, do it for them
-    if not sunrise < sunset:
-        sunset = sunset + timedelta(days = 1)
-    return sunrise < current_time < sunset
+    # astral works on UTC dates, where a local day can straddle midnight (sunset after 00:00 UTC in the Americas),
+    # so the day that started on the previous UTC date has to be checked as well
+    for date in (time.date() - timedelta(days = 1), time.date()):
+        sunrise = astral.sun.sunrise(observer=observer, date = date)
+        sunset = astral.sun.sunset(observer=observer, date = date)
+        # For some reason, astral.sun does not properly account for the date rolling over, do it for them
+        if not sunrise < sunset:
+            sunset = sunset + timedelta(days = 1)
+        if sunrise < time < sunset:
+            return True
+    return False
 
 def quickselect_median(dset: typing.Iterable[numeric], pivot_fn: typing.Callable[[typing.Iterable[numeric]], numeric] = random.choice) -> float:
     """Returns the set median in average O(n) time"""
     if (len(dset)) % 2 == 1:
         return quickselect(dset, len(dset) // 2, pivot_fn)
     else:
-        return 0.5* (quickselect(dset, len(dset) / 2 - 1, pivot_fn) + quickselect(dset, len(dset) / 2, pivot_fn))
+        return 0.5* (quickselect(dset, len(dset) // 2 - 1, pivot_fn) + quickselect(dset, len(dset) // 2, pivot_fn))
     
 def quickselect(l: typing.Iterable[numeric], k: int, pivot_fn: typing.Callable[[numeric], numeric]) -> numeric:
     """
@@ -54,14 +58,132 @@ def quickselect(l: typing.Iterable[numeric], k: int, pivot_fn: typing.Callable[[
     else:
         return quickselect(highs, k - len(lows) - len(pivots), pivot_fn)
 
-def median_function_timer(fixed_length_queue: deque[numeric], function: typing.Callable[[], None], *args, **kwargs):
-    """Time a function with no return"""
+class P2_Quantile:
+    """
+    Streaming estimate of a single quantile with the P-squared algorithm (Jain and Chlamtac, 1985)
+
+    Holds five markers whatever the number of samples, add() is O(1) and does not allocate containers
+    """
+    __slots__ = ('quantile', 'count', '_heights', '_positions', '_desired', '_increments')
+
+    def __init__(self, quantile: float):
+        if not 0.0 < quantile < 1.0:
+            raise ValueError(f'quantile must be between 0 and 1: {quantile}')
+        self.quantile = quantile
+        self.count: int = 0
+        self._heights: list[float] = [0.0]*5        # Marker heights, the first 5 samples until initialized
+        self._positions: list[int] = [0, 1, 2, 3, 4]
+        self._desired: list[float] = [0.0, 2*quantile, 4*quantile, 2 + 2*quantile, 4.0]
+        self._increments: tuple[float, ...] = (0.0, quantile/2, quantile, (1 + quantile)/2, 1.0)
+
+    def add(self, x: float) -> None:
+        """Add one sample"""
+        heights = self._heights
+        count = self.count
+        self.count = count + 1
+
+        # Exact phase, collect the first five samples in order
+        if count < 5:
+            i = count
+            while i > 0 and heights[i - 1] > x:
+                heights[i] = heights[i - 1]
+                i -= 1
+            heights[i] = x
+            return
+
+        # Find the cell holding x, extending the extreme markers if needed
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+
+        positions = self._positions
+        desired = self._desired
+        increments = self._increments
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            desired[i] += increments[i]
+
+        # Adjust the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if d > 0 else -1
+                n_prev, n_i, n_next = positions[i - 1], positions[i], positions[i + 1]
+                q_prev, q_i, q_next = heights[i - 1], heights[i], heights[i + 1]
+                # Piecewise parabolic prediction, linear if that would break the marker ordering
+                parabolic = q_i + step/(n_next - n_prev)*((n_i - n_prev + step)*(q_next - q_i)/(n_next - n_i)
+                                                          + (n_next - n_i - step)*(q_i - q_prev)/(n_i - n_prev))
+                if q_prev < parabolic < q_next:
+                    heights[i] = parabolic
+                else:
+                    heights[i] = q_i + step*(heights[i + step] - q_i)/(positions[i + step] - n_i)
+                positions[i] = n_i + step
+
+    @property
+    def value(self) -> float:
+        """Current estimate, exact (nearest rank) for fewer than five samples, 0.0 with no samples"""
+        if self.count == 0:
+            return 0.0
+        if self.count < 5:
+            return self._heights[min(self.count - 1, int(self.quantile*self.count))]
+        return self._heights[2]
+
+class Streaming_Percentiles:
+    """Constant-memory p50, p90, p99 and max of a stream of samples"""
+    __slots__ = ('count', 'max', '_p50', '_p90', '_p99')
+
+    def __init__(self):
+        self.count: int = 0
+        self.max: float = float('-inf')
+        self._p50 = P2_Quantile(0.5)
+        self._p90 = P2_Quantile(0.9)
+        self._p99 = P2_Quantile(0.99)
+
+    def add(self, x: float) -> None:
+        """Add one sample, O(1)"""
+        self.count += 1
+        if x > self.max:
+            self.max = x
+        self._p50.add(x)
+        self._p90.add(x)
+        self._p99.add(x)
+
+    @property
+    def p50(self) -> float:
+        return self._p50.value
+
+    @property
+    def p90(self) -> float:
+        return self._p90.value
+
+    @property
+    def p99(self) -> float:
+        return self._p99.value
+
+def median_function_timer(fixed_length_queue: deque[numeric] | Streaming_Percentiles, function: typing.Callable[[], None], *args, **kwargs):
+    """
+    Time a function with no return, returns the median run time
+
+    The backend is either a fixed length deque (exact median of the retained samples, O(n) per call),
+    or a Streaming_Percentiles (estimated median of every sample, O(1) per call without allocation)
+    """
     start: float = 0
     stop: float = 0
     start = perf_counter()
     function(*args, **kwargs)
     stop = perf_counter()
     delta = stop - start
+    if isinstance(fixed_length_queue, Streaming_Percentiles):
+        fixed_length_queue.add(delta)
+        return fixed_length_queue.p50
     fixed_length_queue.appendleft(delta)
     return quickselect_median(fixed_length_queue)
 
@@ -96,13 +218,22 @@ def check_dict_for_key_path(key_path: typing.List[typing.Any], dict: dict, defau
             val = default
         return val
 
-def getStationList():
+def getStationList(path: Path | str | None = None) -> list[str]:
+    """
+    Station IDs of a text file with one per line, blank lines skipped
+
+    Without a path, every METAR reporting station of the bundled station database (see METAR.station_database)
+    """
+    if path is None:
+        from METAR.station_database import Station_Database, METAR_STATION
+        with Station_Database.open() as station_database:
+            return [station.icao for station in station_database.stations(METAR_STATION)]
     stationList = []
-    path = os.path.join('data','GB_chicago_station_list.txt')
     with open(path) as f:
         for station in f:
             station = station.strip()
-            stationList.append(station)
+            if station:
+                stationList.append(station)
     return stationList
 
 def parse_station_map(path):
@@ -0,0 +1,53 @@
+"""
+Compare two benchmark result files written by the benchmark suite
+
+    python tests/benchmarks/compare.py .benchmarks/<old>.json .benchmarks/<new>.json [--threshold 1.25]
+
+Prints the median time of every scenario in both files and their ratio, exits 1 if any scenario is slower
+than the threshold ratio
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> tuple[list[tuple[str, float | None, float | None, float | None]], list[str]]:
+    """
+    :return: (rows of scenario, baseline median ms, candidate median ms, ratio), scenarios slower than threshold
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline['results']) | set(candidate['results'])):
+        old = baseline['results'].get(name)
+        new = candidate['results'].get(name)
+        old_ms = old['median_ns']/1e6 if old else None
+        new_ms = new['median_ns']/1e6 if new else None
+        ratio = new_ms/old_ms if old_ms and new_ms is not None else None
+        rows.append((name, old_ms, new_ms, ratio))
+        if ratio is not None and ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline', type=Path)
+    parser.add_argument('candidate', type=Path)
+    parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    rows, regressions = compare(baseline, candidate, args.threshold)
+
+    def ms(value: float | None) -> str:
+        return f'{value:10.3f}' if value is not None else f'{"-":>10}'
+
+    print(f'{"scenario":<60} {baseline["commit"] or "baseline":>10} {candidate["commit"] or "candidate":>10}  ratio')
+    for name, old_ms, new_ms, ratio in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f'{name:<60} {ms(old_ms)} {ms(new_ms)}  {f"{ratio:5.2f}" if ratio is not None else "    -"}{flag}')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Benchmark harness, the benchmark fixture times callables and the results of the session are written as JSON
+
+Results go to the file named by METARMAP_BENCHMARK_JSON, by default .benchmarks/<commit>.json in the repository,
+compare two of them with tests/benchmarks/compare.py. METARMAP_BENCHMARK_STATIONS sets the station counts,
+e.g. "10,100", and METARMAP_BENCHMARK_MIN_TIME the seconds each scenario is repeated for
+
+Benchmark modules carry the benchmark marker, which the default test run deselects
+"""
+from __future__ import annotations
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import typing
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter_ns
+
+import pytest
+
+REPOSITORY = Path(__file__).resolve().parents[2]
+STATION_COUNTS = tuple(int(count) for count in os.environ.get('METARMAP_BENCHMARK_STATIONS', '10,100,1000,10000').split(','))
+MIN_TIME_S = float(os.environ.get('METARMAP_BENCHMARK_MIN_TIME', '0.2'))
+MAX_ROUNDS = 1000
+
+_results: dict[str, dict[str, typing.Any]] = {}
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Benchmark:
+    """Times a callable over repeated rounds and records the statistics under a scenario name"""
+
+    def __init__(self, min_time_s: float = MIN_TIME_S, max_rounds: int = MAX_ROUNDS):
+        self.min_time_s = min_time_s
+        self.max_rounds = max_rounds
+
+    def __call__(self, name: str, func: typing.Callable[[], typing.Any],
+                 setup: typing.Callable[[], typing.Any] | None = None,
+                 items: int | None = None,
+                 timer: typing.Callable[[], int] = perf_counter_ns,
+                 **extra: typing.Any) -> dict[str, typing.Any]:
+        """
+        Run func for at least min_time_s (and at least 3 rounds), timing each call
+
+        :param name: Scenario name, unique within the session
+        :param func: Called once per round
+        :param setup: Called untimed before each round
+        :param items: Items (stations, LEDs) handled per call, adds a per second throughput
+        :param timer: Nanosecond clock each call is timed with, time.thread_time_ns leaves out the time other
+            processes had the CPU
+        :param extra: Further values recorded with the result
+        :return: The recorded result
+        """
+        durations: list[int] = []
+        deadline = perf_counter_ns() + int(self.min_time_s*1e9)
+        while len(durations) < 3 or (perf_counter_ns() < deadline and len(durations) < self.max_rounds):
+            if setup is not None:
+                setup()
+            start = timer()
+            func()
+            durations.append(timer() - start)
+
+        result: dict[str, typing.Any] = {
+            'rounds': len(durations),
+            'min_ns': min(durations),
+            'median_ns': int(statistics.median(durations)),
+            'mean_ns': int(statistics.fmean(durations)),
+            'max_ns': max(durations),
+        }
+        if items is not None:
+            result['items'] = items
+            result['items_per_s'] = items/(result['median_ns']/1e9) if result['median_ns'] else None
+        result.update(extra)
+        _results[name] = result
+        print(f'\n{name:<60} median {result["median_ns"]/1e6:10.3f} ms  min {result["min_ns"]/1e6:10.3f} ms  ({len(durations)} rounds)')
+        return result
+
+@pytest.fixture
+def benchmark() -> Benchmark:
+    return Benchmark()
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    """Parametrize the station_count argument with STATION_COUNTS"""
+    if 'station_count' in metafunc.fixturenames:
+        metafunc.parametrize('station_count', STATION_COUNTS)
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    if not _results:
+        return
+    commit = _git_commit()
+    path = Path(os.environ.get('METARMAP_BENCHMARK_JSON', REPOSITORY / '.benchmarks' / f'{commit or "unknown"}.json'))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'results': dict(sorted(_results.items())),
+    }
+    path.write_text(json.dumps(document, indent=2))
+    print(f'\nBenchmark results written to {path}')
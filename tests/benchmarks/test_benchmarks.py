@@ -0,0 +1,350 @@
+"""
+Offline benchmarks of the fetch, parse, snapshot handoff and per-frame render paths at several station counts
+
+The benchmarks are deselected from the default test run, run them with:
+    PYTHONPATH=src python -m pytest -q -s -m benchmark tests/benchmarks
+
+Tests taking a station_count argument run at every count of METARMAP_BENCHMARK_STATIONS
+"""
+import json
+import os
+import typing
+import pickle
+import sqlite3
+from datetime import datetime, timedelta, timezone, time
+from pathlib import Path
+from time import thread_time_ns
+
+import pytest
+
+from METAR import METAR
+from METAR.binary_snapshot import encode_snapshot, decode_snapshot
+from METAR.history import METAR_History_Store, INSERT as history_INSERT
+from METAR.synthetic import Synthetic_METAR_Population, to_dataserver_xml
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.aviation_weather_metar import parse_METAR_xml, retrieve_METAR_of_stations, get_station_list_string
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_Map_Config import (Day_Night_Dimming_Config, Wind_Animation_Config, Lightning_Animation_Config,
+                                       Segment_Animation_Config, Incremental_Update_Config)
+from metarmap.METAR_SOURCE import Synthetic_METAR_Source
+from metarmap.Framebuffer import Segment, Chase_Animation, Pulse_Animation
+from metarmap.RGB_color import RGB_color
+
+pytestmark = pytest.mark.benchmark
+
+SEGMENT_LENGTH = 3
+
+class Counting_Frame_Driver:
+    """LED_DRIVER stand-in that accepts whole frames and counts the calls"""
+    is_valid = True
+    def __init__(self):
+        self.frames = 0
+        self.shows = 0
+    @property
+    def LED_index_colors(self) -> dict:
+        return {}
+    def update_frame(self, framebuffer) -> None:
+        self.frames += 1
+    def show(self) -> None:
+        self.shows += 1
+    def close(self) -> None:
+        pass
+
+class Counting_LED_Driver:
+    """LED_DRIVER stand-in updated one LED at a time, like a driver without update_frame"""
+    is_valid = True
+    def __init__(self):
+        self.updates = 0
+        self.shows = 0
+    @property
+    def LED_index_colors(self) -> dict:
+        return {}
+    def update_LED(self, index: int, color: RGB_color) -> None:
+        self.updates += 1
+    def show(self) -> None:
+        self.shows += 1
+    def close(self) -> None:
+        pass
+
+_populations: dict[int, Synthetic_METAR_Population] = {}
+
+def population(station_count: int) -> Synthetic_METAR_Population:
+    """One population per station count for the session, a few hours in so weather systems have formed"""
+    if station_count not in _populations:
+        _populations[station_count] = Synthetic_METAR_Population(station_count, seed=42)
+        _populations[station_count].advance(timedelta(hours=3))
+    return _populations[station_count]
+
+class Alternating_METAR_Source(Synthetic_METAR_Source):
+    """Hands over one of two prebuilt states, a quarter hour apart, so the hand-off itself costs nothing"""
+    def __init__(self, station_count: int):
+        metar_population = Synthetic_METAR_Population(station_count, seed=42)
+        metar_population.advance(timedelta(hours=3))
+        super().__init__(metar_population, update_interval=timedelta(days=365))
+        self._states = [metar_population.snapshot()]
+        metar_population.advance(timedelta(minutes=15))
+        self._states.append(metar_population.snapshot())
+        self._served = 0
+
+    @property
+    def new_metar_data(self) -> bool:
+        return self._new_metar_data
+
+    @new_metar_data.setter
+    def new_metar_data(self, new_state: bool) -> None:
+        self._new_metar_data = new_state
+
+    @property
+    def live_metar_data(self):
+        self._served += 1
+        return self._states[self._served % 2]
+
+class Snapshot_METAR_Source(Alternating_METAR_Source):
+    """
+    Serves the two states encoded, as lazy Binary_Snapshots decoded afresh for each new data, as
+    Aviation_Weather_METAR_Process and Replay_METAR_Source hand them to the map
+    """
+    def __init__(self, station_count: int):
+        super().__init__(station_count)
+        self._states = [encode_snapshot(state) for state in self._states]
+
+    @property
+    def live_metar_data(self):
+        return decode_snapshot(super().live_metar_data)
+
+FEATURES = {
+    'none': {},
+    'dimming_fixed_times': {'day_night_dimming_config': Day_Night_Dimming_Config(True, 0.3, bright_time_start=time(6),
+                                                                                  dim_time_start=time(21))},
+    'dimming_sunrise_sunset': {'day_night_dimming_config': Day_Night_Dimming_Config(True, 0.3, use_sunrise_sunet=True,
+                                                                                     day_night_latitude=43.0,
+                                                                                     day_night_longitude=-88.0)},
+    'wind': {'wind_animation_config': Wind_Animation_Config(enabled=True)},
+    'lightning': {'lightning_animation_config': Lightning_Animation_Config(enabled=True)},
+    'segment': {'wind_animation_config': Wind_Animation_Config(enabled=True),
+                'segment_animation_config': Segment_Animation_Config(enabled=True)},
+}
+FEATURES['all'] = {key: value for features in FEATURES.values() for key, value in features.items()
+                   if key != 'day_night_dimming_config'} | FEATURES['dimming_sunrise_sunset']
+
+def build_main_loop(station_count: int, features: typing.Optional[dict] = None, led_driver=None,
+                    segment_length: int = 1, source: typing.Optional[Synthetic_METAR_Source] = None
+                    ) -> tuple[MainLoop, Synthetic_METAR_Source]:
+    metar_population = population(station_count)
+    # Updates only when the benchmark asks for them
+    if source is None:
+        source = Synthetic_METAR_Source(metar_population, update_interval=timedelta(days=365))
+    station_map = {station_id: range(index*segment_length, (index + 1)*segment_length)
+                   for index, station_id in enumerate(metar_population.station_ids)}
+    main_loop = MainLoop(METAR_MAP_Config('benchmark', metar_source=source, station_map=station_map,
+                                          led_driver=led_driver, **(features or {})))
+    main_loop._check_for_new_METAR_data()
+    return main_loop, source
+
+def test_parse_METAR_xml(benchmark, station_count):
+    xml = to_dataserver_xml(population(station_count).snapshot().values())
+    result = benchmark(f'parse_METAR_xml[{station_count}]', lambda: parse_METAR_xml(xml),
+                       items=station_count, xml_bytes=len(xml))
+    assert len(parse_METAR_xml(xml)) == station_count
+    assert result['rounds'] >= 3
+
+def test_retrieve_METAR_of_stations(benchmark, station_count):
+    metar_population = population(station_count)
+    stations = metar_population.station_ids
+    # One GET carries every station, http.server (like most servers) rejects request lines over 64 KiB
+    if len(get_station_list_string(stations)) > 60000:
+        pytest.skip(f'{station_count} stations do not fit in one request')
+    with METAR_Fixture_Server(metar_population) as server:
+        benchmark(f'retrieve_METAR_of_stations[{station_count}]',
+                  lambda: retrieve_METAR_of_stations(stations, base_url=server.base_url), items=station_count)
+        assert server.errors_served == 0
+        assert None not in retrieve_METAR_of_stations(stations, base_url=server.base_url)
+
+def test_check_for_new_METAR_data(benchmark, station_count):
+    main_loop, source = build_main_loop(station_count)
+
+    def signal_new_data():
+        source.new_metar_data = True
+    benchmark(f'check_for_new_METAR_data[{station_count}-idle]', main_loop._check_for_new_METAR_data)
+    benchmark(f'check_for_new_METAR_data[{station_count}-new_data]', main_loop._check_for_new_METAR_data,
+              setup=signal_new_data, items=station_count)
+    assert not source.new_metar_data
+
+@pytest.mark.parametrize('feature', FEATURES)
+def test_update_color_map(benchmark, station_count, feature):
+    segment_length = SEGMENT_LENGTH if feature in ('segment', 'all') else 1
+    main_loop, _ = build_main_loop(station_count, FEATURES[feature], segment_length=segment_length)
+    benchmark(f'update_color_map[{station_count}-{feature}]', main_loop._update_color_map, items=station_count)
+    assert all(station.active_color is not None for station in main_loop.stations)
+
+@pytest.mark.parametrize('driver', ['frame', 'per_led'])
+def test_update_LEDs(benchmark, station_count, driver):
+    led_driver = Counting_Frame_Driver() if driver == 'frame' else Counting_LED_Driver()
+    main_loop, _ = build_main_loop(station_count, led_driver=led_driver)
+    main_loop._update_color_map()
+
+    def mark_all_changed():
+        for station in main_loop.stations:
+            station.updated = True
+    benchmark(f'update_LEDs[{station_count}-{driver}-all_changed]', main_loop._update_LEDs, setup=mark_all_changed,
+              items=station_count)
+    benchmark(f'update_LEDs[{station_count}-{driver}-unchanged]', main_loop._update_LEDs)
+    assert led_driver.shows > 0
+    if driver == 'per_led':
+        assert led_driver.updates >= station_count
+    else:
+        assert led_driver.frames > 0
+
+@pytest.mark.parametrize('source_type', ['dict', 'snapshot'])
+@pytest.mark.parametrize('update', ['whole', 'incremental'])
+def test_refresh_frame(benchmark, station_count, update, source_type):
+    """
+    Frames while new METAR data keeps arriving, at the skip_static quality level, max_ns is the worst frame
+
+    The dict source hands over a built dict, the snapshot source a lazy Binary_Snapshot decoded as it is read
+    """
+    features = {'incremental_update_config': Incremental_Update_Config(enabled=update == 'incremental')}
+    source = Snapshot_METAR_Source(station_count) if source_type == 'snapshot' else None
+    main_loop, source = build_main_loop(station_count, features, source=source)
+    main_loop._apply_quality_level(1)
+    main_loop._update_color_map()
+
+    def signal_new_data_once_applied():
+        if main_loop._pending_metar_state is None:
+            source.new_metar_data = True
+    def frame():
+        main_loop._check_for_new_METAR_data()
+        main_loop._update_color_map()
+    result = benchmark(f'refresh_frame[{station_count}-{update}-{source_type}]', frame, setup=signal_new_data_once_applied,
+                       items=station_count)
+    print(f'{"":<60} worst frame {result["max_ns"]/1e6:7.3f} ms')
+    assert all(station.active_color is not None for station in main_loop.stations)
+
+def test_incremental_frame_budget(benchmark, station_count):
+    """
+    With incremental updates no frame exceeds the budget at any station count, at full quality, from the first
+    state on, while new states keep arriving
+    """
+    incremental_update = Incremental_Update_Config(enabled=True)
+    source = Alternating_METAR_Source(station_count)
+    main_loop, source = build_main_loop(station_count, {'incremental_update_config': incremental_update}, source=source)
+
+    def signal_new_data_once_applied():
+        if main_loop._pending_metar_state is None and main_loop._recolor_sweep is None and not main_loop._recolor_queue:
+            source.new_metar_data = True
+    def frame():
+        main_loop._check_for_new_METAR_data()
+        main_loop._update_color_map()
+        main_loop.frame_count += 1
+    # The CPU time of the frame, a preempted frame is not the loop's doing
+    result = benchmark(f'incremental_frame_budget[{station_count}]', frame, setup=signal_new_data_once_applied,
+                       items=station_count, timer=thread_time_ns)
+    print(f'{"":<60} worst frame {result["max_ns"]/1e6:7.3f} ms')
+    assert result['max_ns'] < incremental_update.budget*1e9
+    assert source._served >= 2
+
+@pytest.mark.parametrize('path', ['bulk', 'per_led'])
+def test_framebuffer_fill(benchmark, path):
+    """Filling and animating 2,000 LEDs by segment slices versus one update per LED"""
+    led_count, segment_length = 2000, 10
+    segments = [Segment(range(start, start + segment_length)) for start in range(0, led_count, segment_length)]
+    framebuffer = bytearray(led_count*3)
+    colors = [bytes((n % 256, 255 - n % 256, 0)) for n in range(len(segments))]
+    chase = Chase_Animation()
+    pulse = Pulse_Animation()
+    frame_time = [0.0]
+
+    def bulk_frame():
+        t = frame_time[0] = frame_time[0] + 1/60
+        for n, segment in enumerate(segments):
+            if n % 3 == 0:
+                segment.write(framebuffer, chase.render(segment_length, colors[n], b'\x00\x00\x00', t))
+            elif n % 3 == 1:
+                segment.write(framebuffer, pulse.render(segment_length, colors[n], b'', t))
+            else:
+                segment.fill(framebuffer, colors[n])
+
+    # Reference, the per-LED path of one driver call and one RGB_color per pixel
+    pixels: dict[int, RGB_color] = {}
+    def per_led_frame():
+        for n, segment in enumerate(segments):
+            color = RGB_color(*colors[n])
+            for index in segment.indices:
+                pixels[index] = color
+
+    benchmark(f'framebuffer_fill[{led_count}-{path}]', bulk_frame if path == 'bulk' else per_led_frame, items=led_count)
+    assert any(framebuffer) or pixels
+
+def as_dicts(metar_data) -> dict:
+    return {station_id: metar.to_dict() if metar is not None else None for station_id, metar in metar_data.items()}
+
+def from_dicts(values: dict) -> dict:
+    return {station_id: METAR.from_dict(value) if value is not None else None for station_id, value in values.items()}
+
+@pytest.mark.parametrize('codec', ['binary', 'pickle', 'json'])
+def test_snapshot_codecs(benchmark, station_count, codec):
+    """Encode and decode of a snapshot by the binary codec, pickle and JSON, the binary decode is lazy"""
+    metar_data = population(station_count).snapshot()
+    encode, decode = {
+        'binary': (lambda: encode_snapshot(metar_data), decode_snapshot),
+        'pickle': (lambda: pickle.dumps(as_dicts(metar_data), protocol=pickle.HIGHEST_PROTOCOL),
+                   lambda data: from_dicts(pickle.loads(data))),
+        'json': (lambda: json.dumps(as_dicts(metar_data)).encode('utf-8'), lambda data: from_dicts(json.loads(data))),
+    }[codec]
+    data = encode()
+    benchmark(f'snapshot_encode[{station_count}-{codec}]', encode, items=station_count, size_bytes=len(data))
+    benchmark(f'snapshot_decode[{station_count}-{codec}]', lambda: decode(data), items=station_count)
+    if codec == 'binary':
+        benchmark(f'snapshot_decode[{station_count}-binary+materialize]', lambda: decode_snapshot(data).to_dict(),
+                  items=station_count)
+    assert len(decode(data)) == station_count
+
+HISTORY_STATIONS = 1000
+HISTORY_DAYS = int(os.environ.get('METARMAP_BENCHMARK_HISTORY_DAYS', '365'))
+HISTORY_END = datetime(2026, 1, 1, tzinfo=timezone.utc)
+FLIGHT_CATEGORIES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+
+@pytest.fixture(scope='module')
+def history_path(tmp_path_factory) -> Path:
+    """A year (HISTORY_DAYS) of hourly observations of 1,000 stations, bulk loaded rather than through record()"""
+    path = tmp_path_factory.mktemp('history') / 'history.db'
+    METAR_History_Store(path, retention=None).close()
+    end = int(HISTORY_END.timestamp())
+    hours = HISTORY_DAYS*24
+    rows = ((f'K{n:03d}', end - hour*3600, FLIGHT_CATEGORIES[(n + hour//6) % 4], 'VRB', 10, None, 10.0, 12.0, 3.0, 29.92,
+             None, f'K{n:03d} {hour}')
+            for n in range(HISTORY_STATIONS) for hour in range(hours, 0, -1))
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA synchronous=OFF')
+    with connection:
+        connection.executemany(history_INSERT, rows)
+    connection.close()
+    return path
+
+def test_history_queries(benchmark, history_path):
+    """Query helpers and the hourly write of the history store, on a year of observations of 1,000 stations"""
+    stations = [f'K{n:03d}' for n in range(HISTORY_STATIONS)]
+    with METAR_History_Store(history_path, retention=None) as store:
+        assert store.count() == HISTORY_STATIONS*HISTORY_DAYS*24
+        benchmark(f'history_latest[{HISTORY_DAYS}d-24]', lambda: store.latest('K999', 24))
+        benchmark(f'history_latest_per_station[{HISTORY_DAYS}d-3]', lambda: store.latest_per_station(3, stations),
+                  items=HISTORY_STATIONS)
+        benchmark(f'history_category_transitions[{HISTORY_DAYS}d-1d]',
+                                lambda: store.category_transitions(HISTORY_END - timedelta(days=1), HISTORY_END))
+        assert store.category_transitions(HISTORY_END - timedelta(days=1), HISTORY_END)
+
+        # One retrieval of every station per round, an hour after the previous one
+        hour = [0]
+        retrieval: dict[str, METAR] = {}
+        def next_retrieval():
+            hour[0] += 1
+            observation_time = HISTORY_END + timedelta(hours=hour[0])
+            retrieval.clear()
+            retrieval.update({station_id: METAR(station=station_id, raw_text=f'{station_id} +{hour[0]}',
+                                                observation_time=observation_time, flight_category='VFR')
+                              for station_id in stations})
+        def record_and_flush():
+            store.record(retrieval)
+            store.flush()
+        benchmark(f'history_record[{HISTORY_DAYS}d]', record_and_flush, setup=next_retrieval, items=HISTORY_STATIONS)
+        assert store.latest('K000')[0].raw_text == f'K000 +{hour[0]}'
@@ -1,19 +0,0 @@
-from METAR import ADDSMETAR
-
-def test_initialize_stations():
-    return
-
-def test_getMETARofStation():
-    return
-
-def test_updateMETARdata():
-    return
-
-def test_parseMETARXML():
-    return
-
-def test_addStation():
-    return
-
-def test_removeStation():
-    return
\ No newline at end of file
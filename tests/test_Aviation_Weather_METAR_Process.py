@@ -0,0 +1,122 @@
+import os
+import signal
+import time
+from datetime import timedelta
+
+import pytest
+
+from METAR.synthetic import Synthetic_METAR_Population
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.binary_snapshot import encode_snapshot, decode_snapshot, Binary_Snapshot
+from METAR.shared_snapshot import Shared_Snapshot_Buffer, Snapshot_Too_Large_Error, SLOT_HEADER, HEADER, STALE
+from METAR.Aviation_Weather_METAR_Process import Aviation_Weather_METAR_Process, MIN_SLOT_SIZE
+
+def wait_until(condition, timeout: float = 20.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_shared_snapshot_buffer():
+    population = Synthetic_METAR_Population(20)
+    writer = Shared_Snapshot_Buffer(slot_size=64*1024, create=True)
+    reader = Shared_Snapshot_Buffer(writer.name)
+    try:
+        assert reader.sequence == 0 and reader.read() is None and reader.last_loop_time is None
+        first = encode_snapshot(population.snapshot())
+        assert writer.publish(first) == 1
+        assert reader.read() == (1, first)
+        population.advance(timedelta(hours=1))
+        second = encode_snapshot(population.snapshot())
+        writer.publish(second)
+        sequence, data = reader.read()
+        assert sequence == 2
+        assert [metar.raw_text for metar in decode_snapshot(data).values()] == \
+            [metar.raw_text for metar in population.snapshot().values()]
+
+        writer.set_state(STALE, 12.5)
+        assert reader.flags & STALE and reader.last_loop_time == 12.5
+
+        # A slot caught mid-write (odd slot sequence) is never returned
+        slot_offset = HEADER.size + (reader.sequence % 2)*(SLOT_HEADER.size + reader.slot_size)
+        slot_sequence, length = SLOT_HEADER.unpack_from(writer._shm.buf, slot_offset)
+        SLOT_HEADER.pack_into(writer._shm.buf, slot_offset, slot_sequence + 1, length)
+        assert reader.read(retries=3) is None
+
+        with pytest.raises(Snapshot_Too_Large_Error):
+            writer.publish(bytes(64*1024 + 1))
+        with pytest.raises(FileNotFoundError):
+            Shared_Snapshot_Buffer(writer.name + 'x')
+    finally:
+        reader.close()
+        writer.close()
+
+def test_publish_after_a_writer_killed_mid_write():
+    population = Synthetic_METAR_Population(5)
+    writer = Shared_Snapshot_Buffer(slot_size=16*1024, create=True)
+    reader = Shared_Snapshot_Buffer(writer.name)
+    try:
+        writer.publish(encode_snapshot(population.snapshot()))
+        # The next write dies after marking its slot, leaving the slot sequence odd and the sequence unpublished
+        slot_offset = HEADER.size + ((writer.sequence + 1) % 2)*(SLOT_HEADER.size + writer.slot_size)
+        slot_sequence, length = SLOT_HEADER.unpack_from(writer._shm.buf, slot_offset)
+        SLOT_HEADER.pack_into(writer._shm.buf, slot_offset, slot_sequence + 1, length)
+
+        # The restarted writer publishes into the same slot, and every publish after it stays readable
+        for sequence in range(2, 6):
+            population.advance(timedelta(hours=1))
+            data = encode_snapshot(population.snapshot())
+            assert writer.publish(data) == sequence
+            assert reader.read(retries=1) == (sequence, data)
+    finally:
+        reader.close()
+        writer.close()
+
+def test_slots_are_sized_for_the_stations():
+    population = Synthetic_METAR_Population(10_000)
+    source = Aviation_Weather_METAR_Process(stations=population.station_ids, wait_to_run=True)
+    try:
+        assert source._buffer.slot_size >= len(encode_snapshot(population.snapshot()))
+    finally:
+        source.stop()
+    source = Aviation_Weather_METAR_Process(stations=['KMKE'], wait_to_run=True)
+    try:
+        assert source._buffer.slot_size == MIN_SLOT_SIZE
+    finally:
+        source.stop()
+
+def test_process_publishes_and_restarts():
+    population = Synthetic_METAR_Population(30)
+    with METAR_Fixture_Server(population) as server:
+        source = Aviation_Weather_METAR_Process(stations=population.station_ids, update_interval=timedelta(seconds=0.5),
+                                                stale_data_time=timedelta(seconds=3), base_url=server.base_url,
+                                                poll_interval=0.05, restart_delay=0.1)
+        try:
+            assert source.live_metar_data is None
+            assert wait_until(lambda: source.new_metar_data)
+            live_metar_data = source.live_metar_data
+            assert isinstance(live_metar_data, Binary_Snapshot)
+            assert [metar.raw_text for metar in live_metar_data.values()] == \
+                [metar.raw_text for metar in population.snapshot().values()]
+            source.new_metar_data = False
+            assert source.is_running and source.last_loop_time is not None
+
+            # A killed worker is restarted and keeps publishing
+            pid = source.pid
+            os.kill(pid, signal.SIGKILL)
+            assert wait_until(lambda: source.pid != pid and source.is_running)
+            assert source.restarts == 1
+            with server.population_lock:
+                population.advance(timedelta(hours=1))
+            station_id = population.station_ids[0]
+            assert wait_until(lambda: source.live_metar_data[station_id].raw_text == population.snapshot()[station_id].raw_text)
+
+            # Failed retrievals make the data stale
+            server.error_rate = 1.0
+            assert wait_until(lambda: source.data_is_stale)
+            assert source.live_metar_data is None
+        finally:
+            source.stop()
+    assert not source.is_running
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from METAR import METAR
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.Framebuffer import Segment, Chase_Animation, Pulse_Animation, frame_delta, scale_pixels
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from LED_Control.LED_Driver import LED_DRIVER
+
+LED_COUNT = 2000
+
+def test_segment_runs():
+    assert Segment(4).runs == [(4, 5, 0)]
+    assert Segment(range(3, 8)).runs == [(3, 8, 0)]
+    assert Segment([0, 1, 2, 5, 6, 9]).runs == [(0, 3, 0), (5, 7, 3), (9, 10, 5)]
+    assert Segment([9, 8]).runs == [(9, 10, 0), (8, 9, 1)]
+    assert Segment([0, 1, 2, 5, 6, 9]).stop == 10
+
+def test_segment_fill_and_write():
+    framebuffer = bytearray(12*3)
+    segment = Segment([1, 2, 7, 8, 9])
+    segment.fill(framebuffer, b'\x01\x02\x03')
+    assert [i for i in range(12) if framebuffer[i*3:i*3 + 3] == b'\x01\x02\x03'] == [1, 2, 7, 8, 9]
+
+    segment.write(framebuffer, bytes(range(15)))
+    assert framebuffer[3:9] == bytes(range(6))
+    assert framebuffer[21:30] == bytes(range(6, 15))
+
+def test_chase_rotates_pattern():
+    chase = Chase_Animation(period=1.0, tail=1)
+    head, background = b'\xff\x00\x00', b'\x00\x00\x00'
+    at_start = chase.render(4, head, background, 0.0)
+    assert at_start[0:3] == head
+    quarter = chase.render(4, head, background, 0.25)
+    assert quarter[3:6] == head
+    assert quarter[0:3] == b'\x7f\x00\x00'       # Tail fades out behind the head
+    assert quarter[6:] == background*2
+
+def test_pulse_and_scale():
+    pulse = Pulse_Animation(period=1.0, min_brightness=0.0)
+    assert pulse.render(3, b'\xff\x80\x00', b'', 0.5) == b'\xff\x80\x00'*3
+    assert pulse.render(3, b'\xff\x80\x00', b'', 0.0) == bytes(9)
+    assert scale_pixels(b'\xff\x80\x00', 0.5) == b'\x7f\x40\x00'
+
+def test_frame_delta_large_strip():
+    previous = bytes(LED_COUNT*3)
+    current = bytearray(previous)
+    current[1500*3:1500*3 + 3] = b'\x01\x01\x01'
+    assert frame_delta(previous, current) == [(1500, b'\x01\x01\x01')]
+
+class Protocol_LED_Driver(LED_DRIVER):
+    """Subclasses the protocol without update_frame or show, like the drivers written before them"""
+    is_valid = True
+    LED_index_colors = {}
+    def __init__(self):
+        self.updated: list[int] = []
+    def update_LED(self, index, color) -> None:
+        self.updated.append(index)
+    def close(self) -> None:
+        pass
+
+class Plain_LED_Driver:
+    """Duck typed, no show() at all"""
+    is_valid = True
+    LED_index_colors = {}
+    def __init__(self):
+        self.updated: list[int] = []
+    def update_LED(self, index, color) -> None:
+        self.updated.append(index)
+    def close(self) -> None:
+        pass
+
+def test_drivers_without_update_frame_are_updated_per_LED():
+    for led_driver in (Protocol_LED_Driver(), Plain_LED_Driver()):
+        source = Demo_METAR_Source({'KMKE': METAR(station='KMKE', raw_text='KMKE 011200Z', flight_category='VFR')},
+                                   timedelta(days=1))
+        main_loop = MainLoop(METAR_MAP_Config('per_led', metar_source=source, station_map={'KMKE': range(2)},
+                                              led_driver=led_driver))
+        main_loop.loop()
+        assert led_driver.updated == [0, 1]
@@ -0,0 +1,182 @@
+import typing
+from datetime import timedelta
+
+from METAR import METAR
+from METAR.binary_snapshot import encode_snapshot, decode_snapshot
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_Map_Config import Incremental_Update_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+
+STATIONS = ['KOSH', 'KMKE', 'KMSN', 'KUES', 'KATW']
+
+class Switchable_Source(Demo_METAR_Source):
+    """Demo_METAR_Source whose data can be replaced and made stale"""
+    def __init__(self, metars: dict[str, METAR]):
+        super().__init__(metars, timedelta(days=1))
+        self.stale = False
+    @property
+    def data_is_stale(self) -> bool:
+        return self.stale
+    def replace(self, metars: dict[str, METAR]) -> None:
+        self.demo_data = metars
+        self.new_metar_data = True
+
+def metars(flight_category: str, stations: list[str] = STATIONS) -> dict[str, METAR]:
+    return {station_id: METAR(station=station_id, raw_text=f'{station_id} 011200Z', flight_category=flight_category)
+            for station_id in stations}
+
+def build_main_loop(incremental_update_config: typing.Optional[Incremental_Update_Config]) -> tuple[MainLoop, Switchable_Source]:
+    source = Switchable_Source(metars('VFR'))
+    main_loop = MainLoop(METAR_MAP_Config('incremental', metar_source=source,
+                                          station_map={station_id: index for index, station_id in enumerate(STATIONS)},
+                                          incremental_update_config=incremental_update_config))
+    return main_loop, source
+
+def flight_categories(main_loop: MainLoop) -> list[typing.Optional[str]]:
+    return [metar.flight_category if metar is not None else None
+            for metar in (main_loop._current_metar_state.get(station_id) for station_id in STATIONS)]
+
+def test_new_state_is_applied_in_slices():
+    main_loop, source = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=2, budget=None))
+    # The first state is applied whole, as the source's own data
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['VFR']*5
+    first = source.demo_data
+    assert main_loop._current_metar_state is first
+
+    # Slices go into a dict of the map's own, the source's data is left as it is
+    source.replace(metars('IFR', STATIONS[:4]))
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['IFR', 'IFR', 'VFR', 'VFR', 'VFR']
+    assert main_loop._current_metar_state is not first
+    assert all(metar.flight_category == 'VFR' for metar in first.values())
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['IFR', 'IFR', 'IFR', 'IFR', 'VFR']
+    # Stations missing from the new state are dropped on their turn
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['IFR', 'IFR', 'IFR', 'IFR', None]
+    assert main_loop._pending_metar_state is None
+
+    # Newer data restarts the application
+    source.replace(metars('LIFR'))
+    main_loop._check_for_new_METAR_data()
+    source.replace(metars('MVFR'))
+    for _ in range(3):
+        main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['MVFR']*5
+
+def test_dropped_station_has_no_data_once_applied():
+    main_loop, source = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=2, budget=None))
+    main_loop._check_for_new_METAR_data()
+    source.replace(metars('IFR', STATIONS[1:]))
+    main_loop._check_for_new_METAR_data()
+    # Still applying, the source's previous state beneath no longer shows through for the dropped station
+    assert main_loop._pending_metar_state is not None
+    assert flight_categories(main_loop) == [None, 'IFR', 'VFR', 'VFR', 'VFR']
+    assert 'KOSH' not in main_loop._current_metar_state
+
+def test_lazy_snapshot_is_decoded_within_the_slices():
+    main_loop, source = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=2, budget=None))
+    main_loop._check_for_new_METAR_data()
+    snapshot = decode_snapshot(encode_snapshot(metars('IFR')))
+    source.replace(snapshot)
+    decoded = []
+    for _ in range(3):
+        main_loop._check_for_new_METAR_data()
+        decoded.append(len(snapshot._cache))
+    assert decoded == [2, 4, 5]
+    assert flight_categories(main_loop) == ['IFR']*5
+
+def test_time_budget_bounds_a_slice():
+    main_loop, source = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=None, budget=0))
+    main_loop._check_for_new_METAR_data()
+    source.replace(metars('IFR'))
+    # A spent budget still applies one station per frame
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['IFR', 'VFR', 'VFR', 'VFR', 'VFR']
+
+def test_stale_data_is_cleared_once():
+    main_loop, source = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=3, budget=None))
+    main_loop._check_for_new_METAR_data()
+    source.stale = True
+    main_loop._check_for_new_METAR_data()
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == [None]*5
+    assert main_loop._current_metar_state_time is None
+
+    # Cleared stations stay as they are while the data remains stale
+    main_loop._current_metar_state['KOSH'] = source.demo_data['KOSH']
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop)[0] == 'VFR'
+
+def test_whole_update_clears_stale_data_once():
+    main_loop, source = build_main_loop(None)
+    main_loop._check_for_new_METAR_data()
+    assert main_loop._current_metar_state is source.demo_data
+    source.stale = True
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == [None]*5
+    cleared = main_loop._current_metar_state['KOSH']
+    main_loop._check_for_new_METAR_data()
+    assert main_loop._current_metar_state['KOSH'] is cleared
+
+    # New data, stale again later, is cleared again
+    source.stale = False
+    source.replace(metars('IFR'))
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['IFR']*5
+    source.stale = True
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == [None]*5
+
+def test_whole_update_of_a_read_only_snapshot():
+    main_loop, source = build_main_loop(None)
+    source.replace(decode_snapshot(encode_snapshot(metars('IFR'))))
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == ['IFR']*5
+    # Stale data is cleared into a new dict, the snapshot is left as it is
+    source.stale = True
+    main_loop._check_for_new_METAR_data()
+    assert flight_categories(main_loop) == [None]*5
+    assert source.demo_data['KOSH'].flight_category == 'IFR'
+
+def test_only_applied_stations_are_recolored():
+    main_loop, source = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=2, budget=None))
+    recolored = []
+    process_flight_category = main_loop._process_flight_category
+    def counting_process_flight_category(station_metar):
+        recolored.append(station_metar.station)
+        return process_flight_category(station_metar)
+    main_loop._process_flight_category = counting_process_flight_category
+
+    # The first state is swept onto the map two stations a frame, at full quality too
+    for _ in range(3):
+        main_loop.loop()
+    assert recolored == STATIONS
+    vfr_color = main_loop.stations[0].active_color
+    recolored.clear()
+    main_loop.loop()
+    assert recolored == []
+
+    source.replace(metars('IFR'))
+    main_loop.loop()
+    assert recolored == STATIONS[:2]
+    assert [station.active_color.RGB == vfr_color.RGB for station in main_loop.stations] == [False, False, True, True, True]
+    main_loop.loop()
+    main_loop.loop()
+    assert recolored == STATIONS
+    assert not any(station.active_color.RGB == vfr_color.RGB for station in main_loop.stations)
+
+def test_whole_map_recolor_is_swept_in_slices():
+    main_loop, _ = build_main_loop(Incremental_Update_Config(enabled=True, stations_per_frame=2, budget=None))
+    for _ in range(3):
+        main_loop.loop()
+    bright = [station.active_color.RGB for station in main_loop.stations]
+    # As when dimming switches, every station is recolored, two a frame
+    main_loop._color_map_dirty = True
+    main_loop.loop()
+    assert main_loop._recolor_sweep == 2
+    for _ in range(2):
+        main_loop.loop()
+    assert main_loop._recolor_sweep is None
+    assert [station.active_color.RGB for station in main_loop.stations] == bright
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from METAR import METAR
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.Instrumentation import Stage_Histogram, Loop_Instrumentation, Startup_Timer
+
+def test_histogram_buckets():
+    histogram = Stage_Histogram()
+    for duration_ns in (500, 1500, 1500, 3_000_000, 10**12):
+        histogram.record(duration_ns)
+    snapshot = histogram.snapshot()
+    buckets = dict(snapshot['buckets'])
+    assert buckets[1000] == 1
+    assert buckets[2000] == 2
+    assert buckets[4_096_000] == 1
+    assert buckets[None] == 1
+    assert snapshot['max_ns'] == 10**12
+    assert histogram.quantile(0.5) == 2000
+    histogram.reset()
+    assert histogram.count == 0 and histogram.quantile(0.5) == 0
+
+def test_main_loop_stages_switch_at_runtime():
+    demo_data = {'KMKE': METAR(station='KMKE', flight_category='VFR', raw_text='KMKE ')}
+    main_loop = MainLoop(METAR_MAP_Config(name='timed', station_map={'KMKE': 0},
+                                          metar_source=Demo_METAR_Source(demo_data, timedelta(minutes=15))))
+    main_loop.loop()
+    assert main_loop.instrumentation.snapshot()['loop']['count'] == 0
+
+    main_loop.instrumentation.enabled = True
+    for _ in range(5):
+        main_loop.loop()
+    snapshot = main_loop.instrumentation.snapshot()
+    for stage in Loop_Instrumentation.STAGES:
+        if stage != 'driver_transmit':      # No LED_DRIVER configured
+            assert snapshot[stage]['count'] == 5, stage
+
+    main_loop.instrumentation.enabled = False
+    main_loop.loop()
+    assert main_loop.instrumentation.snapshot()['loop']['count'] == 5
+    # Timed or not, every frame is counted the same way
+    assert main_loop.frame_count == 7
+    assert main_loop.frame_time_histogram.count == 7
+
+def test_startup_timer_marks_each_phase_once():
+    timer = Startup_Timer(start=0.0)
+    timer.mark('import')
+    first = timer.marks['import']
+    timer.mark('config_build')
+    timer.mark('import')
+    assert timer.marks['import'] == first
+    assert list(timer.marks) == ['import', 'config_build']
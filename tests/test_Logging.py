@@ -0,0 +1,181 @@
+import gzip
+import logging
+import threading
+
+import pytest
+
+from METAR.clock import Virtual_Clock
+from metarmap.Logging import attach_queued_handler, Boot_Cycle_Log_Manager, Rate_Limited_Error_Reporter
+
+class Gated_Handler(logging.Handler):
+    """Handler standing in for a stalled SD card, every write waits for the gate"""
+    def __init__(self, gate: threading.Event):
+        super().__init__()
+        self.gate = gate
+        self.messages: list[str] = []
+        self.flushes = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.gate.wait()
+        self.messages.append(record.getMessage())
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+@pytest.fixture
+def make_logger():
+    """Loggers of this module that do not propagate, their handlers are detached after the test"""
+    loggers: list[logging.Logger] = []
+    def make_logger(name: str) -> logging.Logger:
+        logger = logging.getLogger(f'test_Logging.{name}')
+        logger.propagate = False
+        loggers.append(logger)
+        return logger
+    yield make_logger
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.propagate = True
+
+def test_logging_does_not_wait_on_the_handler(make_logger):
+    logger = make_logger('queued')
+    gate = threading.Event()
+    handler = Gated_Handler(gate)
+    frames = 200
+    listener = attach_queued_handler(logger, handler, queue_size=frames*5 + 10, batch_size=64)
+    try:
+        # A render loop logging several errors every frame, while the handler cannot write at all
+        def render_loop():
+            for frame in range(frames):
+                for station in range(5):
+                    logger.error(f'Station: S{station} has no data, frame {frame}')
+        render_thread = threading.Thread(target=render_loop)
+        render_thread.start()
+        render_thread.join(timeout=10)
+        assert not render_thread.is_alive()
+        assert handler.messages == []
+    finally:
+        gate.set()
+        listener.stop()
+    # Nothing was lost, and the writes were flushed in batches
+    assert len(handler.messages) == frames*5
+    assert handler.flushes < frames*5
+
+def test_full_queue_drops_and_reports(make_logger):
+    logger = make_logger('dropping')
+    gate = threading.Event()
+    handler = Gated_Handler(gate)
+    listener = attach_queued_handler(logger, handler, queue_size=10)
+    queue_handler = logger.handlers[0]
+    try:
+        for n in range(50):
+            logger.error(f'record {n}')
+        assert queue_handler.dropped >= 39
+    finally:
+        gate.set()
+    # Let the listener drain the queue so the summary has room
+    listener.stop()
+    listener.start()
+    logger.error('after the burst')
+    listener.stop()
+    assert any('log records dropped' in message for message in handler.messages)
+    assert handler.messages[-1] == 'after the burst'
+
+def test_boot_cycle_log_manager_queued(tmp_path, make_logger):
+    logger = make_logger('boot_cycle')
+    manager = Boot_Cycle_Log_Manager(log_root=tmp_path, log_file_name='map', logger=logger)
+    manager.run()
+    logger.info('queued message')
+    manager.listener.stop()
+    log_file = tmp_path / 'cycle_log0' / 'map.log'
+    assert 'queued message' in log_file.read_text()
+
+class Recording_Handler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+def test_error_reporter_deduplicates_and_summarizes(make_logger):
+    logger = make_logger('error_reporter')
+    logger.setLevel(logging.INFO)
+    handler = Recording_Handler()
+    logger.addHandler(handler)
+    clock = Virtual_Clock()
+    reporter = Rate_Limited_Error_Reporter(logger, summary_interval=10.0, clock=clock)
+
+    # 60 frames a second for 30 seconds, two stations failing
+    for _ in range(1800):
+        reporter.report('KBOS', 'no_data', 'Station: %s has no data', 'KBOS')
+        reporter.report('KJFK', 'wind', 'Error for %s', 'KJFK')
+        clock.advance(1/60)
+    # First occurrence plus one summary per 10 s window, per station
+    assert len(handler.records) == 6
+    assert handler.records[0].getMessage() == 'Station: KBOS has no data'
+    assert 'repeated' in handler.records[2].getMessage()
+    assert reporter.suppressed_counts == {('KBOS', 'no_data'): 1799, ('KJFK', 'wind'): 1799}
+    assert reporter.suppressed_total == 3598
+
+    # The condition clears, the next occurrence is logged in full again
+    reporter.clear('KBOS')
+    assert 'cleared' in handler.records[-1].getMessage()
+    assert ('KBOS', 'no_data') not in reporter.suppressed_counts
+    reporter.clear('KLAX')
+    reporter.report('KBOS', 'no_data', 'Station: %s has no data', 'KBOS')
+    assert handler.records[-1].getMessage() == 'Station: KBOS has no data'
+
+def boot(tmp_path, logger: logging.Logger, message: str, **kwargs) -> Boot_Cycle_Log_Manager:
+    """One boot cycle: run the manager, log a message, stop logging and wait for the maintenance"""
+    manager = Boot_Cycle_Log_Manager(log_root=tmp_path, log_file_name='map', logger=logger, cycle_count=3, **kwargs)
+    manager.run()
+    logger.info(message)
+    manager.listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    assert manager.wait_for_maintenance(timeout=10)
+    return manager
+
+def test_boot_cycle_index_and_compression(tmp_path, monkeypatch, make_logger):
+    logger = make_logger('boot_cycle_index')
+    manager = boot(tmp_path, logger, 'first boot')
+    assert manager.active_cycle == 0
+    assert (tmp_path / '.cycle_index').read_text().split('\n')[0] == '0'
+
+    # With an index, boot never scans the cycle directories for the flag
+    def no_scan(self):
+        raise AssertionError('cycle directories scanned at boot')
+    monkeypatch.setattr(Boot_Cycle_Log_Manager, '_search_for_active_log_flag', no_scan)
+    manager = boot(tmp_path, logger, 'second boot')
+    assert manager.active_cycle == 1
+    assert not (tmp_path / 'cycle_log0' / '.active_log_flag').exists()
+    assert (tmp_path / 'cycle_log1' / '.active_log_flag').exists()
+
+    # The retired cycle was compressed in the background
+    assert not (tmp_path / 'cycle_log0' / 'map.log').exists()
+    assert 'first boot' in gzip.open(tmp_path / 'cycle_log0' / 'map.log.gz', 'rt').read()
+
+    # Wrapping around reuses cycle 0, its old contents are discarded
+    boot(tmp_path, logger, 'third boot')
+    manager = boot(tmp_path, logger, 'fourth boot')
+    assert manager.active_cycle == 0
+    assert 'fourth boot' in (tmp_path / 'cycle_log0' / 'map.log').read_text()
+    assert not (tmp_path / 'cycle_log0' / 'map.log.gz').exists()
+    assert not [item for item in tmp_path.iterdir() if item.name.startswith(Boot_Cycle_Log_Manager.DISCARD_PREFIX)]
+
+def test_boot_cycle_without_index_and_storage_budget(tmp_path, make_logger):
+    logger = make_logger('boot_cycle_budget')
+    # A log_root from before the index existed, located by its flag
+    (tmp_path / 'cycle_log1').mkdir()
+    (tmp_path / 'cycle_log1' / '.active_log_flag').write_text('')
+    (tmp_path / 'cycle_log1' / 'map.log').write_text('x'*1000)
+    (tmp_path / 'cycle_log0').mkdir()
+    (tmp_path / 'cycle_log0' / 'map.log.gz').write_bytes(bytes(1000))
+
+    # Cycle 0 is the oldest retired cycle and does not fit the budget alongside cycle 1
+    manager = boot(tmp_path, logger, 'migrated boot', storage_budget=500)
+    assert manager.active_cycle == 2
+    assert manager.retired_cycles() == [1]
+    assert not (tmp_path / 'cycle_log0').exists()
+    assert (tmp_path / 'cycle_log1' / 'map.log.gz').exists()
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+from METAR import METAR
+from METAR.history import METAR_History_Store
+from METAR.clock import Virtual_Clock
+
+NOW = datetime.now(timezone.utc).replace(minute=53, second=0, microsecond=0) - timedelta(hours=1)
+FLIGHT_CATEGORIES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+
+def observation(station: str, hours_ago: int, flight_category: str = 'VFR') -> METAR:
+    return METAR(station=station, raw_text=f'{station} {hours_ago}', observation_time=NOW - timedelta(hours=hours_ago),
+                 flight_category=flight_category, wind_speed_kt=10, wind_dir_degrees='VRB')
+
+def test_deduplicated_batched_history(tmp_path):
+    with METAR_History_Store(tmp_path / 'history.db') as store:
+        retrieval = {'KOSH': observation('KOSH', 1), 'KMKE': observation('KMKE', 1), 'KSLE': None}
+        assert store.record(retrieval) == 2
+        # The same observations retrieved again are not queued
+        assert store.record(retrieval) == 0
+        store.record({'KOSH': observation('KOSH', 0, 'IFR'), 'KMKE': observation('KMKE', 1)})
+        store.flush()
+        assert store.count() == 3
+
+        latest = store.latest('KOSH', 5)
+        assert [metar.flight_category for metar in latest] == ['IFR', 'VFR']
+        assert latest[0].observation_time == NOW
+        assert latest[0].wind_dir_degrees == 'VRB'
+        assert list(store.latest_per_station(1)) == ['KMKE', 'KOSH']
+        assert store.category_transitions(NOW - timedelta(hours=2), NOW) == [('KOSH', NOW, 'VFR', 'IFR')]
+
+    # Duplicates across restarts are ignored by the database
+    with METAR_History_Store(tmp_path / 'history.db') as store:
+        store.record({'KOSH': observation('KOSH', 0, 'IFR')})
+        store.flush()
+        assert store.count() == 3
+
+def test_retention(tmp_path):
+    with METAR_History_Store(tmp_path / 'history.db', retention=timedelta(days=1), retention_check_interval=0) as store:
+        store.record({'KOSH': observation('KOSH', 48)})
+        store.flush()
+        store.record({'KOSH': observation('KOSH', 1)})
+        store.flush()
+        assert [metar.raw_text for metar in store.latest('KOSH', 10)] == ['KOSH 1']
+
+def test_retention_on_the_clock(tmp_path):
+    # Two days on, by the store's clock, the observation of an hour ago is past the retention
+    clock = Virtual_Clock(NOW + timedelta(days=2))
+    with METAR_History_Store(tmp_path / 'history.db', retention=timedelta(days=1), retention_check_interval=0,
+                             clock=clock) as store:
+        store.record({'KOSH': observation('KOSH', 1)})
+        store.flush()
+        assert store.count() == 0
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+from METAR import METAR
+from METAR.snapshot import write_snapshot, read_snapshot
+from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+
+def sample_metar(station: str) -> METAR:
+    metar = METAR(station=station, raw_text=f'{station} 191753Z 27015G25KT 10SM FEW043 12/03 A2992',
+                  observation_time=datetime(2026, 10, 19, 17, 53, tzinfo=timezone.utc), flight_category='VFR',
+                  wind_speed_kt=15, wind_gust_kt=25, temp_c=12.0, dewpoint_c=3.0, wx_string='-TSRA')
+    metar.add_sky_condition('FEW', '4300')
+    return metar
+
+def test_metar_dict_round_trip():
+    metar = sample_metar('KOSH')
+    restored = METAR.from_dict(metar.to_dict())
+    assert restored.to_dict() == metar.to_dict()
+    assert restored.observation_time == metar.observation_time
+    assert restored.sky_condition == [{'sky_cover': 'FEW', 'cloud_base_ft_agl': 4300}]
+    assert restored.dewpoint_c == 3.0
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / 'snapshot.jsonl'
+    write_snapshot(path, {'KOSH': sample_metar('KOSH'), 'KMKE': None})
+    taken, metar_data = read_snapshot(path)
+    assert datetime.now(timezone.utc) - taken < timedelta(seconds=5)
+    assert metar_data['KMKE'] is None
+    assert metar_data['KOSH'].raw_text == sample_metar('KOSH').raw_text
+    assert [item.name for item in tmp_path.iterdir()] == ['snapshot.jsonl']
+
+    path.write_text('{"version": 1, "taken": "2026-10-19T17:53:00+00:00"}\n{"station": "KOSH", "met')
+    assert read_snapshot(path) is None
+    assert read_snapshot(tmp_path / 'missing.jsonl') is None
+
+def test_thread_warm_start(tmp_path):
+    path = tmp_path / 'snapshot.jsonl'
+    write_snapshot(path, {'KOSH': sample_metar('KOSH'), 'KSLE': sample_metar('KSLE')},
+                   taken=datetime.now(timezone.utc) - timedelta(minutes=20))
+
+    thread = Aviation_Weather_METAR_Thread(stations=['KOSH', 'KMKE'], stale_data_time=timedelta(minutes=90),
+                                           wait_to_run=True, snapshot_path=path)
+    assert thread.new_metar_data
+    assert thread.live_metar_data['KOSH'].flight_category == 'VFR'
+    assert thread.live_metar_data['KMKE'] is None
+    assert 'KSLE' not in thread.live_metar_data
+    assert not thread._check_for_stale_data()
+
+    # Persisting is rate limited
+    assert thread._persist_snapshot()
+    assert not thread._persist_snapshot()
+
+    # Too old to show
+    write_snapshot(path, {'KOSH': sample_metar('KOSH')}, taken=datetime.now(timezone.utc) - timedelta(minutes=20))
+    thread = Aviation_Weather_METAR_Thread(stations=['KOSH'], stale_data_time=timedelta(minutes=10),
+                                           wait_to_run=True, snapshot_path=path)
+    assert not thread.new_metar_data
+    assert thread.live_metar_data is None
@@ -0,0 +1,116 @@
+import re
+import urllib.request
+from datetime import timedelta
+
+from METAR import METAR
+from METAR.aviation_weather_metar import METAR_Fetch_Stats
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.Metrics import Metrics_Registry, Metrics_Server, Main_Loop_Collector, METAR_Source_Collector
+
+METRIC_NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"'
+SAMPLE_LINE = re.compile(rf'^({METRIC_NAME})(\{{{LABEL}(?:,{LABEL})*\}})? (-?[0-9.e+-]+|NaN|[+-]Inf)$')
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+class Fetching_Source(Demo_METAR_Source):
+    """Demo source that also carries retrieval statistics"""
+    def __init__(self, demo_data, update_interval):
+        super().__init__(demo_data, update_interval)
+        self.fetch_stats = METAR_Fetch_Stats()
+        self.fetch_stats.attempts = 3
+        self.fetch_stats.successes = 2
+        self.fetch_stats.bytes_downloaded = 4096
+        self.fetch_stats.stations_missing = 1
+
+class Counting_LED_Driver:
+    """LED_DRIVER stand-in that accepts whole frames"""
+    is_valid = True
+    def __init__(self):
+        self.frames = 0
+    def update_LED(self, index, color):
+        pass
+    def update_frame(self, framebuffer):
+        self.frames += 1
+    def show(self):
+        pass
+    def close(self):
+        pass
+
+def parse_exposition(text: str) -> dict[str, dict]:
+    """Validate the Prometheus text format, returns {family: {'type': ..., 'samples': [(name, labels, value)]}}"""
+    families: dict[str, dict] = {}
+    current = None
+    assert text.endswith('\n')
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            name = line.split(' ')[2]
+            assert name not in families, f'family declared twice: {name}'
+            current = families[name] = {'type': None, 'samples': []}
+        elif line.startswith('# TYPE '):
+            _, _, name, metric_type = line.split(' ')
+            assert metric_type in ('counter', 'gauge', 'histogram')
+            families[name]['type'] = metric_type
+        else:
+            match = SAMPLE_LINE.match(line)
+            assert match, f'invalid sample line: {line}'
+            name, labels, value = match.groups()
+            assert current is not None and name.startswith(list(families)[-1])
+            current['samples'].append((name, dict(LABEL_PAIR.findall(labels or '')), float(value)))
+    return families
+
+def test_scrape():
+    demo_data = {'KMKE': METAR(station='KMKE', flight_category='VFR', raw_text='KMKE ')}
+    source = Fetching_Source(demo_data, timedelta(minutes=15))
+    main_loop = MainLoop(METAR_MAP_Config(name='metrics_map', station_map={'KMKE': range(0, 4)}, metar_source=source,
+                                          led_driver=Counting_LED_Driver()))
+    for _ in range(10):
+        main_loop.loop()
+
+    registry = Metrics_Registry()
+    registry.register(Main_Loop_Collector(main_loop))
+    registry.register(METAR_Source_Collector(source))
+    with Metrics_Server(registry, port=0) as server:
+        host, port = server.address
+        with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            families = parse_exposition(response.read().decode('utf-8'))
+
+    assert families['metarmap_frames_total']['samples'] == [('metarmap_frames_total', {'map': 'metrics_map'}, 10.0)]
+    assert families['metarmap_pixels_pushed_total']['samples'][0][2] == 4.0
+    assert families['metarmap_fetch_attempts_total']['samples'][0][2] == 3.0
+    assert families['metarmap_stations_missing']['samples'][0][2] == 1.0
+    assert 'metarmap_data_age_seconds' in families
+
+    histogram = families['metarmap_frame_time_seconds']
+    assert histogram['type'] == 'histogram'
+    buckets = [sample for sample in histogram['samples'] if sample[0].endswith('_bucket')]
+    counts = [value for _, _, value in buckets]
+    assert counts == sorted(counts)
+    assert buckets[-1][1]['le'] == '+Inf'
+    count = [value for name, _, value in histogram['samples'] if name.endswith('_count')]
+    assert count == [buckets[-1][2]] == [10.0]
+
+def test_scrapers_see_the_same_counters():
+    demo_data = {'KMKE': METAR(station='KMKE', flight_category='VFR', raw_text='KMKE ')}
+    main_loop = MainLoop(METAR_MAP_Config(name='scraped', station_map={'KMKE': 0},
+                                          metar_source=Demo_METAR_Source(demo_data, timedelta(minutes=15))))
+    registry = Metrics_Registry()
+    registry.register(Main_Loop_Collector(main_loop))
+    for _ in range(3):
+        main_loop.loop()
+    # Nothing is kept between scrapes, a second scraper gets the same values, the rate is left to Prometheus
+    first, second = parse_exposition(registry.render()), parse_exposition(registry.render())
+    assert first['metarmap_frames_total'] == second['metarmap_frames_total']
+    assert first['metarmap_frames_total']['samples'][0][2] == 3.0
+    assert 'metarmap_frame_rate' not in first
+
+def test_families_merge_across_maps():
+    demo_data = {'KMKE': METAR(station='KMKE', flight_category='VFR', raw_text='KMKE ')}
+    registry = Metrics_Registry()
+    for name in ('first', 'second'):
+        main_loop = MainLoop(METAR_MAP_Config(name=name, station_map={'KMKE': 0},
+                                              metar_source=Demo_METAR_Source(demo_data, timedelta(minutes=15))))
+        registry.register(Main_Loop_Collector(main_loop))
+    families = parse_exposition(registry.render())
+    assert [labels['map'] for _, labels, _ in families['metarmap_frames_total']['samples']] == ['first', 'second']
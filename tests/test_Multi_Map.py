@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+from METAR import METAR
+from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+from METAR.clock import Virtual_Clock
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.synthetic import Synthetic_METAR_Population
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.Multi_Map import Shared_METAR_Source, Frame_Scheduler, station_union
+
+START = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+class Manual_METAR_Source:
+    """Upstream stand-in, fetch() publishes one snapshot of every station in a flight category"""
+
+    def __init__(self, stations: list[str]):
+        self.stations = stations
+        self.data_is_stale = False
+        self.is_running = True
+        self.new_metar_data = False
+        self.live_metar_data = None
+
+    def fetch(self, category: str) -> None:
+        self.live_metar_data = {
+            station_id: METAR(station=station_id, flight_category=category, raw_text=f'{station_id} ')
+            for station_id in self.stations
+        }
+        self.new_metar_data = True
+
+def build_maps(shared: Shared_METAR_Source, station_maps: list[dict[str, int]]) -> list[MainLoop]:
+    return [MainLoop(METAR_MAP_Config(name=f'map{n}', station_map=station_map, metar_source=shared.view(station_map)))
+            for n, station_map in enumerate(station_maps)]
+
+def test_station_union():
+    assert station_union([{'A': 0, 'B': 1}, {'B': 0, 'C': 1}, ['C', 'D']]) == ['A', 'B', 'C', 'D']
+
+def test_shared_source_fans_out_to_every_map():
+    clock = Virtual_Clock(START)
+    population = Synthetic_METAR_Population(6, start=START)
+    a, b, c, d, e, f = population.station_ids
+    station_maps = [{a: 0, b: 1, c: 2}, {a: 0, d: 1}, {d: 2, e: 3, f: 4}]
+    with METAR_Fixture_Server(population) as server:
+        upstream = Aviation_Weather_METAR_Thread(stations=station_union(station_maps), update_interval=timedelta(minutes=15),
+                                                 wait_to_run=True, base_url=server.base_url, clock=clock)
+        shared = Shared_METAR_Source(upstream)
+        main_loops = build_maps(shared, station_maps)
+
+        upstream.loop()
+        scheduler = Frame_Scheduler(main_loops, frame_rate=None)
+        scheduler.run(frames=3)
+
+        # One upstream request for the distinct stations serves every map
+        assert server.requests == 1
+        colors = {}
+        for main_loop in main_loops:
+            for station in main_loop.stations:
+                assert station.active_color is not None
+                assert colors.setdefault(station.id, station.active_color.RGB) == station.active_color.RGB
+        assert sorted(colors) == sorted(population.station_ids)
+
+        # A new retrieval reaches every map exactly once
+        with server.population_lock:
+            population.advance(timedelta(minutes=16))
+        clock.advance(timedelta(minutes=16))
+        upstream.loop()
+        assert server.requests == 2
+        views = [main_loop.config.metar_source for main_loop in main_loops]
+        assert all(view.new_metar_data for view in views)
+        scheduler.step()
+        assert not any(view.new_metar_data for view in views)
+        assert server.requests == 2
+
+def test_views_only_hold_their_stations():
+    upstream = Manual_METAR_Source(['A', 'B', 'C'])
+    shared = Shared_METAR_Source(upstream)
+    view = shared.view(['A', 'C'])
+    upstream.fetch('VFR')
+    assert list(view.live_metar_data) == ['A', 'C']
+    # Clearing entries in one map's state leaves the shared snapshot untouched
+    view.live_metar_data['A'] = METAR()
+    assert shared.snapshot['A'].flight_category == 'VFR'
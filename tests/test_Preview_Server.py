@@ -0,0 +1,90 @@
+import http.client
+
+from metarmap.Preview_Server import Preview_Server
+from metarmap.Framebuffer import frame_delta
+
+def read_event(response: http.client.HTTPResponse) -> tuple[str, str]:
+    """Read one Server-Sent Event, skipping keepalive comments"""
+    event, data = '', ''
+    while True:
+        line = response.fp.readline().decode('ascii').rstrip('\n')
+        if line == '':
+            if event:
+                return event, data
+            continue
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: '):
+            data = line[len('data: '):]
+
+def open_stream(server: Preview_Server) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+    host, port = server.address
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request('GET', '/events')
+    return connection, connection.getresponse()
+
+def test_frame_delta():
+    previous = bytes(300)
+    current = bytearray(previous)
+    current[3:6] = b'\xff\x00\x00'
+    current[297:300] = b'\x00\x00\x10'
+    assert frame_delta(previous, bytes(current)) == [(1, b'\xff\x00\x00'), (99, b'\x00\x00\x10')]
+    assert frame_delta(previous, previous) == []
+
+def test_keyframe_then_delta():
+    with Preview_Server(port=0, keepalive_interval=0.2) as server:
+        frame = bytearray(30)
+        server.publish(1, frame)
+        connection, response = open_stream(server)
+        assert response.status == 200
+        assert response.getheader('Content-Type') == 'text/event-stream'
+
+        assert read_event(response) == ('keyframe', f'1 {bytes(30).hex()}')
+
+        frame[6:9] = b'\x00\xff\x00'
+        server.publish(2, frame)
+        assert read_event(response) == ('delta', '2 2:00ff00')
+        connection.close()
+
+def test_slow_client_frames_are_coalesced():
+    with Preview_Server(port=0, keepalive_interval=0.2) as server:
+        frame = bytearray(300)
+        server.publish(1, frame)
+        connection, response = open_stream(server)
+        read_event(response)
+
+        # Several frames land before the client reads, it only receives the newest state
+        for frame_id in range(2, 12):
+            frame[0:3] = bytes((frame_id, 0, 0))
+            server.publish(frame_id, frame)
+        event, data = read_event(response)
+        frame_id, changes = data.split(' ')
+        assert event == 'delta'
+        assert int(frame_id) >= 2
+        # Either the final frame, or an intermediate one followed by the final one
+        while frame_id != '11':
+            event, data = read_event(response)
+            frame_id, changes = data.split(' ')
+        assert changes == '0:0b0000'
+        connection.close()
+
+def test_max_clients():
+    with Preview_Server(port=0, max_clients=1, keepalive_interval=0.2) as server:
+        server.publish(1, bytes(3))
+        first_connection, first_response = open_stream(server)
+        read_event(first_response)
+
+        second_connection, second_response = open_stream(server)
+        assert second_response.status == 503
+        second_connection.close()
+        first_connection.close()
+
+def test_index_page():
+    with Preview_Server(port=0) as server:
+        host, port = server.address
+        connection = http.client.HTTPConnection(host, port, timeout=5)
+        connection.request('GET', '/')
+        response = connection.getresponse()
+        assert response.status == 200
+        assert b'EventSource' in response.read()
+        connection.close()
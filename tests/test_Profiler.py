@@ -0,0 +1,71 @@
+import os
+import signal
+import threading
+from datetime import timedelta
+
+import pytest
+
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.Profiler import Profiler_Config, Sampling_Profiler, Stack_Sampler
+
+def busy_render_work(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_stack_sampler_sees_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_render_work, args=(stop,), name='render')
+    worker.start()
+    try:
+        sampler = Stack_Sampler(interval=0.001)
+        sampler.run(0.2)
+    finally:
+        stop.set()
+        worker.join()
+    assert sampler.samples > 10
+    threads = sampler.thread_summary()
+    assert threads['render'] >= sampler.samples*0.9
+    # The sampling thread itself is left out
+    assert threading.current_thread().name not in threads
+
+    collapsed = sampler.collapsed()
+    assert any(line.startswith('render;') and 'test_Profiler.py:busy_render_work' in line for line in collapsed)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed)
+    functions = {label: (self_count, total) for label, self_count, total in sampler.function_summary()}
+    assert functions['test_Profiler.py:busy_render_work'][1] >= sampler.samples*0.9
+
+def test_profile_written_on_signal(tmp_path):
+    if not hasattr(signal, 'SIGUSR1'):
+        pytest.skip('SIGUSR1 is not available on this platform')
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_render_work, args=(stop,), name='render')
+    worker.start()
+    main_loop = MainLoop(METAR_MAP_Config('profiled', metar_source=Demo_METAR_Source({}, timedelta(minutes=15)),
+                                          profiler_config=Profiler_Config(enabled=True, duration=0.2, interval=0.002,
+                                                                          output_directory=tmp_path)))
+    try:
+        profiler = main_loop.profiler
+        assert not profiler.is_profiling and profiler.last_result is None
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert profiler.is_profiling
+        # A second signal during a profile is ignored
+        assert not profiler.start()
+        assert profiler.wait(5)
+    finally:
+        stop.set()
+        worker.join()
+        main_loop.close()
+    assert signal.getsignal(signal.SIGUSR1) is signal.SIG_DFL
+
+    result = profiler.last_result
+    assert result.samples > 10
+    assert result.collapsed_path.parent == tmp_path
+    assert 'busy_render_work' in result.collapsed_path.read_text()
+    summary = result.summary_path.read_text()
+    assert 'render' in summary and 'test_Profiler.py:busy_render_work' in summary
+
+def test_profiler_disabled_by_default():
+    main_loop = MainLoop(METAR_MAP_Config('unprofiled', metar_source=Demo_METAR_Source({}, timedelta(minutes=15))))
+    assert main_loop.profiler is None
+    assert Sampling_Profiler(Profiler_Config(signal_name='SIGNOTREAL')).install() is False
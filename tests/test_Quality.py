@@ -0,0 +1,108 @@
+import logging
+from datetime import timedelta, time, datetime, timezone
+
+import pytest
+
+from METAR import METAR
+from METAR.clock import Virtual_Clock
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_Map_Config import Day_Night_Dimming_Config, Wind_Animation_Config, Lightning_Animation_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.Metrics import Main_Loop_Collector
+from metarmap.Quality import Quality_Config, Quality_Controller, QUALITY_LEVELS
+
+def test_controller_degrades_and_restores(caplog):
+    controller = Quality_Controller(Quality_Config(enabled=True, frame_budget=0.01, window=10))
+    with caplog.at_level(logging.INFO):
+        # One window with more than 10% of frames over budget degrades a level
+        assert not any(controller.record(20_000_000) for _ in range(9))
+        assert controller.record(20_000_000)
+        assert controller.level == 1
+        # Overruns within tolerance hold the level
+        assert not any([controller.record(20_000_000)] + [controller.record(4_000_000) for _ in range(9)])
+        # Headroom in three windows in a row restores it
+        changes = [controller.record(1_000_000) for _ in range(30)]
+    assert changes.count(True) == 1 and changes[-1]
+    assert controller.level == 0 and controller.changes == 2
+    assert [record.levelno for record in caplog.records] == [logging.WARNING, logging.INFO]
+    assert 'full -> skip_static' in caplog.records[0].getMessage()
+
+    # The level never passes max_level
+    for _ in range(100):
+        controller.record(20_000_000)
+    assert controller.level_name == QUALITY_LEVELS[-1]
+    with pytest.raises(ValueError):
+        Quality_Controller(Quality_Config(max_level=len(QUALITY_LEVELS)))
+
+def build_main_loop(clock: Virtual_Clock, **config) -> tuple[MainLoop, Demo_METAR_Source]:
+    metars = {
+        'KOSH': METAR(station='KOSH', raw_text='KOSH 011200Z', flight_category='VFR', wind_speed_kt=3),
+        'KMKE': METAR(station='KMKE', raw_text='KMKE 011200Z', flight_category='IFR', wind_speed_kt=5),
+        'KMSN': METAR(station='KMSN', raw_text='KMSN 011200Z', flight_category='VFR', wind_speed_kt=25),
+        'KUES': METAR(station='KUES', raw_text='KUES 011200Z TS', flight_category='MVFR', wind_speed_kt=5),
+    }
+    source = Demo_METAR_Source(metars, timedelta(days=1))
+    main_loop = MainLoop(METAR_MAP_Config('quality', metar_source=source, station_map={station_id: index for index, station_id in enumerate(metars)},
+                                          day_night_dimming_config=Day_Night_Dimming_Config(True, 0.5, bright_time_start=time(6),
+                                                                                            dim_time_start=time(21)),
+                                          wind_animation_config=Wind_Animation_Config(enabled=True),
+                                          lightning_animation_config=Lightning_Animation_Config(enabled=True), **config),
+                         clock=clock)
+    return main_loop, source
+
+def test_main_loop_steps_through_levels():
+    clock = Virtual_Clock(datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+    # Every frame overruns a 1 ns budget, each window of 5 frames degrades a level
+    main_loop, _ = build_main_loop(clock, quality_config=Quality_Config(enabled=True, frame_budget=1e-9, window=5))
+    for _ in range(5*len(QUALITY_LEVELS)):
+        main_loop.loop()
+    assert main_loop.quality_level == len(QUALITY_LEVELS) - 1
+    assert main_loop._lightning_cycle_manager.burst_resolution == 0.5
+
+    families = {family.name: family for family in Main_Loop_Collector(main_loop)()}
+    assert families['metarmap_quality_level'].render()[-1] == 'metarmap_quality_level{map="quality"} 3'
+
+    main_loop._apply_quality_level(0)
+    assert main_loop._lightning_cycle_manager.burst_resolution == 1.0
+
+def test_degraded_levels_skip_recomputation(monkeypatch):
+    clock = Virtual_Clock(datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+    main_loop, source = build_main_loop(clock)
+    computed = []
+    process_flight_category = main_loop._process_flight_category
+    def counting_process_flight_category(station_metar):
+        computed.append(station_metar.station)
+        return process_flight_category(station_metar)
+    monkeypatch.setattr(main_loop, '_process_flight_category', counting_process_flight_category)
+
+    def frame() -> list[str]:
+        computed.clear()
+        main_loop.loop()
+        clock.advance(0.05)
+        return sorted(computed)
+
+    # Full quality recomputes every station, and learns which ones blink
+    assert frame() == ['KMKE', 'KMSN', 'KOSH', 'KUES']
+    assert [station.dynamic for station in main_loop.stations] == [False, False, True, True]
+    assert frame() == ['KMKE', 'KMSN', 'KOSH', 'KUES']
+
+    # Static stations are skipped until the METAR data or the dimming changes
+    main_loop._apply_quality_level(1)
+    assert frame() == ['KMKE', 'KMSN', 'KOSH', 'KUES']
+    static_colors = [station.active_color for station in main_loop.stations[:2]]
+    assert frame() == ['KMSN', 'KUES']
+    source.new_metar_data = True
+    assert frame() == ['KMKE', 'KMSN', 'KOSH', 'KUES']
+    assert frame() == ['KMSN', 'KUES']
+    # Fixed dimming times are local
+    night = clock.now().astimezone().replace(hour=22)
+    clock.advance_to(night if night > clock.now() else night + timedelta(days=1))
+    assert frame() == ['KMKE', 'KMSN', 'KOSH', 'KUES']
+    assert main_loop.dimming_active
+    assert [station.active_color for station in main_loop.stations[:2]] != static_colors
+
+    # Blinking stations alternate frames
+    main_loop._apply_quality_level(3)
+    frame()
+    assert frame() in (['KMSN'], ['KUES'])
+    assert sorted(frame() + frame()) == ['KMSN', 'KUES']
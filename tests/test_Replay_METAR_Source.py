@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from METAR import METAR
+from METAR.clock import Virtual_Clock
+from METAR.recording import METAR_Recorder, read_recording, Recording_Format_Error
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_SOURCE import Replay_METAR_Source
+
+START = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+FLIGHT_CATEGORIES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+
+def record_day(path, stations: int = 3, interval: timedelta = timedelta(minutes=15), count: int = 96):
+    with METAR_Recorder(path) as recorder:
+        for n in range(count):
+            recorder.record({f'K{station:03d}': METAR(station=f'K{station:03d}', raw_text=f'snapshot {n}',
+                                                      flight_category=FLIGHT_CATEGORIES[(n + station) % 4])
+                             for station in range(stations)}, taken=START + n*interval)
+
+def test_recording_round_trip(tmp_path):
+    path = tmp_path / 'day.rec'
+    record_day(path, count=4)
+    # Appending continues the same recording
+    with METAR_Recorder(path) as recorder:
+        recorder.record({'K000': None}, taken=START + timedelta(hours=1))
+    snapshots = list(read_recording(path))
+    assert [snapshot.taken for snapshot in snapshots] == [START + timedelta(minutes=15*n) for n in range(5)]
+    assert snapshots[2]['K001'].raw_text == 'snapshot 2'
+    assert snapshots[4]['K000'] is None
+
+    # A record cut short ends the recording
+    path.write_bytes(path.read_bytes()[:-10])
+    assert len(list(read_recording(path))) == 4
+    (tmp_path / 'other.rec').write_bytes(b'not a recording')
+    with pytest.raises(Recording_Format_Error):
+        list(read_recording(tmp_path / 'other.rec'))
+
+def test_replay_protocol(tmp_path):
+    path = tmp_path / 'day.rec'
+    record_day(path, count=4)
+    clock = Virtual_Clock(START)
+    # One minute of recording per second
+    source = Replay_METAR_Source(path, speedup=60, stale_data_time=timedelta(minutes=30), clock=clock)
+
+    assert source.new_metar_data
+    assert source.live_metar_data['K000'].raw_text == 'snapshot 0'
+    source.new_metar_data = False
+    clock.advance(10.0)
+    assert not source.new_metar_data
+
+    # 15 minutes in, the second snapshot
+    clock.advance(5.0)
+    assert source.new_metar_data
+    assert source.live_metar_data['K000'].raw_text == 'snapshot 1'
+    source.new_metar_data = False
+
+    # Passing two snapshots within one poll presents the newest
+    clock.advance(30.0)
+    assert source.new_metar_data
+    assert source.live_metar_data['K000'].raw_text == 'snapshot 3'
+    assert source.snapshots_skipped == 1
+    assert source.finished
+    assert not source.data_is_stale
+
+    # Nothing newer in the recording, the data goes stale
+    clock.advance(31.0)
+    assert source.data_is_stale
+    assert source.live_metar_data is None
+    source.close()
+
+def test_replay_a_day_through_the_main_loop(tmp_path):
+    path = tmp_path / 'day.rec'
+    record_day(path)
+    clock = Virtual_Clock(START)
+    source = Replay_METAR_Source(path, speedup=1440, clock=clock)
+    main_loop = MainLoop(METAR_MAP_Config('replay', metar_source=source, station_map={'K000': 0, 'K001': 1, 'K002': 2}),
+                         clock=clock)
+
+    # A day in a minute, rendered at 10 frames per second
+    categories_seen = set()
+    for _ in range(600):
+        main_loop.loop()
+        clock.advance(0.1)
+        categories_seen.add(main_loop.get_METAR_of_station('K000').flight_category)
+    assert source.finished
+    assert source.snapshots_presented + source.snapshots_skipped == 96
+    assert categories_seen == set(FLIGHT_CATEGORIES)
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from METAR.clock import Virtual_Clock
+from METAR.synthetic import Synthetic_METAR_Population
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_Map_Config import Wind_Animation_Config, Lightning_Animation_Config
+from metarmap.METAR_SOURCE import Synthetic_METAR_Source
+from metarmap.Soak import Soak_Harness, is_sustained_growth, growth_per_day, site_category
+
+START = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+def build_map(clock: Virtual_Clock, station_count: int = 20) -> MainLoop:
+    population = Synthetic_METAR_Population(station_count, start=clock.now())
+    source = Synthetic_METAR_Source(population, clock=clock)
+    config = METAR_MAP_Config('soak', metar_source=source,
+                              station_map={station_id: index for index, station_id in enumerate(population.station_ids)},
+                              wind_animation_config=Wind_Animation_Config(enabled=True),
+                              lightning_animation_config=Lightning_Animation_Config(enabled=True))
+    return MainLoop(config, clock=clock)
+
+def soak(main_loop: MainLoop, clock: Virtual_Clock) -> Soak_Harness:
+    return Soak_Harness(main_loop, clock, duration=timedelta(days=4), frame_interval=timedelta(minutes=5),
+                        sample_interval=timedelta(hours=3), warmup=timedelta(hours=12))
+
+def test_growth_detection():
+    days = [n*86400.0 for n in range(8)]
+    assert growth_per_day(days, [1000*n for n in range(8)]) == pytest.approx(1000)
+    assert is_sustained_growth(days, [1000*n for n in range(8)], 500)
+    # A single step up (a cache filling) is not sustained growth
+    assert not is_sustained_growth(days, [0, 0, 0, 0, 0, 0, 0, 8000], 500)
+    assert not is_sustained_growth(days[:3], [0, 1000, 2000], 500)
+    assert site_category('/src/METAR/METAR.py') == 'METAR'
+    assert site_category('/src/metarmap/RGB_color.py') == 'RGB_color'
+    assert site_category('/lib/python3.11/logging/__init__.py') == 'logging'
+
+def test_soak_passes_without_leaks():
+    clock = Virtual_Clock(START)
+    result = soak(build_map(clock), clock).run()
+    assert result.passed, result.summary()
+    assert result.virtual_duration_s == 4*86400
+    assert len(result.samples) >= 28
+    assert all(sample.rss_bytes is None or sample.rss_bytes > 0 for sample in result.samples)
+    assert result.to_dict()['passed']
+    assert 'Soak PASSED' in result.summary()
+
+def test_soak_finds_a_leak():
+    clock = Virtual_Clock(START)
+    main_loop = build_map(clock)
+    # Keep a copy of every frame, like a preview that never drops its history
+    history = []
+    main_loop.add_frame_listener(lambda frame_id, framebuffer: history.append(bytes(framebuffer)*20))
+    # Frames are only published when a station changed, change one every frame
+    original_update = main_loop._update_LEDs
+    def update_every_frame():
+        main_loop.stations[0].updated = True
+        original_update()
+    main_loop._update_LEDs = update_every_frame
+
+    result = soak(main_loop, clock).run()
+    assert not result.passed
+    assert result.traced_growth_sustained
+    assert result.top_sites[0].location.startswith(__file__)
+    assert 'FAILED' in result.summary()
@@ -0,0 +1,115 @@
+import io
+import re
+
+import pytest
+
+import metarmap     # Before LED_Control, which imports from metarmap
+from LED_Control import Terminal_LED_Driver as terminal
+from LED_Control.Terminal_LED_Driver import Terminal_LED_Driver, Terminal_LED_Driver_Config, positions_from_METARs
+from METAR import METAR
+from metarmap.RGB_color import RGB_color
+
+CELL = re.compile(r'\x1b\[(\d+);(\d+)H(?:\x1b\[38;2;(\d+);(\d+);(\d+)m)?██')
+
+class Fake_Time:
+    """Stands in for perf_counter in the driver module"""
+    def __init__(self):
+        self.now = 100.0
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake_time = Fake_Time()
+    monkeypatch.setattr(terminal, 'perf_counter', fake_time)
+    return fake_time
+
+def drawn_cells(output: str) -> list[tuple]:
+    """(row, column, color) of every cell written, 1 based terminal coordinates, None where the color carried over"""
+    return [(int(row), int(column), (int(r), int(g), int(b)) if r else None)
+            for row, column, r, g, b in CELL.findall(output)]
+
+def test_only_changed_cells_are_redrawn(fake_time):
+    stream = io.StringIO()
+    driver = Terminal_LED_Driver(Terminal_LED_Driver_Config(led_count=6, columns=3, stream=stream))
+    for index in range(6):
+        driver.update_LED(index, RGB_color(0, 255, 0))
+    driver.show()
+    first = stream.getvalue()
+    assert first.startswith('\x1b[?25l\x1b[2J')
+    # Neighbouring cells of the same color share one color sequence
+    assert drawn_cells(first) == [(1, 1, (0, 255, 0)), (1, 3, None), (1, 5, None), (2, 1, None), (2, 3, None), (2, 5, None)]
+
+    stream.seek(0)
+    stream.truncate()
+    fake_time.now += 1
+    driver.update_LED(1, RGB_color(0, 255, 0))      # Unchanged
+    driver.update_LED(4, RGB_color(255, 0, 0))
+    driver.show()
+    assert drawn_cells(stream.getvalue()) == [(2, 3, (255, 0, 0))]
+
+    # A cell changed and changed back before a redraw is not drawn
+    stream.seek(0)
+    stream.truncate()
+    fake_time.now += 1
+    driver.update_LED(0, RGB_color(0, 0, 255))
+    driver.update_LED(0, RGB_color(0, 255, 0))
+    driver.show()
+    assert stream.getvalue() == ''
+
+    # Frames go through the same delta
+    frame = bytearray(6*3)
+    for index in range(6):
+        frame[index*3:index*3 + 3] = bytes(driver._colors[index])
+    frame[0:3] = bytes((0, 0, 255))
+    fake_time.now += 1
+    driver.update_frame(frame)
+    driver.show()
+    assert drawn_cells(stream.getvalue()) == [(1, 1, (0, 0, 255))]
+    color = driver.LED_index_colors[0]
+    assert (color.r, color.g, color.b) == (0, 0, 255)
+
+def test_refresh_rate_cap(fake_time):
+    stream = io.StringIO()
+    driver = Terminal_LED_Driver(Terminal_LED_Driver_Config(led_count=2, max_refresh_rate=10, stream=stream))
+    driver.show()
+    writes = len(stream.getvalue())
+
+    # Within the 100 ms interval changes are held back, then drawn together
+    fake_time.now += 0.05
+    driver.update_LED(0, RGB_color(255, 0, 0))
+    driver.show()
+    fake_time.now += 0.04
+    driver.update_LED(1, RGB_color(0, 0, 255))
+    driver.show()
+    assert len(stream.getvalue()) == writes
+    fake_time.now += 0.02
+    driver.show()
+    assert drawn_cells(stream.getvalue()[writes:]) == [(1, 1, (255, 0, 0)), (1, 3, (0, 0, 255))]
+
+def test_layout_by_position(fake_time):
+    stream = io.StringIO()
+    # North-west, south-east, and a station on the same cell as the first, one LED without a position
+    positions = {0: (44.0, -90.0), 1: (42.0, -88.0), 2: (44.0, -90.0)}
+    driver = Terminal_LED_Driver(Terminal_LED_Driver_Config(led_count=4, pixel_positions=positions, grid_width=5,
+                                                            grid_height=3, columns=2, stream=stream))
+    assert driver._cells == [(0, 0), (2, 4), (0, 1), (4, 0)]
+    driver.show()
+    assert [(row, column) for row, column, _ in drawn_cells(stream.getvalue())] == [(1, 1), (3, 9), (1, 3), (5, 1)]
+
+    driver.close()
+    assert stream.getvalue().endswith('\x1b[?25h\n')
+    assert not driver.is_valid
+
+def test_stats_overlay(fake_time):
+    stream = io.StringIO()
+    driver = Terminal_LED_Driver(Terminal_LED_Driver_Config(led_count=2, columns=2, show_stats=True, stream=stream))
+    for _ in range(3):
+        driver.show()
+        fake_time.now += 0.5
+    assert stream.getvalue().count('frames: ') == 3
+    assert 'fps:    2.0' in stream.getvalue()
+
+def test_positions_from_METARs():
+    metars = {'KMKE': METAR(station='KMKE', latitude=42.95, longitude=-87.9), 'KOSH': METAR(station='KOSH'), 'KMSN': None}
+    assert positions_from_METARs({'KMKE': 3, 'KOSH': 4, 'KMSN': 5}, metars) == {3: (42.95, -87.9)}
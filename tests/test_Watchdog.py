@@ -0,0 +1,106 @@
+import logging
+import socket
+from datetime import timedelta
+
+import pytest
+
+from METAR.clock import Virtual_Clock
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.Watchdog import Watchdog, Watchdog_Config, sd_notify
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='unix sockets are not available')
+
+@pytest.fixture
+def notify_socket(tmp_path):
+    """A unix datagram socket standing in for systemd's NOTIFY_SOCKET"""
+    path = tmp_path / 'notify'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(str(path))
+        sock.settimeout(1)
+        yield sock, str(path)
+
+def received(sock: socket.socket) -> list[str]:
+    messages = []
+    sock.setblocking(False)
+    try:
+        while True:
+            messages.append(sock.recv(4096).decode())
+    except BlockingIOError:
+        pass
+    finally:
+        sock.settimeout(1)
+    return messages
+
+class Fetch_Source(Demo_METAR_Source):
+    """METAR_SOURCE with the liveness of Aviation_Weather_METAR_Thread"""
+    def __init__(self, clock):
+        super().__init__({}, timedelta(minutes=15))
+        self.running = True
+        self.last_loop_time = clock.monotonic()
+    @property
+    def is_running(self) -> bool:
+        return self.running
+
+def test_sd_notify(notify_socket, monkeypatch):
+    sock, path = notify_socket
+    assert sd_notify('WATCHDOG=1', path)
+    assert sock.recv(4096) == b'WATCHDOG=1'
+    monkeypatch.setenv('NOTIFY_SOCKET', path)
+    assert sd_notify('READY=1')
+    assert sock.recv(4096) == b'READY=1'
+    monkeypatch.delenv('NOTIFY_SOCKET')
+    assert not sd_notify('READY=1')
+
+def test_watchdog_pings_only_while_healthy(notify_socket, caplog):
+    sock, path = notify_socket
+    clock = Virtual_Clock()
+    source = Fetch_Source(clock)
+    watchdog = Watchdog(Watchdog_Config(enabled=True, notify_socket=path), metar_source=source, clock=clock)
+
+    clock.advance(5)
+    watchdog.heartbeat(10_000_000)
+    assert watchdog.check()
+    assert received(sock) == ['READY=1', 'WATCHDOG=1']
+
+    # A hung show() stops the frames, the stall dumps every thread's stack once
+    clock.advance(11)
+    with caplog.at_level(logging.WARNING):
+        assert not watchdog.check()
+        assert not watchdog.check()
+    stall_logs = [record for record in caplog.records if 'Stall detected' in record.getMessage()]
+    assert len(stall_logs) == 1 and 'test_watchdog_pings_only_while_healthy' in stall_logs[0].getMessage()
+    assert watchdog.stall_count == 1 and watchdog.stalled
+    assert received(sock) == []
+
+    # Frames resume, one slow frame withholds a single ping
+    watchdog.heartbeat(2_000_000_000)
+    assert not watchdog.check() and not watchdog.stalled
+    watchdog.heartbeat(10_000_000)
+    assert watchdog.check()
+    assert received(sock) == ['WATCHDOG=1']
+
+    # A fetch hung on the network stops the thread's loop heartbeat
+    clock.advance(121)
+    watchdog.heartbeat(10_000_000)
+    assert not watchdog.check()
+    assert watchdog.problems == ['METAR_SOURCE has not looped for 137.0 s']
+    source.last_loop_time = clock.monotonic()
+    assert watchdog.check()
+    source.running = False
+    assert not watchdog.check()
+    assert watchdog.stall_count == 3
+    assert received(sock) == ['WATCHDOG=1']
+
+def test_main_loop_runs_watchdog(notify_socket):
+    sock, path = notify_socket
+    main_loop = MainLoop(METAR_MAP_Config('watched', metar_source=Demo_METAR_Source({}, timedelta(minutes=15)),
+                                          watchdog_config=Watchdog_Config(enabled=True, check_interval=0.01,
+                                                                          notify_socket=path)))
+    try:
+        main_loop.loop()
+        assert sock.recv(4096) == b'READY=1'
+        assert sock.recv(4096) == b'WATCHDOG=1'
+    finally:
+        main_loop.close()
+    assert 'STOPPING=1' in received(sock)
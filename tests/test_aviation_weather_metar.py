@@ -0,0 +1,55 @@
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+from METAR.aviation_weather_metar import Aviation_Weather_METAR, parse_METAR_xml, get_station_list_string
+from METAR.synthetic import Synthetic_METAR_Population
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.clock import Virtual_Clock
+
+TEST_DATA = Path(__file__).parent / 'test_data'
+
+def test_initialize_stations():
+    metar_source = Aviation_Weather_METAR(['KMTW', 'KOSH'])
+    assert metar_source.station_id_list == ['KMTW', 'KOSH']
+    assert Aviation_Weather_METAR().station_id_list == []
+
+def test_updateMETARdata():
+    population = Synthetic_METAR_Population(10)
+    with METAR_Fixture_Server(population) as server:
+        metar_source = Aviation_Weather_METAR(population.station_ids[:5], base_url=server.base_url)
+        assert metar_source.update_METAR_data()
+    assert metar_source._metar_data[population.station_ids[0]].raw_text == population.snapshot()[population.station_ids[0]].raw_text
+    assert metar_source.fetch_stats.successes == 1
+
+def test_last_success_age_on_the_clock():
+    population = Synthetic_METAR_Population(10)
+    clock = Virtual_Clock(datetime(2024, 6, 1, tzinfo=timezone.utc))
+    with METAR_Fixture_Server(population) as server:
+        metar_source = Aviation_Weather_METAR(population.station_ids[:5], base_url=server.base_url, clock=clock)
+        assert metar_source.fetch_stats.last_success_age is None
+        assert metar_source.update_METAR_data()
+    clock.advance(timedelta(minutes=5))
+    assert metar_source.fetch_stats.last_success_age == 300
+
+def test_parseMETARXML():
+    result = parse_METAR_xml((TEST_DATA / 'ADDS_METAR_XML_KMTW_2023_04_18.xml').read_bytes())
+    metar = result['KMTW']
+    assert list(result) == ['KMTW']
+    assert metar.observation_time == datetime(2023, 4, 18, 1, 56, tzinfo=timezone.utc)
+    assert metar.flight_category == 'VFR'
+    assert (metar.wind_dir_degrees, metar.wind_speed_kt, metar.wind_gust_kt) == (300, 14, 21)
+    assert metar.temp_c == -0.6 and metar.dewpoint_c == -3.3
+    assert metar.sky_condition == [{'sky_cover': 'FEW', 'cloud_base_ft_agl': 4300},
+                                   {'sky_cover': 'OVC', 'cloud_base_ft_agl': 6000}]
+
+def test_addStation():
+    metar_source = Aviation_Weather_METAR(['KMTW'])
+    metar_source.add_station('KOSH')
+    assert metar_source.station_id_list == ['KMTW', 'KOSH']
+    assert get_station_list_string(metar_source.station_id_list) == 'KMTW%20KOSH'
+
+def test_removeStation():
+    metar_source = Aviation_Weather_METAR(['KMTW', 'KOSH'])
+    metar_source.remove_station('KMTW')
+    metar_source.remove_station('KSLE')     # Not tracked, ignored
+    assert metar_source.station_id_list == ['KOSH']
@@ -0,0 +1,75 @@
+import json
+import pickle
+from datetime import datetime, timezone
+
+import pytest
+
+from METAR import METAR
+from METAR.binary_snapshot import encode_snapshot, decode_snapshot, Snapshot_Format_Error
+from METAR.snapshot import write_snapshot, read_snapshot
+
+FLIGHT_CATEGORIES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+
+def station_population(count: int) -> dict:
+    """Deterministic METARs for count stations, every 50th station without data"""
+    metar_data = {}
+    for n in range(count):
+        station_id = f'K{n:04d}'
+        if n % 50 == 49:
+            metar_data[station_id] = None
+            continue
+        metar = METAR(station=station_id, raw_text=f'{station_id} 191753Z {n % 36*10:03d}{n % 30:02d}KT 10SM FEW043 12/03 A2992 RMK AO2',
+                      observation_time=datetime(2026, 10, 19, 17, n % 60, tzinfo=timezone.utc),
+                      latitude=40 + n/1000, longitude=-90 - n/1000, temp_c=12.0, dewpoint_c=3.5,
+                      wind_dir_degrees='VRB' if n % 7 == 0 else float(n % 36*10), wind_speed_kt=n % 30,
+                      wind_gust_kt=None if n % 3 else n % 30 + 10, visibility_statute_mi=10.0, altim_in_hg=29.92,
+                      flight_category=FLIGHT_CATEGORIES[n % 4], metar_type='METAR', elevation_m=250.0,
+                      wx_string='-TSRA' if n % 11 == 0 else None)
+        for layer in range(n % 3):
+            metar.add_sky_condition(('FEW', 'SCT', 'BKN')[layer], 4300 + 1000*layer)
+        metar_data[station_id] = metar
+    return metar_data
+
+def as_dicts(metar_data) -> dict:
+    return {station_id: metar.to_dict() if metar is not None else None for station_id, metar in metar_data.items()}
+
+def test_round_trip_all_fields():
+    metar_data = station_population(200)
+    metar_data['KNAV'] = METAR(station='KNAV', observation_time=datetime(2026, 10, 19, 17, 53))
+    taken = datetime(2026, 10, 19, 18, 0, tzinfo=timezone.utc)
+    snapshot = decode_snapshot(encode_snapshot(metar_data, taken))
+    assert snapshot.taken == taken
+    assert list(snapshot) == list(metar_data)
+    assert as_dicts(snapshot) == as_dicts(metar_data)
+    assert snapshot['K0002'].sky_condition == [{'sky_cover': 'FEW', 'cloud_base_ft_agl': 4300},
+                                               {'sky_cover': 'SCT', 'cloud_base_ft_agl': 5300}]
+    assert snapshot['K0000'].wind_dir_degrees == 'VRB'
+    assert snapshot['KNAV'].observation_time.tzinfo is None
+    assert snapshot['K0049'] is None
+
+def test_lazy_decode_and_errors():
+    data = encode_snapshot(station_population(100))
+    snapshot = decode_snapshot(bytearray(data))
+    assert len(snapshot) == 100 and snapshot._cache == {}
+    assert snapshot['K0010'] is snapshot['K0010']
+    assert list(snapshot._cache) == ['K0010']
+
+    with pytest.raises(Snapshot_Format_Error):
+        decode_snapshot(data[:len(data)//2])
+    with pytest.raises(Snapshot_Format_Error):
+        decode_snapshot(b'JSON' + data[4:])
+
+def test_binary_snapshot_file(tmp_path):
+    path = tmp_path / 'snapshot.bin'
+    write_snapshot(path, station_population(20))
+    assert path.read_bytes()[:4] == b'MTRS'
+    taken, metar_data = read_snapshot(path)
+    assert as_dicts(metar_data) == as_dicts(station_population(20))
+
+def test_binary_is_smallest():
+    """The binary codec against pickle and JSON of the same data, see tests/benchmarks for their speed"""
+    metar_data = station_population(1000)
+    binary = encode_snapshot(metar_data)
+    assert as_dicts(decode_snapshot(binary)) == as_dicts(metar_data)
+    assert len(binary) < len(pickle.dumps(as_dicts(metar_data), protocol=pickle.HIGHEST_PROTOCOL))
+    assert len(binary) < len(json.dumps(as_dicts(metar_data)).encode('utf-8'))
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from threading import Thread
+from time import perf_counter
+
+import pytest
+
+from METAR.clock import Virtual_Clock, System_Clock
+from METAR.synthetic import Synthetic_METAR_Population
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_Map_Config import Day_Night_Dimming_Config, Wind_Animation_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.Station import Random_Blink_Manager, Burst_Blink_Manager
+from METAR import METAR
+
+START = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+def test_virtual_clock():
+    clock = Virtual_Clock(START)
+    assert clock.now() == START and clock.monotonic_ns() == 0
+    clock.advance(timedelta(minutes=90))
+    clock.advance(0.5)
+    assert clock.now() == START + timedelta(minutes=90, seconds=0.5)
+    assert clock.monotonic() == 5400.5
+    clock.advance_to(START + timedelta(days=2))
+    assert clock.monotonic_ns() == 2*86400*10**9
+    with pytest.raises(ValueError):
+        clock.advance(-1)
+
+    system_clock = System_Clock()
+    assert system_clock.now().tzinfo is timezone.utc
+    assert system_clock.monotonic_ns() <= system_clock.monotonic_ns()
+
+def test_virtual_sleep_follows_the_clock():
+    clock = Virtual_Clock(START)
+    woke_at = []
+    sleeper = Thread(target=lambda: (clock.sleep(60), woke_at.append(clock.monotonic())))
+    sleeper.start()
+    clock.advance(59)
+    sleeper.join(0.05)
+    assert sleeper.is_alive()
+    clock.advance(1)
+    sleeper.join(1)
+    assert woke_at == [60.0]
+
+def test_blink_managers_on_virtual_time():
+    clock = Virtual_Clock(START)
+    blink = Random_Blink_Manager(2.0, 2.0, 0.25, clock=clock)
+    assert (blink.up_duration, blink.down_duration) == (500_000_000, 1_500_000_000)
+    assert not blink.blink()
+    clock.advance(1.5)
+    assert not blink.blink()
+    clock.advance(0.001)
+    assert blink.blink()
+    clock.advance(0.5)
+    assert blink.blink()
+    clock.advance(0.001)
+    assert not blink.blink()
+
+    lightning = Burst_Blink_Manager(10, 10, 0.3, 0.01, 0.01, 0.5, clock=clock)
+    states = []
+    for _ in range(2000):
+        clock.advance(0.01)
+        states.append(lightning.blink())
+    # Bursts of flashes for 3 seconds of every 10
+    assert 0 < sum(states) < 2000*0.3
+
+def test_thread_staleness_on_virtual_time():
+    clock = Virtual_Clock(START)
+    population = Synthetic_METAR_Population(5, start=START)
+    with METAR_Fixture_Server(population) as server:
+        thread = Aviation_Weather_METAR_Thread(stations=population.station_ids, update_interval=timedelta(minutes=15),
+                                               stale_data_time=timedelta(minutes=90), wait_to_run=True,
+                                               base_url=server.base_url, clock=clock)
+        thread.loop()
+        assert thread.new_metar_data and thread.live_metar_data is not None
+        assert server.requests == 1
+        clock.advance(timedelta(minutes=14))
+        thread.loop()
+        assert server.requests == 1
+        clock.advance(timedelta(minutes=2))
+        thread.loop()
+        assert server.requests == 2
+        server.error_rate = 1.0
+
+    # 90 minutes of failed retrievals later the data is stale, without waiting 90 minutes
+    start = perf_counter()
+    for _ in range(6):
+        clock.advance(timedelta(minutes=15, seconds=1))
+        thread.loop()
+    assert thread.data_is_stale
+    assert thread.live_metar_data is None
+    assert perf_counter() - start < 10
+
+def test_thread_runs_on_virtual_time():
+    clock = Virtual_Clock(START)
+    population = Synthetic_METAR_Population(5, start=START)
+    with METAR_Fixture_Server(population) as server:
+        thread = Aviation_Weather_METAR_Thread(stations=population.station_ids, update_interval=timedelta(minutes=15),
+                                               wait_to_run=True, base_url=server.base_url, clock=clock)
+        thread.daemon = True
+        thread.start()
+        # A day of polls, the thread retrieves every 15 minutes of virtual time
+        for _ in range(24*60):
+            assert clock.wait_for_sleepers(timeout=5)
+            clock.advance(60)
+        assert clock.wait_for_sleepers(timeout=5)
+        thread.stop()
+        clock.advance(60)
+        thread.join(5)
+        assert not thread.is_alive()
+        assert server.requests == 1 + 24*60//16
+
+def test_main_loop_dims_over_days_on_virtual_time():
+    clock = Virtual_Clock(START)
+    station_map = {'KOSH': 0, 'KMKE': 1}
+    metars = {station_id: METAR(station=station_id, raw_text=f'{station_id} 011200Z', flight_category='VFR',
+                                wind_speed_kt=20) for station_id in station_map}
+    main_loop = MainLoop(METAR_MAP_Config('virtual', metar_source=Demo_METAR_Source(metars, timedelta(minutes=15)),
+                                          station_map=station_map,
+                                          day_night_dimming_config=Day_Night_Dimming_Config(True, 0.5,
+                                                                                            use_sunrise_sunet=True,
+                                                                                            day_night_latitude=44.0,
+                                                                                            day_night_longitude=-88.5),
+                                          wind_animation_config=Wind_Animation_Config(enabled=True)),
+                         clock=clock)
+    # Three days, a frame every 10 minutes
+    dimmed = []
+    for _ in range(3*24*6):
+        main_loop.loop()
+        dimmed.append(main_loop.dimming_active)
+        clock.advance(timedelta(minutes=10))
+    transitions = sum(1 for before, after in zip(dimmed, dimmed[1:]) if before != after)
+    assert transitions in (5, 6)
+    # Wisconsin in June, roughly 9 hours of night
+    assert 3*8*6 < sum(dimmed) < 3*10*6
+    assert main_loop.current_metar_state_age is not None
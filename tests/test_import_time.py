@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Seconds allowed for a cold `import metarmap`, generous for a development machine, override for slower targets
+IMPORT_BUDGET_S = float(os.environ.get('METARMAP_IMPORT_BUDGET_S', '0.5'))
+
+# Deferred until first use, none of these should be loaded by importing metarmap
+DEFERRED_MODULES = ('astral', 'urllib.request', 'http.client', 'ssl', 'xml.etree.ElementTree', 'neopixel', 'board')
+
+MEASURE = '''
+import json, sys
+from time import perf_counter
+start = perf_counter()
+import metarmap
+duration = perf_counter() - start
+print(json.dumps({'duration': duration, 'loaded': [name for name in %r if name in sys.modules],
+                  'marks': metarmap.startup_timer.marks}))
+''' % (DEFERRED_MODULES,)
+
+def test_import_metarmap_within_budget():
+    src = Path(__file__).parent.parent / 'src'
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, (str(src), os.environ.get('PYTHONPATH'))))}
+    # Best of a few runs in fresh interpreters, the first may pay for cold .pyc and disk caches
+    results = [json.loads(subprocess.run([sys.executable, '-c', MEASURE], env=env, capture_output=True, text=True, check=True).stdout)
+               for _ in range(3)]
+    assert results[0]['loaded'] == []
+    assert 'import' in results[0]['marks']
+    best = min(result['duration'] for result in results)
+    print(f'\nimport metarmap: {best*1e3:.1f} ms (budget {IMPORT_BUDGET_S*1e3:.0f} ms)')
+    assert best < IMPORT_BUDGET_S
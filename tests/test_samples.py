@@ -0,0 +1,113 @@
+import importlib.util
+import logging
+import re
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+from METAR.Aviation_Weather_METAR_Thread import Aviation_Weather_METAR_Thread
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.synthetic import Synthetic_METAR_Population
+from metarmap.RGB_color import RGB_color
+
+SAMPLES = Path(__file__).resolve().parents[1] / 'samples'
+
+class Fake_NeoPixel_Config:
+    """Stands in for RPi_zero_NeoPixel_Config, which needs the Adafruit libraries"""
+    class supported_orders:
+        GRB = 'GRB'
+    def __init__(self, led_count: int, pin, brightness: float, order):
+        self.led_count = led_count
+
+class Fake_NeoPixel_Driver:
+    """Stands in for RPi_zero_NeoPixel_LED_Driver, counts what would have been sent to the strip"""
+    instances: list = []
+    is_valid = True
+    def __init__(self, config: Fake_NeoPixel_Config):
+        self.LED_index_colors: dict[int, RGB_color] = {}
+        self.shows = 0
+        self.closed = False
+        Fake_NeoPixel_Driver.instances.append(self)
+    def update_LED(self, index: int, color: RGB_color) -> None:
+        self.LED_index_colors[index] = color
+    def show(self) -> None:
+        self.shows += 1
+    def close(self) -> None:
+        self.closed = True
+
+@pytest.fixture
+def fake_hardware(monkeypatch):
+    """The Raspberry Pi modules the samples import, replaced by fakes"""
+    board = types.ModuleType('board')
+    board.D12 = 12
+    board.D18 = 18
+    driver_module = types.ModuleType('LED_Control.RPi_zero_NeoPixel_LED_Driver')
+    driver_module.RPi_zero_NeoPixel_LED_Driver = Fake_NeoPixel_Driver
+    driver_module.RPi_zero_NeoPixel_Config = Fake_NeoPixel_Config
+    monkeypatch.setitem(sys.modules, 'board', board)
+    monkeypatch.setitem(sys.modules, 'LED_Control.RPi_zero_NeoPixel_LED_Driver', driver_module)
+    Fake_NeoPixel_Driver.instances = []
+    return Fake_NeoPixel_Driver
+
+@pytest.fixture
+def restore_root_logger():
+    """The samples configure the root logger, undo it"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in root.handlers:
+        if handler not in handlers:
+            handler.close()
+    root.handlers = handlers
+    root.setLevel(level)
+
+def import_sample(name: str) -> types.ModuleType:
+    spec = importlib.util.spec_from_file_location(f'samples.{name}', SAMPLES / f'{name}.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_multi_map_example(fake_hardware, restore_root_logger, tmp_path):
+    multi_map_example = import_sample('multi_map_example')
+    # Importing builds nothing, the drivers and the fetcher belong to main()
+    assert fake_hardware.instances == []
+
+    stations = multi_map_example.station_union([multi_map_example.wisconsin_station_map,
+                                                multi_map_example.illinois_station_map])
+    with METAR_Fixture_Server(Synthetic_METAR_Population(len(stations))) as server:
+        multi_map_example.main(frames=5, base_url=server.base_url, log_directory=tmp_path)
+    assert (tmp_path / 'multi_map.log').exists()
+    assert len(fake_hardware.instances) == 2
+    assert all(driver.shows == 5 and driver.closed for driver in fake_hardware.instances)
+
+def test_SE_Wisconsin_map_builds_nothing_on_import(fake_hardware):
+    # Aviation_Weather_METAR_Process re-imports the main module in its worker, only main() may build the map
+    threads = threading.active_count()
+    SE_Wisconsin_map = import_sample('SE_Wisconsin_map')
+    assert fake_hardware.instances == []
+    assert threading.active_count() == threads
+    assert callable(SE_Wisconsin_map.main)
+
+def test_pc_testing_example_renders(monkeypatch, restore_root_logger, tmp_path, capsys):
+    pc_testing_example = import_sample('pc_testing_example')
+    population = Synthetic_METAR_Population(len(pc_testing_example.station_map))
+    monkeypatch.setattr(pc_testing_example, 'station_map', dict(zip(population.station_ids,
+                                                                    pc_testing_example.station_map.values())))
+    with METAR_Fixture_Server(population) as server:
+        # The first retrieval done up front, so the first frame has data to draw
+        def retrieved_thread(**kwargs):
+            thread = Aviation_Weather_METAR_Thread(wait_to_run=True, base_url=server.base_url, **kwargs)
+            thread.loop()
+            return thread
+        monkeypatch.setattr(pc_testing_example, 'Aviation_Weather_METAR_Thread', retrieved_thread)
+        pc_testing_example.main(frames=3, log_directory=tmp_path)
+
+    output = capsys.readouterr().out
+    assert output.startswith('\x1b[?25l\x1b[2J')
+    assert 'frames: ' in output
+    # The stations are drawn in their flight category colors, not left black
+    cell_colors = re.findall(r'\x1b\[\d+;\d+H\x1b\[38;2;(\d+);(\d+);(\d+)m██', output)
+    assert any(color != ('0', '0', '0') for color in cell_colors)
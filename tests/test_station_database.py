@@ -0,0 +1,97 @@
+import logging
+import os
+from datetime import timedelta
+
+import pytest
+
+from METAR.station_database import (Station_Database, Station_Index_Error, Unknown_Station_Error, compile_station_index,
+                                    parse_stations_txt, DEFAULT_STATIONS_PATH, METAR_STATION, TAF, AUTOMATED, NEXRAD)
+from metarmap import METAR_MAP_Config
+from metarmap.METAR_SOURCE import Demo_METAR_Source
+from metarmap.utils import getStationList
+
+@pytest.fixture(scope='module')
+def station_database(tmp_path_factory):
+    with Station_Database.open(index_path=tmp_path_factory.mktemp('stations') / 'stations.idx') as station_database:
+        yield station_database
+
+def test_parse_stations_txt():
+    stations = parse_stations_txt()
+    milwaukee = stations['KMKE']
+    assert (milwaukee.name, milwaukee.state, milwaukee.country, milwaukee.elevation_m) == ('MILWAUKEE', 'WI', 'US', 203)
+    assert milwaukee.latitude == pytest.approx(42 + 57/60) and milwaukee.longitude == pytest.approx(-(87 + 54/60))
+    assert milwaukee.flags == METAR_STATION | TAF | AUTOMATED and milwaukee.priority == 3
+    # Southern and eastern hemispheres
+    assert stations['NTAA'].latitude < 0 and stations['NTAA'].longitude < 0
+    assert stations['VISP'].longitude > 0
+    # Of a duplicated ID, the METAR reporting entry wins
+    assert stations['KMTR'].name == 'MEETEETSE RIM'
+    assert stations['PAEC'].reports_metar and not stations['PAEC'].flags & NEXRAD
+
+def test_lookup(station_database):
+    stations = parse_stations_txt()
+    assert len(station_database) == len(stations)
+    assert list(station_database) == sorted(stations)
+    for station_id in ('KMKE', 'KOSH', 'PADK', 'NTTR', 'KY50', sorted(stations)[0], sorted(stations)[-1]):
+        assert station_database[station_id].icao == station_id
+        assert station_database[station_id].name == stations[station_id].name
+        assert station_database[station_id].latitude == pytest.approx(stations[station_id].latitude, abs=1e-5)
+    assert station_database.get('kmke').icao == 'KMKE'
+    assert 'KMKE' in station_database
+    for missing in ('AAAA', 'ZZZZ', 'KXYZ', 'KMK', 'KMKEE', '', 'ÄÄÄÄ', None):
+        assert missing not in station_database
+    assert station_database.get('ZZZZ') is None
+    with pytest.raises(KeyError):
+        station_database['ZZZZ']
+    assert all(station.reports_metar for station in station_database.stations(METAR_STATION))
+
+def test_validate(station_database):
+    station_database.validate(['KMKE', 'KOSH'])
+    with pytest.raises(Unknown_Station_Error) as error:
+        station_database.validate(['KMKE', 'KMKX1', 'QQQQ'])
+    assert error.value.station_ids == ['KMKX1', 'QQQQ']
+
+def test_index_is_compiled_once(tmp_path):
+    stations_path = tmp_path / 'stations.txt'
+    stations_path.write_bytes(DEFAULT_STATIONS_PATH.read_bytes())
+    index_path = stations_path.with_suffix('.idx')
+    Station_Database.open(stations_path).close()
+    compiled = index_path.stat().st_mtime_ns
+    Station_Database.open(stations_path).close()
+    assert index_path.stat().st_mtime_ns == compiled
+
+    # A changed stations.txt is compiled again
+    milwaukee = next(line for line in DEFAULT_STATIONS_PATH.read_text().splitlines() if line[20:24] == 'KMKE')
+    with open(stations_path, 'a') as f:
+        f.write(f'\n{milwaukee[:3]}{"TEST STATION":<17}KQQQ{milwaukee[24:]}\n')
+    os.utime(stations_path, ns=(compiled + 1_000_000_000, compiled + 1_000_000_000))
+    with Station_Database.open(stations_path) as station_database:
+        assert station_database['KQQQ'].name == 'TEST STATION'
+
+def test_unwritable_index_is_compiled_into_memory(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING):
+        with Station_Database.open(index_path=tmp_path / 'missing' / 'stations.idx') as station_database:
+            assert 'KMKE' in station_database
+    assert 'compiling it into memory' in caplog.text
+
+def test_corrupt_index(tmp_path):
+    index = compile_station_index()
+    with pytest.raises(Station_Index_Error):
+        Station_Database(data=index[:-1])
+    with pytest.raises(Station_Index_Error):
+        Station_Database(data=b'XXXX' + index[4:])
+
+def test_config_validates_station_map(station_database, caplog):
+    source = Demo_METAR_Source({}, timedelta(minutes=15))
+    with caplog.at_level(logging.WARNING):
+        METAR_MAP_Config('valid', metar_source=source, station_map={'KMKE': 0, 'PZ74': 1}, station_database=station_database)
+    assert 'PZ74' in caplog.text
+    with pytest.raises(Unknown_Station_Error, match='KMKX1'):
+        METAR_MAP_Config('invalid', metar_source=source, station_map={'KMKE': 0, 'KMKX1': 1}, station_database=station_database)
+
+def test_getStationList(tmp_path):
+    path = tmp_path / 'stations.txt'
+    path.write_text('KMKE\n\nKOSH \n')
+    assert getStationList(path) == ['KMKE', 'KOSH']
+    metar_stations = getStationList()
+    assert 'KMKE' in metar_stations and 'PZ74' not in metar_stations
@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+
+from METAR.clock import Virtual_Clock
+from METAR.synthetic import Synthetic_METAR_Population, to_dataserver_xml
+from METAR.fixture_server import METAR_Fixture_Server
+from METAR.aviation_weather_metar import (parse_METAR_xml, retrieve_METAR_of_stations, METAR_Retrieve_Failure,
+                                          METAR_Fetch_Stats, Aviation_Weather_METAR)
+from metarmap import MainLoop, METAR_MAP_Config
+from metarmap.METAR_SOURCE import Synthetic_METAR_Source
+
+def test_population_is_deterministic_and_evolves():
+    first = Synthetic_METAR_Population(200, seed=7)
+    second = Synthetic_METAR_Population(200, seed=7)
+    assert [metar.raw_text for metar in first.snapshot().values()] == \
+        [metar.raw_text for metar in second.snapshot().values()]
+    assert [metar.raw_text for metar in Synthetic_METAR_Population(200, seed=8).snapshot().values()] != \
+        [metar.raw_text for metar in first.snapshot().values()]
+
+    before = {station_id: metar.raw_text for station_id, metar in first.snapshot().items()}
+    # Every station reports once an hour
+    assert first.advance(timedelta(hours=1)) == 200
+    assert all(metar.raw_text != before[station_id] for station_id, metar in first.snapshot().items())
+    assert first.advance(timedelta(minutes=0)) == 0
+
+def test_population_category_mix():
+    population = Synthetic_METAR_Population(2000, weather_system_count=0)
+    categories = Counter(metar.flight_category for metar in population.snapshot().values())
+    assert set(categories) == {'VFR', 'MVFR', 'IFR', 'LIFR'}
+    assert categories['VFR'] > categories['MVFR'] > categories['LIFR']
+    assert 0.55 < categories['VFR']/2000 < 0.75
+
+    with pytest.raises(ValueError):
+        Synthetic_METAR_Population(10, category_mix=(0.5, 0.5, 0.5, 0.5))
+
+def test_dataserver_xml_round_trip():
+    population = Synthetic_METAR_Population(100, seed=3)
+    population.advance(timedelta(hours=5))
+    snapshot = population.snapshot()
+    parsed = parse_METAR_xml(to_dataserver_xml(snapshot.values()))
+    assert list(parsed) == list(snapshot)
+    assert all(parsed[station_id].to_dict() == metar.to_dict() for station_id, metar in snapshot.items())
+
+def test_retrieve_from_fixture_server():
+    population = Synthetic_METAR_Population(50)
+    stations = population.station_ids[:20] + ['KNONE']
+    with METAR_Fixture_Server(population) as server:
+        fetch_stats = METAR_Fetch_Stats()
+        result = retrieve_METAR_of_stations(stations, fetch_stats=fetch_stats, base_url=server.base_url)
+        assert [metar.raw_text for metar in result[:20]] == \
+            [population.snapshot()[station_id].raw_text for station_id in stations[:20]]
+        assert result[20] is None
+        assert fetch_stats.stations_missing == 1
+        assert fetch_stats.bytes_downloaded > 0
+
+        # Advancing the population serves the new reports
+        metar_source = Aviation_Weather_METAR(population.station_ids, base_url=server.base_url)
+        with server.population_lock:
+            population.advance(timedelta(hours=1))
+        assert metar_source.update_METAR_data()
+        assert {station_id: metar.to_dict() for station_id, metar in metar_source._metar_data.items()} == \
+            {station_id: metar.to_dict() for station_id, metar in population.snapshot().items()}
+        assert server.requests == 2
+
+def test_fixture_server_failures():
+    population = Synthetic_METAR_Population(20)
+    with METAR_Fixture_Server(population, error_rate=1.0) as server:
+        with pytest.raises(METAR_Retrieve_Failure):
+            retrieve_METAR_of_stations(population.station_ids, base_url=server.base_url)
+        assert server.errors_served == 1
+    with METAR_Fixture_Server(population, truncate_rate=1.0) as server:
+        metar_source = Aviation_Weather_METAR(population.station_ids, base_url=server.base_url)
+        assert not metar_source.update_METAR_data()
+        assert server.truncations_served == 1
+        assert metar_source.fetch_stats.attempts == 1 and metar_source.fetch_stats.successes == 0
+    with METAR_Fixture_Server(population, latency=0.5) as server:
+        with pytest.raises(METAR_Retrieve_Failure):
+            retrieve_METAR_of_stations(population.station_ids, base_url=server.base_url, timeout=0.05)
+
+def test_synthetic_source_through_the_main_loop():
+    population = Synthetic_METAR_Population(500, seed=1)
+    clock = Virtual_Clock()
+    source = Synthetic_METAR_Source(population, update_interval=timedelta(minutes=15), clock=clock)
+    station_map = {station_id: index for index, station_id in enumerate(population.station_ids)}
+    main_loop = MainLoop(METAR_MAP_Config('synthetic', metar_source=source, station_map=station_map), clock=clock)
+
+    # Six simulated hours at a 15 minute update interval, one frame per minute
+    for _ in range(6*60):
+        main_loop.loop()
+        clock.advance(60.0)
+    assert source.updates == 23
+    assert not source.data_is_stale
+    station_id = population.station_ids[0]
+    assert main_loop.get_METAR_of_station(station_id).raw_text == population.snapshot()[station_id].raw_text
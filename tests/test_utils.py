@@ -0,0 +1,55 @@
+import random
+from collections import deque
+
+from metarmap.utils import P2_Quantile, Streaming_Percentiles, median_function_timer, quickselect_median
+
+def exact_percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile of the full sample set"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q*len(ordered)))]
+
+def check_accuracy(samples: list[float], tolerances: dict[float, float]) -> None:
+    percentiles = Streaming_Percentiles()
+    for x in samples:
+        percentiles.add(x)
+    estimates = {0.5: percentiles.p50, 0.9: percentiles.p90, 0.99: percentiles.p99}
+    for q, tolerance in tolerances.items():
+        exact = exact_percentile(samples, q)
+        assert abs(estimates[q] - exact) <= tolerance*abs(exact), (q, estimates[q], exact)
+    assert percentiles.max == max(samples)
+    assert percentiles.count == len(samples)
+
+def test_accuracy_uniform():
+    rng = random.Random(1)
+    check_accuracy([rng.uniform(0.010, 0.020) for _ in range(20000)], {0.5: 0.01, 0.9: 0.01, 0.99: 0.01})
+
+def test_accuracy_frame_times():
+    """Long tailed, like loop timings: mostly fast frames with occasional slow ones"""
+    rng = random.Random(2)
+    samples = [rng.lognormvariate(-4.0, 0.3) + (0.05 if rng.random() < 0.02 else 0.0) for _ in range(20000)]
+    check_accuracy(samples, {0.5: 0.02, 0.9: 0.05, 0.99: 0.10})
+
+def test_accuracy_sorted_input():
+    check_accuracy([float(x) for x in range(1, 10001)], {0.5: 0.01, 0.9: 0.01, 0.99: 0.01})
+
+def test_few_samples_are_exact():
+    estimator = P2_Quantile(0.5)
+    assert estimator.value == 0.0
+    for x in (5.0, 1.0, 3.0):
+        estimator.add(x)
+    assert estimator.value == 3.0
+
+def test_quickselect_median_even_length():
+    assert quickselect_median([4, 1, 3, 2]) == 2.5
+    assert quickselect_median(deque([7, 1, 5])) == 5
+
+def test_median_function_timer_backends():
+    calls = []
+    buffer: deque[float] = deque([], maxlen=25)
+    percentiles = Streaming_Percentiles()
+    for _ in range(10):
+        assert median_function_timer(buffer, calls.append, 1) >= 0
+        assert median_function_timer(percentiles, calls.append, 1) >= 0
+    assert len(calls) == 20
+    assert len(buffer) == 10
+    assert percentiles.count == 10